@@ -0,0 +1,280 @@
+"""
+Headless HTTP API for DentiBuddy.
+
+For kiosk and mobile clients that cannot drive the Streamlit UI. Each
+worker process builds one DentiBuddy and serves:
+
+    POST /triage    {"question"}               -> detect_emergency result
+    POST /ask       {"question", "use_cache"}  -> answer (JSON, or SSE with
+                                                  Accept: text/event-stream)
+    WS   /ask/ws    {"question", "follow_up"}  -> queue/text/done messages;
+                per message                       follow-ups share one conversation
+    GET  /health                               -> model status, 503 if not ready
+
+Run with several workers (uvicorn api:app --workers N also works, but see
+_listen_socket for why this entry point is faster):
+
+    python api.py --host 0.0.0.0 --port 8000 --workers 4
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import threading
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Generator, Optional, Tuple
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route, WebSocketRoute
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+from assistant import DentiBuddy
+from conversation import ConversationMemory
+
+# Longer questions are rejected rather than sent to the model
+MAX_QUESTION_CHARS = int(os.getenv("DENTIBUDDY_API_MAX_QUESTION_CHARS", "4000"))
+
+# HTTP status for failed answers by DentiBuddy error_type (others are 502)
+ERROR_STATUS = {'busy_error': 503, 'timeout_error': 504}
+
+StreamFactory = Callable[..., Generator[str, None, Dict[str, Any]]]
+
+
+def _answer_stream(bot: DentiBuddy, question: str, use_cache: bool = True,
+                   conversation: Optional[ConversationMemory] = None,
+                   follow_up: bool = False) -> Tuple[Dict[str, Any], StreamFactory]:
+    """Triage the question and pick its answer stream, as the Streamlit UI does"""
+    emergency_info = bot.detect_emergency(question)
+    offline = _offline(bot)
+    if emergency_info['severity'] == 'HIGH':
+        # First-aid template at once; the model's answer is added if it is quick
+        return emergency_info, lambda on_queue: bot.stream_emergency(question, emergency_info)
+    # Emergencies always get a freshly generated answer
+    return emergency_info, lambda on_queue: bot.stream_ollama(
+        question, use_cache=use_cache and not emergency_info['is_emergency'],
+        on_queue=on_queue, conversation=conversation, severity=emergency_info['severity'], offline=offline,
+        follow_up=follow_up
+    )
+
+
+def _offline(bot: DentiBuddy) -> bool:
+    """Whether the health monitor last found Ollama or the model unavailable"""
+    status = bot.get_cached_model_status()
+    return not status.get('checking') and not (status.get('ollama_running') and status.get('model_available'))
+
+
+async def _stream_events(stream_factory: StreamFactory) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Drive a blocking DentiBuddy stream on its own thread and yield
+    ('queue', {...}), ('text', fragment) and finally ('done', result).
+    If the consumer goes away, the generation is abandoned at its next
+    fragment so it gives its model slot back.
+    """
+    loop = asyncio.get_running_loop()
+    # Fed from the producer thread without holding a threadpool token, so
+    # streams waiting in the model queue cannot starve /triage and /health
+    events: asyncio.Queue = asyncio.Queue()
+    abandoned = threading.Event()
+
+    def emit(kind: str, data: Any) -> None:
+        if not abandoned.is_set():
+            loop.call_soon_threadsafe(events.put_nowait, (kind, data))
+
+    def produce() -> None:
+        stream = stream_factory(on_queue=lambda position, wait: emit(
+            'queue', {'position': position, 'estimated_wait': wait}))
+        try:
+            while not abandoned.is_set():
+                emit('text', next(stream))
+        except StopIteration as finished:
+            emit('done', finished.value)
+        except Exception as e:
+            emit('done', {'success': False, 'error': str(e), 'error_type': 'unknown_error'})
+        finally:
+            stream.close()
+
+    threading.Thread(target=produce, name="dentibuddy-api-stream", daemon=True).start()
+    try:
+        while True:
+            kind, data = await events.get()
+            yield kind, data
+            if kind == 'done':
+                return
+    finally:
+        abandoned.set()
+
+
+def _bad_request(error: str, status_code: int = 400) -> JSONResponse:
+    return JSONResponse({'error': error}, status_code=status_code)
+
+
+async def _read_question(request: Request) -> Tuple[Optional[Dict[str, Any]], Optional[JSONResponse]]:
+    """Parsed JSON body with a usable question, or an error response"""
+    try:
+        body = await request.json()
+    except ValueError:
+        return None, _bad_request("Body must be JSON")
+    error = _question_error(body)
+    return (None, _bad_request(*error)) if error else (body, None)
+
+
+def _question_error(body: Any) -> Optional[Tuple[str, int]]:
+    if not isinstance(body, dict) or not isinstance(body.get('question'), str) or not body['question'].strip():
+        return "A non-empty 'question' string is required", 400
+    if len(body['question']) > MAX_QUESTION_CHARS:
+        return f"Questions are limited to {MAX_QUESTION_CHARS} characters", 413
+    return None
+
+
+def _option_error(body: Dict[str, Any], *names: str) -> Optional[Tuple[str, int]]:
+    """Optional flags must be real JSON booleans; "false" would otherwise read as true"""
+    for name in names:
+        if name in body and not isinstance(body[name], bool):
+            return f"'{name}' must be true or false", 400
+    return None
+
+
+async def triage(request: Request) -> Response:
+    body, error = await _read_question(request)
+    if error:
+        return error
+    # Single pass over precompiled tables; cheap enough for the event loop
+    return JSONResponse(request.app.state.bot.detect_emergency(body['question']))
+
+
+async def ask(request: Request) -> Response:
+    body, error = await _read_question(request)
+    if error:
+        return error
+    option_error = _option_error(body, 'use_cache')
+    if option_error:
+        return _bad_request(*option_error)
+    bot = request.app.state.bot
+    emergency_info, stream_factory = _answer_stream(bot, body['question'], use_cache=body.get('use_cache', True))
+
+    if 'text/event-stream' in request.headers.get('accept', ''):
+        async def sse() -> AsyncIterator[str]:
+            yield f"event: triage\ndata: {json.dumps(emergency_info)}\n\n"
+            async for kind, data in _stream_events(stream_factory):
+                if kind == 'done':
+                    bot.log_question(None, body['question'], emergency_info, data)
+                yield f"event: {kind}\ndata: {json.dumps(data)}\n\n"
+
+        return StreamingResponse(sse(), media_type='text/event-stream',
+                                 headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+    async for kind, result in _stream_events(stream_factory):
+        if kind == 'done':
+            bot.log_question(None, body['question'], emergency_info, result)
+            status_code = 200 if result['success'] else ERROR_STATUS.get(result.get('error_type'), 502)
+            return JSONResponse(dict(result, triage=emergency_info), status_code=status_code)
+
+
+async def ask_ws(websocket: WebSocket) -> None:
+    """
+    One conversation per connection. Messages that refer back to earlier
+    ones, or set "follow_up", are answered in its context.
+    """
+    await websocket.accept()
+    bot = websocket.app.state.bot
+    conversation = ConversationMemory(token_budget=bot.context_tokens)
+    # Only used to group this connection's events in the analytics log
+    session_id = bot.generate_session_id()
+    try:
+        while True:
+            try:
+                body = json.loads(await websocket.receive_text())
+            except ValueError:
+                await websocket.send_json({'type': 'error', 'error': "Messages must be JSON"})
+                continue
+            error = _question_error(body) or _option_error(body, 'use_cache', 'follow_up')
+            if error:
+                await websocket.send_json({'type': 'error', 'error': error[0]})
+                continue
+
+            emergency_info, stream_factory = _answer_stream(
+                bot, body['question'], use_cache=body.get('use_cache', True), conversation=conversation,
+                follow_up=body.get('follow_up', False))
+            await websocket.send_json({'type': 'triage', 'data': emergency_info})
+            async for kind, data in _stream_events(stream_factory):
+                if kind == 'done':
+                    bot.log_question(session_id, body['question'], emergency_info, data)
+                await websocket.send_json({'type': kind, 'data': data})
+    except WebSocketDisconnect:
+        pass
+
+
+async def health(request: Request) -> Response:
+    """Last known status from the shared health monitor; never waits on Ollama"""
+    status = request.app.state.bot.get_cached_model_status()
+    ready = status.get('ollama_running') and status.get('model_available') and not status.get('checking')
+    return JSONResponse(status, status_code=200 if ready else 503)
+
+
+@asynccontextmanager
+async def lifespan(app: Starlette) -> AsyncIterator[None]:
+    # Built once per worker; the shared subsystems start their threads here
+    app.state.bot = await run_in_threadpool(DentiBuddy)
+    # Start the background health monitor so /health has a result early
+    app.state.bot.get_cached_model_status()
+    yield
+
+
+app = Starlette(
+    routes=[
+        Route('/triage', triage, methods=['POST']),
+        Route('/ask', ask, methods=['POST']),
+        WebSocketRoute('/ask/ws', ask_ws),
+        Route('/health', health, methods=['GET']),
+    ],
+    lifespan=lifespan,
+)
+
+
+def _listen_socket(host: str, port: int) -> socket.socket:
+    """
+    Listening socket shared by the worker processes. It is created with
+    IPPROTO_TCP because asyncio only enables TCP_NODELAY on accepted
+    connections whose proto says TCP. The socket uvicorn binds for --workers
+    leaves proto at 0, and every small response then waits about 40ms for a
+    delayed ACK.
+    """
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.set_inheritable(True)
+    return sock
+
+
+def main():
+    import uvicorn
+    from uvicorn.supervisors import Multiprocess
+
+    parser = argparse.ArgumentParser(description="DentiBuddy HTTP API")
+    parser.add_argument('--host', default=os.getenv("DENTIBUDDY_API_HOST", "127.0.0.1"))
+    parser.add_argument('--port', type=int, default=int(os.getenv("DENTIBUDDY_API_PORT", "8000")))
+    parser.add_argument('--workers', type=int, default=int(os.getenv("DENTIBUDDY_API_WORKERS", "1")))
+    args = parser.parse_args()
+
+    config = uvicorn.Config("api:app", host=args.host, port=args.port, workers=args.workers, log_level="warning")
+    server = uvicorn.Server(config)
+    sock = _listen_socket(args.host, args.port)
+    if args.workers > 1:
+        try:
+            supervisor = Multiprocess(config, sockets=[sock])
+        except TypeError:
+            # uvicorn releases before the supervisor built its own servers
+            supervisor = Multiprocess(config, target=server.run, sockets=[sock])
+        supervisor.run()
+    else:
+        server.run(sockets=[sock])
+
+
+if __name__ == '__main__':
+    main()
@@ -1,376 +1,23 @@
 import streamlit as st
-import requests
-import json
-import hashlib
-import time
-import re
-import os
 from datetime import datetime
-from typing import Dict, Any
+from typing import Callable, Dict, Any, Generator
 
-# Page configuration
-st.set_page_config(
-    page_title="DentiBuddy 🦷",
-    page_icon="🦷",
-    layout="centered",
-    initial_sidebar_state="collapsed"
-)
-
-# Custom CSS for professional styling
-st.markdown("""
-<style>
-:root {
-    --primary-color: #00A3A3; /* Bright Teal */
-    --secondary-color: #00C2C2; /* Lighter Teal */
-    --background-color: #F0FDF4; /* Very Light Mint Green */
-    --text-color: #202124; /* Dark Gray for high contrast */
-    --light-text-color: #FFFFFF;
-    --warning-bg: #FEF3C7; /* Amber */
-    --warning-border: #FBBF24;
-    --warning-text: #92400E;
-    --danger-bg: #FEE2E2; /* Red */
-    --danger-border: #EF4444;
-    --danger-text: #991B1B;
-}
-
-body {
-    background-color: var(--background-color);
-    color: var(--text-color);
-}
-
-.main-header {
-    text-align: center;
-    color: var(--primary-color);
-    font-size: 2.8rem;
-    margin-bottom: 0.5rem;
-    font-weight: 700;
-}
-.subtitle {
-    text-align: center;
-    color: #555;
-    font-size: 1.2rem;
-    margin-bottom: 2rem;
-}
-.disclaimer {
-    background-color: var(--warning-bg);
-    border: 1px solid var(--warning-border);
-    border-radius: 10px;
-    padding: 1.5rem;
-    margin: 1.5rem 0;
-    color: var(--warning-text);
-    box-shadow: 0 2px 4px rgba(0,0,0,0.05);
-}
-.emergency {
-    background-color: var(--danger-bg);
-    border: 2px solid var(--danger-border);
-    border-radius: 10px;
-    padding: 1.5rem;
-    margin: 1.5rem 0;
-    color: var(--danger-text);
-    font-weight: bold;
-    animation: pulse 1.5s infinite;
-}
-@keyframes pulse {
-    0% { box-shadow: 0 0 0 0 rgba(239, 68, 68, 0.4); }
-    70% { box-shadow: 0 0 0 10px rgba(239, 68, 68, 0); }
-    100% { box-shadow: 0 0 0 0 rgba(239, 68, 68, 0); }
-}
-.response-box {
-    background-color: #FFFFFF;
-    border-left: 5px solid var(--primary-color);
-    padding: 1.5rem;
-    margin: 1.5rem 0;
-    border-radius: 8px;
-    box-shadow: 0 4px 12px rgba(0,0,0,0.08);
-}
-.tips-box {
-    background-color: #D1FAE5; /* Light Green */
-    border: 1px solid #10B981;
-    border-radius: 8px;
-    padding: 1rem;
-    margin: 1rem 0;
-}
-.session-info {
-    background: #E5E7EB;
-    border: 1px solid #D1D5DB;
-    border-radius: 5px;
-    padding: 0.5rem;
-    font-family: monospace;
-    font-size: 0.8rem;
-}
-.stButton > button {
-    background-image: linear-gradient(to right, var(--primary-color) 0%, var(--secondary-color) 100%);
-    color: var(--light-text-color);
-    border: none;
-    border-radius: 25px;
-    padding: 0.85rem 2rem;
-    font-weight: bold;
-    transition: all 0.3s ease;
-    box-shadow: 0 4px 15px rgba(0, 163, 163, 0.2);
-}
-.stButton > button:hover {
-    transform: translateY(-3px);
-    box-shadow: 0 6px 20px rgba(0, 163, 163, 0.3);
-}
-</style>
-""", unsafe_allow_html=True)
-
-class DentiBuddy:
-    """
-    DentiBuddy - A privacy-focused dental AI assistant
-    """
-    
-    def __init__(self):
-        # Use 127.0.0.1 instead of localhost for better reliability
-        self.ollama_url = os.getenv("OLLAMA_URL", "http://127.0.0.1:11434/api/generate")
-        self.model_name = os.getenv("OLLAMA_MODEL", "gemma:1b")
-        self.max_response_length = 300
-        self.timeout = 30
-        
-    def generate_session_id(self) -> str:
-        """Generate a cryptographically secure hashed session ID for privacy"""
-        timestamp = str(time.time())
-        random_component = str(hash(timestamp + str(os.urandom(16))))
-        combined = f"{timestamp}_{random_component}"
-        return hashlib.sha256(combined.encode()).hexdigest()[:16]
-    
-    def detect_emergency(self, user_input: str) -> Dict[str, Any]:
-        """
-        Comprehensive emergency detection for dental pain and urgent situations
-        Returns dict with emergency status and detected triggers
-        """
-        user_input_lower = user_input.lower()
-        detected_triggers = []
-        
-        # Pain level patterns (6/10 and above)
-        pain_patterns = [
-            r'(\d+)/10',              # X/10 format
-            r'(\d+)\s*out\s*of\s*10',  # X out of 10 format
-            r'pain\s*level\s*(\d+)',   # pain level X format
-            r'(\d+)/10\s*pain',       # X/10 pain format
-            r'(\d+)\s*on\s*10',       # X on 10 format
-            r'scale\s*of\s*(\d+)',    # scale of X format
-        ]
-        
-        for pattern in pain_patterns:
-            matches = re.findall(pattern, user_input_lower)
-            for match in matches:
-                try:
-                    pain_level = int(match)
-                    if pain_level >= 6:
-                        detected_triggers.append(f"Pain level {pain_level}/10")
-                        break
-                except (ValueError, TypeError):
-                    continue
-        
-        # Severe pain keywords
-        severe_pain_keywords = [
-            'severe pain', 'extreme pain', 'unbearable pain', 'excruciating',
-            'agony', 'torture', 'killing me', 'worst pain', 'screaming'
-        ]
-        
-        for keyword in severe_pain_keywords:
-            if keyword in user_input_lower:
-                detected_triggers.append(f"Severe pain indicator: '{keyword}'")
-                break
-        
-        # Emergency situation keywords
-        emergency_keywords = [
-            'emergency', 'urgent', 'asap', 'right now', 'immediately',
-            'can\'t sleep', 'cant sleep', 'couldn\'t sleep', 'couldnt sleep',
-            'all night', 'kept me awake', 'no sleep'
-        ]
-        
-        for keyword in emergency_keywords:
-            if keyword in user_input_lower:
-                detected_triggers.append(f"Emergency keyword: '{keyword}'")
-        
-        # Swelling and infection indicators
-        infection_keywords = [
-            'swollen', 'swelling', 'pus', 'abscess', 'infection', 'infected',
-            'fever', 'face swollen', 'jaw swollen', 'can\'t open mouth'
-        ]
-        
-        for keyword in infection_keywords:
-            if keyword in user_input_lower:
-                detected_triggers.append(f"Infection indicator: '{keyword}'")
-        
-        # Trauma keywords
-        trauma_keywords = [
-            'knocked out', 'broken tooth', 'cracked tooth', 'chipped tooth',
-            'accident', 'hit in mouth', 'trauma', 'bleeding', 'blood'
-        ]
-        
-        for keyword in trauma_keywords:
-            if keyword in user_input_lower:
-                detected_triggers.append(f"Trauma indicator: '{keyword}'")
-        
-        is_emergency = len(detected_triggers) > 0
-        
-        return {
-            'is_emergency': is_emergency,
-            'triggers': list(set(detected_triggers)), # Use set to remove duplicates
-            'severity': 'HIGH' if len(detected_triggers) >= 2 else 'MODERATE' if detected_triggers else 'LOW'
-        }
-    
-    def query_ollama(self, prompt: str) -> Dict[str, Any]:
-        """
-        Query Ollama with comprehensive error handling and response processing
-        """
-        try:
-            start_time = time.time()
-            # Optimized prompt for Gemma model
-            dental_prompt = f"""You are DentiBuddy, a dental health assistant.
-            Provide helpful, accurate dental guidance in 1-2 short sentences.
-            If serious, recommend seeing a dentist immediately.
-            
-            Question: {prompt}
-            
-            Short response:"""
-            
-            payload = {
-                "model": self.model_name,
-                "prompt": dental_prompt,
-                "stream": True,
-                "options": {
-                    "temperature": 0.5,  # Lower for more focused responses
-                    "top_p": 0.85,
-                    "num_predict": 100,   # Reduced token count for speed
-                    "stop": ["Question:", "\n\n"]  # Added newline stop
-                }
-            }
-            
-            response = requests.post(
-                self.ollama_url, 
-                json=payload, 
-                timeout=self.timeout,
-                headers={'Content-Type': 'application/json'},
-                stream=True
-            )
-            
-            response.raise_for_status() 
+from assistant import (DentiBuddy, REQUEST_SECONDS, FIRST_TOKEN_SECONDS, TOKENS_PER_SECOND, TRIAGE_SECONDS,
+                       RETRIEVAL_SECONDS, EMERGENCY_TEMPLATE_SECONDS, VARIANT_SECONDS)
+from circuit import CLOSED
+from conversation import ConversationMemory
+from static_assets import (PAGE_CONFIG, PAGE_CSS, HEADER_HTML, SUBTITLE_HTML, DISCLAIMER_HTML,
+                           TROUBLESHOOTING_HTML, TIPS_HTML, SEE_A_DENTIST_MARKDOWN)
 
-            answer_parts = []
-            for line in response.iter_lines():
-                if line:
-                    try:
-                        chunk = json.loads(line)
-                        answer_parts.append(chunk.get('response', ''))
-                        if chunk.get('done'):
-                            break
-                    except json.JSONDecodeError:
-                        continue
-            
-            answer = "".join(answer_parts).strip()
-            answer = self._clean_response(answer)
-            
-            # Slightly longer responses allowed since model is faster
-            if len(answer) > self.max_response_length:
-                answer = answer[:self.max_response_length]
-                answer = answer.rsplit(' ', 1)[0] + "..."
-            
-            end_time = time.time()
+# Page configuration
+st.set_page_config(**PAGE_CONFIG)
+st.markdown(PAGE_CSS, unsafe_allow_html=True)
 
-            return {
-                'success': True,
-                'response': answer,
-                'model_used': self.model_name,
-                'response_time': end_time - start_time
-            }
-                
-        except requests.exceptions.HTTPError as e:
-            if e.response.status_code == 404:
-                return {
-                    'success': False,
-                    'error': f"Model '{self.model_name}' not found. Try: ollama pull {self.model_name}",
-                    'error_type': 'model_not_found'
-                }
-            else:
-                return {
-                    'success': False,
-                    'error': f"Ollama server error (HTTP {e.response.status_code}): {e.response.text}",
-                    'error_type': 'server_error'
-                }
 
-        except requests.exceptions.ConnectionError:
-            return {
-                'success': False,
-                'error': f"Cannot connect to Ollama at {self.ollama_url}. Make sure it's running: 'ollama serve'",
-                'error_type': 'connection_error'
-            }
-        
-        except requests.exceptions.Timeout:
-            return {
-                'success': False,
-                'error': f"Request timed out after {self.timeout} seconds. The model may be too slow. Try again.",
-                'error_type': 'timeout_error'
-            }
-        
-        except requests.exceptions.RequestException as e:
-            return {
-                'success': False,
-                'error': f"Network error: {str(e)[:50]}...",
-                'error_type': 'network_error'
-            }
-        
-        except Exception as e:
-            return {
-                'success': False,
-                'error': f"Unexpected error while processing response: {str(e)[:50]}...",
-                'error_type': 'unknown_error'
-            }
-    
-    def _clean_response(self, response: str) -> str:
-        """Clean and format the AI response"""
-        prefixes_to_remove = [
-            'DentiBuddy says:', 'Answer:', 'Response:', 
-            'I recommend:', 'My advice:', 'Suggestion:'
-        ]
-        
-        response = response.strip()
-
-        for prefix in prefixes_to_remove:
-            if response.lower().startswith(prefix.lower()):
-                response = response[len(prefix):].strip()
-        
-        response = ' '.join(response.split())
-        
-        if response and not response.endswith(('.', '!', '?')):
-            response += '.'
-        
-        return response
-    
-    def get_model_status(self) -> Dict[str, Any]:
-        """Check if Ollama and the model are available with detailed error info"""
-        try:
-            status_url = self.ollama_url.replace('/api/generate', '/api/tags')
-            response = requests.get(status_url, timeout=10)  # Increased timeout
-            
-            if response.status_code == 200:
-                models = response.json().get('models', [])
-                model_names = [model['name'] for model in models]
-                
-                return {
-                    'ollama_running': True,
-                    'model_available': self.model_name in model_names,
-                    'available_models': model_names,
-                    'status_url': status_url
-                }
-            else:
-                return {
-                    'ollama_running': False, 
-                    'model_available': False,
-                    'error': f"HTTP {response.status_code}",
-                    'status_url': status_url
-                }
-                
-        except Exception as e:
-            return {
-                'ollama_running': False,
-                'model_available': False,
-                'error': str(e),
-                'status_url': self.ollama_url.replace('/api/generate', '/api/tags')
-            }
+@st.cache_resource(show_spinner=False)
+def get_dentibuddy() -> DentiBuddy:
+    """One client per process, shared by every session and rerun"""
+    return DentiBuddy()
 
 def display_emergency_alert(emergency_info: Dict[str, Any]) -> None:
     """Display emergency alert with specific triggers"""
@@ -396,20 +43,44 @@ def display_emergency_alert(emergency_info: Dict[str, Any]) -> None:
     </div>
     """, unsafe_allow_html=True)
 
-def display_response(response_data: Dict[str, Any]) -> None:
-    """Display AI response with metadata"""
-    if response_data['success']:
-        st.markdown(f"""
+def _response_box_html(text: str, footer: str = "") -> str:
+    """HTML for the answer box, shared by the streaming and final renders"""
+    return f"""
         <div class="response-box">
             <strong>🦷 DentiBuddy says:</strong><br>
-            <span style="font-size: 1.1em;">{response_data['response']}</span>
+            <span style="font-size: 1.1em;">{text}</span>
+            {footer}
+        </div>
+        """
+
+def display_response(response_data: Dict[str, Any], container=None) -> None:
+    """Display AI response with metadata"""
+    target = container if container is not None else st
+    if response_data['success']:
+        cache_status = response_data.get('cache_status')
+        cache_note = f" | Cached ({cache_status} match)" if cache_status in ('exact', 'fuzzy') else ""
+        saved = response_data.get('prompt_eval_saved')
+        context_note = f" | Context reused (saved {saved:.2f}s)" if saved else ""
+        first_token = response_data.get('time_to_first_token')
+        first_token_note = f" | First token: {first_token:.2f}s" if first_token is not None else ""
+        sources = response_data.get('guidance_sources')
+        guidance_note = ""
+        if sources:
+            guidance_note = (" | From approved guidance: " if response_data.get('guidance_direct')
+                             else " | Based on: ") + ', '.join(sources)
+        degraded_note = " | ⚠️ AI model unavailable, showing saved guidance" if response_data.get('degraded') else ""
+        fast_path_note = ""
+        if response_data.get('fast_path'):
+            fast_path_note = " | Emergency guidance" + (
+                "" if response_data.get('model_status') == 'completed'
+                else " (AI model unavailable)" if response_data.get('model_status') == 'circuit_open'
+                else " (model answer not ready in time)")
+        target.markdown(_response_box_html(response_data['response'], f"""
             <br><br>
             <small style="color: #666;">
                 Model: {response_data['model_used']} | 
-                Response time: {response_data['response_time']:.2f}s
-            </small>
-        </div>
-        """, unsafe_allow_html=True)
+                Response time: {response_data['response_time']:.2f}s{first_token_note}{cache_note}{context_note}{guidance_note}{fast_path_note}{degraded_note}
+            </small>"""), unsafe_allow_html=True)
     else:
         error_messages = {
             'connection_error': "🔌 Connection Error",
@@ -417,66 +88,89 @@ def display_response(response_data: Dict[str, Any]) -> None:
             'timeout_error': "⏱️ Timeout Error",
             'server_error': "🖥️ Server Error",
             'network_error': "🌐 Network Error",
+            'busy_error': "⏳ Server Busy",
             'unknown_error': "❓ Unknown Error"
         }
         
         error_type = response_data.get('error_type', 'unknown_error')
         error_title = error_messages.get(error_type, "❌ Error")
         
-        st.error(f"{error_title}: {response_data['error']}")
+        target.error(f"{error_title}: {response_data['error']}")
+
+def display_queue_position(placeholder, position: int, estimated_wait: float) -> None:
+    """Show the user's place in the shared model queue"""
+    placeholder.markdown(_response_box_html(
+        f"<em>⏳ DentiBuddy is helping other patients. You are #{position} in line "
+        f"(about {estimated_wait:.0f}s)...</em>"
+    ), unsafe_allow_html=True)
+
+def display_streaming_response(stream_factory: Callable[..., Generator[str, None, Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Render the answer progressively as it streams in, then show metadata.
+    stream_factory is called with on_queue to report the queue position.
+    """
+    placeholder = st.empty()
+    placeholder.markdown(_response_box_html("<em>🧠 Thinking...</em>"), unsafe_allow_html=True)
+    stream = stream_factory(on_queue=lambda position, wait: display_queue_position(placeholder, position, wait))
+
+    text = ""
+    while True:
+        try:
+            text += next(stream)
+        except StopIteration as finished:
+            response_data = finished.value
+            break
+        placeholder.markdown(_response_box_html(text + " ▌"), unsafe_allow_html=True)
+
+    display_response(response_data, placeholder)
+    return response_data
+
+def format_percentiles(label: str, histogram, unit: str, scale: float = 1.0, **labels) -> str:
+    """One 'label: p50 / p95' line for the performance panel"""
+    p50 = histogram.percentile(0.50, **labels)
+    p95 = histogram.percentile(0.95, **labels)
+    if p50 is None:
+        return f"<strong>{label}:</strong> no data yet<br>"
+    return f"<strong>{label}:</strong> p50 {p50 * scale:.2f}{unit} / p95 {p95 * scale:.2f}{unit}<br>"
 
 def main():
     """Main application function"""
     
-    if 'dentibuddy' not in st.session_state:
-        st.session_state.dentibuddy = DentiBuddy()
-        st.session_state.session_id = st.session_state.dentibuddy.generate_session_id()
+    dentibuddy = get_dentibuddy()
+    if 'session_id' not in st.session_state:
+        st.session_state.session_id = dentibuddy.generate_session_id()
+        st.session_state.conversation = ConversationMemory(token_budget=dentibuddy.context_tokens)
         st.session_state.query_count = 0
         st.session_state.session_start = datetime.now()
     
-    st.markdown('<h1 class="main-header">DentiBuddy 🦷</h1>', unsafe_allow_html=True)
-    st.markdown('<p class="subtitle">Your AI-powered dental health assistant</p>', unsafe_allow_html=True)
+    st.markdown(HEADER_HTML, unsafe_allow_html=True)
+    st.markdown(SUBTITLE_HTML, unsafe_allow_html=True)
     
-    status = st.session_state.dentibuddy.get_model_status()
+    status = dentibuddy.get_cached_model_status()
     
-    # Enhanced error display with troubleshooting steps
-    if not status.get('ollama_running'):
-        st.error(f"🔌 Connection failed to Ollama at {status.get('status_url', 'Ollama URL')}")
-        st.error(f"Error detail: {status.get('error', 'Unknown error')}")
+    # Without the model, questions still get triage, saved answers, approved
+    # guidance or a fixed template, so the page stays usable
+    offline = False
+    if status.get('checking'):
+        st.info("🔄 Checking the connection to Ollama...")
+    elif not status.get('ollama_running'):
+        offline = True
+        st.warning(f"🔌 Connection failed to Ollama at {status.get('status_url', 'Ollama URL')}. "
+                   f"Answers come from saved guidance until it is back.")
+        st.warning(f"Error detail: {status.get('error', 'Unknown error')}")
         
-        st.markdown("""
-        <div class="disclaimer">
-            <strong>🛠️ TROUBLESHOOTING STEPS</strong><br><br>
-            1. <strong>Start Ollama</strong>: Open a terminal and run: <code>ollama serve</code><br>
-            2. <strong>Check connection</strong>: Visit <a href="http://127.0.0.1:11434" target="_blank">http://127.0.0.1:11434</a> in your browser<br>
-            3. <strong>Firewall settings</strong>: Ensure port 11434 is allowed through your firewall<br>
-            4. <strong>Environment variable</strong>: Try setting OLLAMA_URL before running:<br>
-            &nbsp;&nbsp;&nbsp;&nbsp;<code>set OLLAMA_URL=http://127.0.0.1:11434/api/generate</code> (Windows)<br>
-            &nbsp;&nbsp;&nbsp;&nbsp;<code>export OLLAMA_URL=http://127.0.0.1:11434/api/generate</code> (Mac/Linux)<br>
-            5. <strong>Restart your computer</strong>: Sometimes fixes network stack issues
-        </div>
-        """, unsafe_allow_html=True)
-        st.stop()
+        st.markdown(TROUBLESHOOTING_HTML, unsafe_allow_html=True)
     elif not status.get('model_available'):
+        offline = True
         available = status.get('available_models', [])
-        st.error(f"🤖 Model '{st.session_state.dentibuddy.model_name}' not found!")
+        st.warning(f"🤖 Model '{dentibuddy.model_name}' not found! Answers come from saved guidance until it is installed.")
         if available:
             st.info(f"Available models: {', '.join(available)}")
-        st.info(f"Install the model with: `ollama pull {st.session_state.dentibuddy.model_name}`")
-        st.stop()
+        st.info(f"Install the model with: `ollama pull {dentibuddy.model_name}`")
+    elif dentibuddy.circuit is not None and dentibuddy.circuit.state != CLOSED:
+        st.warning("⚠️ The AI model is not responding right now. Answers come from saved guidance until it recovers.")
     
-    st.markdown("""
-    <div class="disclaimer">
-        <strong>⚠️ IMPORTANT MEDICAL DISCLAIMER</strong><br><br>
-        DentiBuddy is an AI assistant for <strong>informational purposes only</strong> and is 
-        <strong>NOT a substitute for professional medical advice, diagnosis, or treatment</strong>. 
-        <br><br>
-        • Always consult a qualified dentist for dental concerns<br>
-        • In emergencies, contact your dentist or emergency services immediately<br>
-        • Do not delay seeking professional care based on AI responses<br>
-        • This tool cannot diagnose conditions or replace clinical examination
-    </div>
-    """, unsafe_allow_html=True)
+    st.markdown(DISCLAIMER_HTML, unsafe_allow_html=True)
     
     st.markdown("### 💬 Ask me about your dental concerns:")
     
@@ -488,6 +182,12 @@ def main():
         help="Be specific about your symptoms, when they started, and what makes them better or worse."
     )
     
+    # Questions that refer back ("does it need a filling?") are detected on
+    # their own; this is for the ones that don't
+    follow_up = False
+    if len(st.session_state.conversation):
+        follow_up = st.checkbox("This is about my previous question", key="follow_up")
+    
     col1, col2, col3 = st.columns([1, 2, 1])
     with col2:
         ask_button = st.button("🦷 Ask DentiBuddy", type="primary", use_container_width=True)
@@ -495,63 +195,98 @@ def main():
     if ask_button and user_question.strip():
         st.session_state.query_count += 1
         
-        with st.spinner("🧠 Analyzing your dental question..."):
-            emergency_info = st.session_state.dentibuddy.detect_emergency(user_question)
-            
-            if emergency_info['is_emergency']:
-                display_emergency_alert(emergency_info)
-            
-            response_data = st.session_state.dentibuddy.query_ollama(user_question)
-            display_response(response_data)
-            
-            st.markdown("---")
-            col1, col2, col3 = st.columns([1, 1, 1])
-            with col2:
-                st.image(
-                    "https://media.giphy.com/media/3o7btNa0RUYa5E7iiQ/giphy.gif", 
-                    caption="Keep that smile healthy! 😊", 
-                    width=200
-                )
+        emergency_info = dentibuddy.detect_emergency(user_question)
+        
+        if emergency_info['is_emergency']:
+            display_emergency_alert(emergency_info)
+        
+        if emergency_info['severity'] == 'HIGH':
+            # First-aid template at once; the model's answer is added if it is quick
+            response_data = display_streaming_response(lambda on_queue: dentibuddy.stream_emergency(
+                user_question, emergency_info
+            ))
+        else:
+            # Emergencies always get a freshly generated answer
+            response_data = display_streaming_response(lambda on_queue: dentibuddy.stream_ollama(
+                user_question,
+                use_cache=not emergency_info['is_emergency'],
+                on_queue=on_queue,
+                conversation=st.session_state.conversation,
+                severity=emergency_info['severity'],
+                offline=offline,
+                follow_up=follow_up
+            ))
+        dentibuddy.log_question(st.session_state.session_id, user_question, emergency_info, response_data)
+        
+        st.markdown("---")
+        col1, col2, col3 = st.columns([1, 1, 1])
+        with col2:
+            st.image(
+                "https://media.giphy.com/media/3o7btNa0RUYa5E7iiQ/giphy.gif", 
+                caption="Keep that smile healthy! 😊", 
+                width=200
+            )
     
     elif ask_button and not user_question.strip():
         st.warning("Please describe your dental concern before asking!")
     
     with st.sidebar:
         st.markdown("### 🦷 Essential Dental Care")
-        st.markdown("""
-        <div class="tips-box">
-        <strong>Daily Routine:</strong><br>
-        • Brush 2x daily with fluoride toothpaste<br>
-        • Floss daily to remove plaque<br>
-        • Use mouthwash for extra protection<br>
-        • Replace toothbrush every 3 months<br><br>
-        
-        <strong>Healthy Habits:</strong><br>
-        • Limit sugary and acidic foods<br>
-        • Don't use teeth as tools<br>
-        • Wear mouthguard for sports<br>
-        • Stay hydrated with water
-        </div>
-        """, unsafe_allow_html=True)
+        st.markdown(TIPS_HTML, unsafe_allow_html=True)
         
         st.markdown("### 🚨 See a Dentist IMMEDIATELY if:")
-        st.markdown("""
-        - **Severe, persistent pain**
-        - **Facial or gum swelling**
-        - **Knocked out or broken tooth**
-        - **Uncontrolled bleeding**
-        - **Signs of infection (fever, pus)**
-        - **Difficulty swallowing/breathing**
-        """)
+        st.markdown(SEE_A_DENTIST_MARKDOWN)
         
         st.markdown("### 📊 Session Info")
         session_duration = datetime.now() - st.session_state.session_start
+        cache_stats = dentibuddy.response_cache.stats()
+        pool_stats = dentibuddy.http_client.stats()
+        queue_stats = dentibuddy.scheduler.stats()
+        backend_stats = dentibuddy.backends.stats()
+        conversation_stats = st.session_state.conversation.stats()
+        model_state = {True: " (loaded)", False: " (not loaded, first answer may be slow)"}.get(status.get('model_loaded'), "")
+        variant_lines = "".join(
+            f"<br>↳ {variant['model']} for {variant['percent']:g}% of "
+            f"{'/'.join(variant['severity']) if variant['severity'] else 'all'} questions ({variant['name']})"
+            for variant in dentibuddy.config.stats()['variants']
+        )
+        backend_lines = ""
+        if len(backend_stats) > 1:
+            backend_lines = "<br><strong>Backends:</strong>" + "".join(
+                f"<br>{'✅' if backend['healthy'] else '❌'} {backend['url'].replace('/api/generate', '')}: "
+                f"{backend['in_flight']} active, "
+                f"{(backend['latency_ewma'] or 0) * 1000:.0f}ms, {backend['errors']} errors"
+                for backend in backend_stats
+            )
         st.markdown(f"""
         <div class="session-info">
         <strong>Session:</strong> {st.session_state.session_id}<br>
         <strong>Queries:</strong> {st.session_state.query_count}<br>
+        <strong>Conversation:</strong> {conversation_stats['turns']} turns, ~{conversation_stats['history_tokens']} tokens, {conversation_stats['prompt_eval_saved']:.2f}s prompt eval saved<br>
         <strong>Duration:</strong> {str(session_duration).split('.')[0]}<br>
-        <strong>Model:</strong> {st.session_state.dentibuddy.model_name}
+        <strong>Model:</strong> {dentibuddy.model_name}{model_state}{variant_lines}<br>
+        <strong>Cache:</strong> {cache_stats['exact_hits'] + cache_stats['fuzzy_hits']} hits / {cache_stats['misses']} misses, {dentibuddy.single_flight.stats()['coalesced']} shared answers<br>
+        <strong>Connections:</strong> {pool_stats['in_flight']}/{pool_stats['pool_size']} in use, {pool_stats['connections_opened']} opened<br>
+        <strong>Model queue:</strong> {queue_stats['in_flight']}/{queue_stats['max_in_flight']} running, {queue_stats['queue_depth']} waiting (p95 wait {queue_stats['wait_p95']:.1f}s){backend_lines}
+        </div>
+        """, unsafe_allow_html=True)
+        
+        st.markdown("### ⏱️ Performance")
+        variant_stats = dentibuddy.config.stats()['variants']
+        # Per-variant answer times, to compare the models under A/B routing
+        variant_latency = "".join(
+            format_percentiles(f"Answer ({name})", VARIANT_SECONDS, "s", variant=name)
+            for name in ['default'] + [variant['name'] for variant in variant_stats]
+        ) if variant_stats else ""
+        st.markdown(f"""
+        <div class="session-info">
+        {format_percentiles("Answer", REQUEST_SECONDS, "s", source="model", status="success")}
+        {format_percentiles("First token", FIRST_TOKEN_SECONDS, "s")}
+        {format_percentiles("Tokens/s", TOKENS_PER_SECOND, "")}
+        {format_percentiles("Triage", TRIAGE_SECONDS, "ms", scale=1000)}
+        {format_percentiles("Guidance lookup", RETRIEVAL_SECONDS, "ms", scale=1000)}
+        {format_percentiles("Emergency template", EMERGENCY_TEMPLATE_SECONDS, "ms", scale=1000)}
+        {variant_latency}
         </div>
         """, unsafe_allow_html=True)
         
@@ -559,7 +294,7 @@ def main():
         
         st.markdown("### 🔧 Quick Actions")
         if st.button("🔄 New Session", help="Start fresh with new session ID"):
-            for key in ['dentibuddy', 'session_id', 'query_count', 'session_start', 'user_input']:
+            for key in ['session_id', 'conversation', 'query_count', 'session_start', 'user_input']:
                 if key in st.session_state:
                     del st.session_state[key]
             st.rerun()
@@ -0,0 +1,1074 @@
+"""
+DentiBuddy assistant: triage, retrieval and Ollama generation.
+
+Everything here is independent of Streamlit, so the UI script (app.py), the
+batch runner and the benchmarks share one implementation. The UI builds a
+single DentiBuddy per process and reuses it across reruns and sessions.
+"""
+
+import requests
+import json
+import hashlib
+import time
+import os
+import functools
+import threading
+from typing import Callable, Dict, Any, Generator, Optional
+
+from response_cache import get_response_cache, normalize_prompt, ResponseCache
+from http_client import get_http_client
+from health import get_health_monitor
+from scheduler import get_scheduler, QueueTimeout, PRIORITY_HIGH, PRIORITY_NORMAL
+from backends import get_backend_pool, parse_backend_urls
+from emergency_templates import emergency_template, unavailable_template
+from conversation import ConversationMemory
+from singleflight import get_single_flight
+from warmup import get_model_warmer, parse_keep_alive, parse_hours
+from budget import get_generation_controller
+from retrieval import get_retriever
+from event_log import get_event_log
+from config import get_config_watcher
+from circuit import get_circuit_breaker, CircuitOpen, CLOSED, OPEN, HALF_OPEN
+from metrics import METRICS, FAST_BUCKETS, RATE_BUCKETS, SIZE_BUCKETS
+
+# Instrumentation (get-or-create, so every DentiBuddy instance shares the same series)
+REQUEST_SECONDS = METRICS.histogram(
+    'dentibuddy_ollama_request_duration_seconds', 'Total time to answer a question, by answer source and status')
+FIRST_TOKEN_SECONDS = METRICS.histogram(
+    'dentibuddy_ollama_time_to_first_token_seconds', 'Time from request to first generated token')
+TOKENS_PER_SECOND = METRICS.histogram(
+    'dentibuddy_ollama_tokens_per_second', 'Generation speed from eval_count/eval_duration', RATE_BUCKETS)
+PROMPT_CHARS = METRICS.histogram(
+    'dentibuddy_prompt_chars', 'Length of user questions in characters', SIZE_BUCKETS)
+QUERY_ERRORS = METRICS.counter(
+    'dentibuddy_ollama_errors_total', 'Failed questions by error type')
+TRIAGE_SECONDS = METRICS.histogram(
+    'dentibuddy_triage_duration_seconds', 'Time spent in detect_emergency', FAST_BUCKETS)
+STATUS_PROBE_SECONDS = METRICS.histogram(
+    'dentibuddy_status_probe_duration_seconds', 'Time spent in get_model_status')
+EMERGENCY_TEMPLATE_SECONDS = METRICS.histogram(
+    'dentibuddy_emergency_template_seconds', 'Time to the templated emergency answer', FAST_BUCKETS)
+PROMPT_EVAL_SAVED_SECONDS = METRICS.histogram(
+    'dentibuddy_prompt_eval_saved_seconds', 'Prompt evaluation time saved by reusing conversation context')
+MODEL_START_SECONDS = METRICS.histogram(
+    'dentibuddy_ollama_start_seconds', 'Time to first token, by whether the model had to be loaded')
+MODEL_LOAD_SECONDS = METRICS.histogram(
+    'dentibuddy_ollama_model_load_seconds', 'Model load time reported by Ollama on cold starts')
+MODEL_WARMUP_SECONDS = METRICS.histogram(
+    'dentibuddy_model_warmup_seconds', 'Duration of background warm-up and keep-alive requests')
+RETRIEVAL_SECONDS = METRICS.histogram(
+    'dentibuddy_retrieval_duration_seconds', 'Time to search the approved guidance index', FAST_BUCKETS)
+RETRIEVAL_OUTCOMES = METRICS.counter(
+    'dentibuddy_retrieval_total', 'Guidance lookups by outcome (direct answer, prompt snippets or none)')
+EMERGENCY_MODEL_WAIT_SECONDS = METRICS.histogram(
+    'dentibuddy_emergency_model_wait_seconds',
+    'Time emergency answers waited on the model after the template, by outcome')
+VARIANT_SECONDS = METRICS.histogram(
+    'dentibuddy_variant_request_duration_seconds', 'Time to a generated answer, by model variant')
+VARIANT_FIRST_TOKEN_SECONDS = METRICS.histogram(
+    'dentibuddy_variant_time_to_first_token_seconds', 'Time to first generated token, by model variant')
+VARIANT_REQUESTS = METRICS.counter(
+    'dentibuddy_variant_requests_total', 'Questions routed to each model variant, by outcome')
+
+# Ollama's load_duration above this means the model was loaded for the request
+COLD_LOAD_SECONDS = 0.5
+# Failures that happen before the model is asked, for the latency source label
+FAILURE_SOURCES = {'busy_error': 'queue', 'circuit_open': 'circuit'}
+
+
+def timed(histogram):
+    """Decorator recording each call's wall time in a histogram"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+class DentiBuddy:
+    """
+    DentiBuddy - A privacy-focused dental AI assistant
+    """
+    
+    def __init__(self):
+        # Use 127.0.0.1 instead of localhost for better reliability. Several
+        # comma-separated URLs spread the load over multiple Ollama servers.
+        self.ollama_urls = parse_backend_urls(os.getenv("OLLAMA_URL", "http://127.0.0.1:11434/api/generate"))
+        self.ollama_url = self.ollama_urls[0]
+        # Model, generation options, timeouts, variants and triage keywords
+        # come from the hot-reloaded config (see config.py)
+        self.config = get_config_watcher()
+        self._emergency_deadline: Optional[float] = None
+        self.max_response_length = 300
+        # Token budget for each session's conversation memory
+        self.context_tokens = int(os.getenv("DENTIBUDDY_CONTEXT_TOKENS", "1024"))
+        # Sent with every request so Ollama keeps the model loaded between questions
+        self.keep_alive = os.getenv("DENTIBUDDY_KEEP_ALIVE", "30m")
+        # Shared by every session in this process
+        self.response_cache = get_response_cache()
+        self.http_client = get_http_client()
+        self.scheduler = get_scheduler()
+        self.backends = get_backend_pool(self.ollama_urls)
+        self.single_flight = get_single_flight()
+        self.retriever = get_retriever()
+        self.circuit = get_circuit_breaker()
+        self.event_log = get_event_log()
+        # Question text is only logged when explicitly allowed
+        self.log_question_text = os.getenv("DENTIBUDDY_EVENT_LOG_TEXT", "0") == "1"
+        self.budget = get_generation_controller(
+            self.max_response_length, self.generation_options['num_predict'], self.timeout
+        )
+        self.warmer = None
+        if os.getenv("DENTIBUDDY_WARMUP", "1") != "0":
+            self.warmer = get_model_warmer(
+                ','.join(self.ollama_urls), self.model_name, self._warm_model,
+                keep_alive_seconds=parse_keep_alive(self.keep_alive),
+                hours=parse_hours(os.getenv("DENTIBUDDY_WARM_HOURS", "7-19")),
+            )
+        self._register_metrics()
+
+    @property
+    def model_name(self) -> str:
+        return self.config.current()['default']['model']
+
+    @property
+    def generation_options(self) -> Dict[str, Any]:
+        return self.config.current()['default']['generation_options']
+
+    @property
+    def timeout(self) -> float:
+        return self.config.current()['default']['timeout']
+
+    @property
+    def cold_timeout(self) -> float:
+        """Read timeout when the model is probably not loaded yet"""
+        return self.config.current()['default']['cold_timeout']
+
+    @property
+    def emergency_deadline(self) -> float:
+        """How long a HIGH-severity answer waits for the model after the template"""
+        if self._emergency_deadline is not None:
+            return self._emergency_deadline
+        return self.config.current()['emergency_deadline']
+
+    @emergency_deadline.setter
+    def emergency_deadline(self, seconds: float) -> None:
+        # Pins the deadline for this instance, ignoring the config file
+        self._emergency_deadline = seconds
+        
+    def generate_session_id(self) -> str:
+        """Generate a cryptographically secure hashed session ID for privacy"""
+        timestamp = str(time.time())
+        random_component = str(hash(timestamp + str(os.urandom(16))))
+        combined = f"{timestamp}_{random_component}"
+        return hashlib.sha256(combined.encode()).hexdigest()[:16]
+    
+    def _register_metrics(self) -> None:
+        """Expose the shared subsystems' counters and start the exporter if configured"""
+        cache, http_client, scheduler, backends = self.response_cache, self.http_client, self.scheduler, self.backends
+        single_flight = self.single_flight
+        cache_events = ('exact_hits', 'fuzzy_hits', 'misses', 'skipped', 'evictions', 'expired')
+        METRICS.gauge('dentibuddy_cache_events_total', 'Response cache lookups and evictions',
+                      lambda: {METRICS.labels(event=event): cache.stats()[event] for event in cache_events},
+                      metric_type='counter')
+        METRICS.gauge('dentibuddy_http_in_flight', 'Requests currently using the Ollama connection pool',
+                      lambda: http_client.stats()['in_flight'])
+        METRICS.gauge('dentibuddy_http_pool_utilization', 'In-flight requests / pool size',
+                      lambda: http_client.stats()['utilization'])
+        METRICS.gauge('dentibuddy_queue_depth', 'Questions waiting for a model slot',
+                      lambda: scheduler.stats()['queue_depth'])
+        METRICS.gauge('dentibuddy_queue_in_flight', 'Generations currently holding a model slot',
+                      lambda: scheduler.stats()['in_flight'])
+        METRICS.gauge('dentibuddy_backend_in_flight', 'Outstanding requests per Ollama backend',
+                      lambda: {METRICS.labels(backend=backend['url']): backend['in_flight'] for backend in backends.stats()})
+        METRICS.gauge('dentibuddy_backend_errors_total', 'Failed requests and probes per Ollama backend',
+                      lambda: {METRICS.labels(backend=backend['url']): backend['errors'] for backend in backends.stats()},
+                      metric_type='counter')
+
+        budget = self.budget
+        METRICS.gauge('dentibuddy_budget_num_predict', 'num_predict chosen for the latest generation',
+                      lambda: budget.stats()['last_num_predict'])
+        METRICS.gauge('dentibuddy_budget_chars', 'Character budget chosen for the latest generation',
+                      lambda: budget.stats()['last_char_budget'])
+        METRICS.gauge('dentibuddy_budget_timeout_seconds', 'Read timeout chosen for the latest generation',
+                      lambda: budget.stats()['last_timeout'])
+        METRICS.gauge('dentibuddy_budget_scale', 'Output budget scale (1 = full length)',
+                      lambda: budget.stats()['scale'])
+        METRICS.gauge('dentibuddy_chars_per_token', 'Observed characters per generated token',
+                      lambda: budget.stats()['chars_per_token'])
+        METRICS.gauge('dentibuddy_budget_adjustments_total', 'Budget scale changes by direction',
+                      lambda: {METRICS.labels(direction='shrink'): budget.stats()['shrinks'],
+                               METRICS.labels(direction='grow'): budget.stats()['grows']},
+                      metric_type='counter')
+        METRICS.gauge('dentibuddy_coalesced_requests_total',
+                      'Model calls avoided by joining an identical in-flight question',
+                      lambda: single_flight.stats()['coalesced'], metric_type='counter')
+
+        event_log = self.event_log
+        if event_log is not None:
+            METRICS.gauge('dentibuddy_event_log_events_total', 'Analytics events by outcome (written, dropped, failed)',
+                          lambda: {METRICS.labels(outcome=outcome): event_log.stats()[outcome]
+                                   for outcome in ('written', 'dropped', 'failed')},
+                          metric_type='counter')
+            METRICS.gauge('dentibuddy_event_log_queue_depth', 'Analytics events waiting to be written',
+                          lambda: event_log.stats()['queue_depth'])
+            METRICS.gauge('dentibuddy_event_log_flush_seconds', 'Duration of the latest event log write',
+                          lambda: event_log.stats()['last_flush_seconds'])
+
+        circuit = self.circuit
+        if circuit is not None:
+            METRICS.gauge('dentibuddy_circuit_state', 'Ollama circuit breaker state (1 for the current one)',
+                          lambda: {METRICS.labels(state=state): int(circuit.stats()['state'] == state)
+                                   for state in (CLOSED, OPEN, HALF_OPEN)})
+            METRICS.gauge('dentibuddy_circuit_transitions_total', 'Circuit breaker state changes',
+                          lambda: {METRICS.labels(from_state=transition.split('->')[0],
+                                                  to_state=transition.split('->')[1]): count
+                                   for transition, count in circuit.stats()['transitions'].items()},
+                          metric_type='counter')
+            METRICS.gauge('dentibuddy_circuit_rejected_total', 'Ollama calls refused while the circuit was open',
+                          lambda: circuit.stats()['rejected'], metric_type='counter')
+
+        config = self.config
+        METRICS.gauge('dentibuddy_config_version', 'Number of config snapshots applied since start',
+                      lambda: config.stats()['version'])
+        METRICS.gauge('dentibuddy_config_reloads_total', 'Config file loads by outcome (applied, rejected)',
+                      lambda: {METRICS.labels(outcome='applied'): config.stats()['reloads'],
+                               METRICS.labels(outcome='rejected'): config.stats()['errors']},
+                      metric_type='counter')
+
+        port = os.getenv("DENTIBUDDY_METRICS_PORT")
+        if port:
+            METRICS.start_exporter(int(port), host=os.getenv("DENTIBUDDY_METRICS_HOST", "127.0.0.1"))
+
+    @timed(TRIAGE_SECONDS)
+    def detect_emergency(self, user_input: str) -> Dict[str, Any]:
+        """
+        Comprehensive emergency detection for dental pain and urgent situations
+        Returns dict with emergency status and detected triggers
+        """
+        # Keyword tables and patterns are compiled once per config version
+        # and matched in a single pass over the message
+        return self.config.triage_engine().scan(user_input)
+    
+    def query_ollama(self, prompt: str, use_cache: bool = True,
+                     priority: int = PRIORITY_NORMAL,
+                     conversation: Optional[ConversationMemory] = None,
+                     severity: Optional[str] = None, follow_up: bool = False) -> Dict[str, Any]:
+        """
+        Query Ollama with comprehensive error handling and response processing.
+        Set use_cache=False to always generate a fresh answer (e.g. emergencies).
+        Pass the session's conversation to answer follow-up questions in context
+        (follow_up=True marks one that does not refer back on its own), and the
+        triage severity so the question can be routed to a model variant.
+        """
+        stream = self.stream_ollama(prompt, use_cache=use_cache, priority=priority,
+                                    conversation=conversation, severity=severity, follow_up=follow_up)
+        while True:
+            try:
+                next(stream)
+            except StopIteration as finished:
+                return finished.value
+
+    def answer_batch(self, input_path: str, output_path: str, **kwargs) -> Dict[str, Any]:
+        """
+        Triage and answer a CSV/JSONL file of questions without the UI.
+        Results are written to output_path (JSONL, or CSV by extension) as
+        they complete, and an interrupted run resumes from its checkpoint.
+        Keyword arguments are passed to batch.run_batch (column, id_column,
+        concurrency, triage_workers, answer, checkpoint_path, restart).
+        Returns summary counts for the run.
+        """
+        # Pulls in multiprocessing and csv, which the UI never needs
+        from batch import run_batch
+        return run_batch(self, input_path, output_path, **kwargs)
+
+    def stream_ollama(self, prompt: str, use_cache: bool = True, priority: int = PRIORITY_NORMAL,
+                      on_queue: Optional[Callable[[int, float], None]] = None,
+                      conversation: Optional[ConversationMemory] = None,
+                      severity: Optional[str] = None, offline: bool = False,
+                      follow_up: bool = False
+                      ) -> Generator[str, None, Dict[str, Any]]:
+        """
+        Stream the answer as cleaned incremental text.
+        Yields fragments as soon as they are final, stops reading from Ollama
+        once max_response_length is reached, and returns the same dict as
+        query_ollama (plus time_to_first_token) when exhausted.
+        The generation waits for a slot in the shared scheduler first;
+        on_queue(position, estimated_wait) is called while it is queued.
+        With a conversation, the new turn is recorded, and if the question
+        is a follow-up (follow_up=True, or it refers back to earlier turns)
+        those turns are sent along, as Ollama's context array when possible.
+        Questions that stand on their own are answered like any other, with
+        the cache, shared answers and direct guidance.
+        The model and its options come from the route the config picks for
+        `severity`: the default model or one of the A/B variants.
+        With offline=True (the health check says Ollama or the model is
+        unavailable) the model is not tried and a degraded answer is served.
+        """
+        start_time = time.time()
+        route = self.config.route(severity)
+        history = None
+        if conversation is not None and not (follow_up or conversation.is_follow_up(prompt)):
+            history, conversation = conversation, None
+        if offline:
+            guidance = self.retriever.retrieve(prompt, allow_direct=False) if self.retriever is not None else None
+            result = yield from self._degraded_answer(prompt, False, route, guidance, severity, time.time())
+        elif conversation:
+            # Follow-ups depend on this session's history, so never share them
+            result = yield from self._generate(prompt, use_cache, priority, on_queue, conversation, route, severity)
+        else:
+            result = yield from self._coalesced_generate(prompt, use_cache, priority, on_queue, conversation,
+                                                         route, severity)
+        if history is not None and result.get('success'):
+            # Kept as text so a later follow-up can refer back to it
+            history.record(prompt, result['response'])
+        if not result.get('guidance_direct'):
+            result = dict(result, variant=route['name'])
+        self._record_query_metrics(prompt, result, time.time() - start_time)
+        return result
+
+    def _coalesced_generate(self, prompt: str, use_cache: bool, priority: int,
+                            on_queue: Optional[Callable[[int, float], None]],
+                            conversation: Optional[ConversationMemory], route: Dict[str, Any],
+                            severity: Optional[str]
+                            ) -> Generator[str, None, Dict[str, Any]]:
+        """
+        Run _generate, or attach to an identical generation already in
+        progress on the same route and stream its output instead
+        """
+        scope = ResponseCache.make_scope(route['model'], route['generation_options'])
+        key = f"{route['name']}:" + ResponseCache.make_key(scope, normalize_prompt(prompt))
+        if not use_cache:
+            # A fresh answer must not be served from a leader's cache hit
+            key += ':fresh'
+        flight, leader = self.single_flight.join(key)
+
+        if leader:
+            result = None
+            try:
+                stream = self._generate(prompt, use_cache, priority, on_queue, conversation, route, severity)
+                while True:
+                    try:
+                        fragment = next(stream)
+                    except StopIteration as finished:
+                        result = finished.value
+                        break
+                    flight.publish(fragment)
+                    yield fragment
+            finally:
+                # None tells followers the leader was abandoned mid-stream
+                self.single_flight.done(key, flight, result)
+            return result
+
+        start_time = time.time()
+        first_fragment_time = None
+        follower = flight.follow()
+        while True:
+            try:
+                fragment = next(follower)
+            except StopIteration as finished:
+                result = finished.value
+                break
+            if first_fragment_time is None:
+                first_fragment_time = time.time()
+            yield fragment
+
+        if result is None:
+            if first_fragment_time is None:
+                # Nothing shown yet, so generate our own answer
+                return (yield from self._generate(prompt, use_cache, priority, on_queue, conversation, route, severity))
+            return {
+                'success': False,
+                'error': "The answer was interrupted. Please ask again.",
+                'error_type': 'unknown_error',
+                'coalesced': True
+            }
+
+        if result['success'] and conversation is not None:
+            conversation.record(prompt, result['response'])
+        end_time = time.time()
+        return dict(
+            result,
+            response_time=end_time - start_time,
+            time_to_first_token=(first_fragment_time or end_time) - start_time,
+            coalesced=True
+        )
+
+    def stream_emergency(self, prompt: str, emergency_info: Dict[str, Any],
+                         deadline: Optional[float] = None) -> Generator[str, None, Dict[str, Any]]:
+        """
+        Fast path for HIGH-severity questions. Yields the precomputed
+        first-aid template at once, then asks the model in the background and
+        appends its answer only if it finishes within the deadline (default
+        emergency_deadline seconds). A late generation is abandoned at its
+        next token so it gives its model slot back.
+        """
+        start_time = time.time()
+        template = emergency_template(emergency_info)
+        template_time = time.time() - start_time
+        EMERGENCY_TEMPLATE_SECONDS.observe(template_time)
+        yield template
+
+        outcome: Dict[str, Any] = {}
+        finished = threading.Event()
+        abandoned = threading.Event()
+
+        def generate() -> None:
+            stream = self.stream_ollama(prompt, use_cache=False, priority=PRIORITY_HIGH,
+                                        severity=emergency_info['severity'])
+            try:
+                while not abandoned.is_set():
+                    next(stream)
+            except StopIteration as done:
+                outcome.update(done.value)
+            except Exception as e:
+                outcome.update({'success': False, 'error': str(e), 'error_type': 'unknown_error'})
+            finally:
+                stream.close()
+                finished.set()
+
+        threading.Thread(target=generate, name="dentibuddy-emergency", daemon=True).start()
+        wait_start = time.time()
+        if not finished.wait(self.emergency_deadline if deadline is None else deadline):
+            abandoned.set()
+        if abandoned.is_set():
+            model_status = 'deadline'
+        elif outcome.get('degraded'):
+            # The template already says what to do; a fallback answer adds nothing
+            model_status = 'circuit_open'
+        else:
+            model_status = 'completed' if outcome.get('success') else outcome.get('error_type')
+        EMERGENCY_MODEL_WAIT_SECONDS.observe(time.time() - wait_start, outcome=model_status)
+
+        response = template
+        if model_status == 'completed' and outcome['response']:
+            yield ' ' + outcome['response']
+            response += ' ' + outcome['response']
+
+        result = {
+            'success': True,
+            'response': response,
+            'model_used': outcome.get('model_used') or self.model_name,
+            'variant': outcome.get('variant'),
+            'response_time': time.time() - start_time,
+            'time_to_first_token': template_time,
+            'queue_time': outcome.get('queue_time'),
+            'backend': outcome.get('backend'),
+            'cache_status': 'skipped',
+            'fast_path': True,
+            'model_status': model_status
+        }
+        self._record_query_metrics(prompt, result, result['response_time'])
+        return result
+
+    def log_question(self, session_id: Optional[str], question: str,
+                     emergency_info: Dict[str, Any], result: Dict[str, Any]) -> None:
+        """
+        Queue an anonymized analytics event for an answered question. The
+        session ID is hashed again with the event log's salt, and the question
+        is logged only as its length unless DENTIBUDDY_EVENT_LOG_TEXT=1.
+        Never blocks; events are dropped if the log falls behind.
+        """
+        if self.event_log is None:
+            return
+        event = {
+            'ts': round(time.time(), 3),
+            'session': self.event_log.hash_session(session_id),
+            'severity': emergency_info['severity'],
+            'categories': emergency_info.get('categories', []),
+            'success': result['success'],
+            'error_type': result.get('error_type'),
+            'source': self._answer_source(result) if result['success'] else None,
+            'cache_status': result.get('cache_status'),
+            'model': result.get('model_used') or self.model_name,
+            'variant': result.get('variant'),
+            'backend': result.get('backend'),
+            'latency': result.get('response_time'),
+            'first_token': result.get('time_to_first_token'),
+            'queue_time': result.get('queue_time'),
+            'question_chars': len(question),
+        }
+        if self.log_question_text:
+            event['question'] = question
+        self.event_log.record(event)
+
+    def _answer_source(self, result: Dict[str, Any]) -> str:
+        """Where an answer came from, or for a failure, the stage that failed"""
+        if not result['success']:
+            if result.get('coalesced'):
+                return 'coalesced'
+            return FAILURE_SOURCES.get(result['error_type'], 'model')
+        if result.get('fast_path'):
+            return 'template'
+        if result.get('degraded'):
+            return 'degraded'
+        if result.get('cache_status') in ('exact', 'fuzzy'):
+            return 'cache'
+        return ('guidance' if result.get('guidance_direct')
+                else 'coalesced' if result.get('coalesced') else 'model')
+
+    def _record_query_metrics(self, prompt: str, result: Dict[str, Any], seconds: float) -> None:
+        """Record a finished question; `seconds` is its wall time, for results without a response_time"""
+        if result.get('fast_path'):
+            # The model call behind the template records the question and its variant itself
+            REQUEST_SECONDS.observe(result['response_time'], source='template', status='success')
+            return
+        PROMPT_CHARS.observe(len(prompt))
+        variant = result.get('variant')
+        if not result['success']:
+            # Failures count too, or slow timeouts would vanish from the latency percentiles
+            REQUEST_SECONDS.observe(result.get('response_time', seconds), source=self._answer_source(result),
+                                    status=result['error_type'])
+            QUERY_ERRORS.inc(error_type=result['error_type'])
+            if variant:
+                VARIANT_REQUESTS.inc(variant=variant, outcome=result['error_type'])
+            return
+        source = self._answer_source(result)
+        REQUEST_SECONDS.observe(result['response_time'], source=source, status='success')
+        if variant:
+            VARIANT_REQUESTS.inc(variant=variant, outcome=source)
+        # Generation stats are recorded once, by the request that ran the model
+        if source == 'model':
+            FIRST_TOKEN_SECONDS.observe(result['time_to_first_token'])
+            if variant:
+                VARIANT_SECONDS.observe(result['response_time'], variant=variant)
+                VARIANT_FIRST_TOKEN_SECONDS.observe(result['time_to_first_token'], variant=variant)
+            if result.get('tokens_per_second'):
+                TOKENS_PER_SECOND.observe(result['tokens_per_second'])
+            if result.get('model_start'):
+                MODEL_START_SECONDS.observe(result['time_to_first_token'], start=result['model_start'])
+                if result['model_start'] == 'cold' and result.get('load_time'):
+                    MODEL_LOAD_SECONDS.observe(result['load_time'])
+            if result.get('prompt_eval_saved') is not None:
+                PROMPT_EVAL_SAVED_SECONDS.observe(result['prompt_eval_saved'])
+
+    def _generate(self, prompt: str, use_cache: bool, priority: int,
+                  on_queue: Optional[Callable[[int, float], None]],
+                  conversation: Optional[ConversationMemory], route: Dict[str, Any],
+                  severity: Optional[str]
+                  ) -> Generator[str, None, Dict[str, Any]]:
+        """Body of stream_ollama, without instrumentation"""
+        start_time = time.time()
+        model_name, options = route['model'], route['generation_options']
+        guidance = None
+        if self.retriever is not None:
+            # Follow-ups lean on earlier turns, and emergency-flagged questions
+            # need an answer about this patient, so both only get snippets
+            guidance = self.retriever.retrieve(
+                prompt, allow_direct=not conversation and severity not in ('MODERATE', 'HIGH'),
+                max_chars=self.max_response_length)
+            RETRIEVAL_SECONDS.observe(guidance['seconds'])
+            RETRIEVAL_OUTCOMES.inc(outcome=guidance['outcome'])
+            if guidance['answer'] is not None:
+                answer = guidance['answer']['text']
+                yield answer
+                if conversation is not None:
+                    conversation.record(prompt, answer)
+                response_time = time.time() - start_time
+                return {
+                    'success': True,
+                    'response': answer,
+                    'model_used': 'Approved guidance',
+                    'response_time': response_time,
+                    'time_to_first_token': response_time,
+                    'cache_status': 'skipped',
+                    'guidance_direct': True,
+                    'guidance_sources': [guidance['answer']['title']],
+                    'guidance_confidence': guidance['answer']['confidence'],
+                    'retrieval_time': guidance['seconds']
+                }
+
+        # Cached answers are keyed on the question alone, so follow-ups bypass the cache
+        use_cache = use_cache and not conversation
+        if not use_cache:
+            self.response_cache.record_skip()
+        else:
+            cached = self.response_cache.get(prompt, model_name, options)
+            if cached is not None:
+                yield cached['response']
+                if conversation is not None:
+                    conversation.record(prompt, cached['response'])
+                response_time = time.time() - start_time
+                return {
+                    'success': True,
+                    'response': cached['response'],
+                    'model_used': model_name,
+                    'response_time': response_time,
+                    'time_to_first_token': response_time,
+                    'cache_status': cached['cache_tier']
+                }
+
+        if self.circuit is None:
+            return (yield from self._ask_model(prompt, use_cache, priority, on_queue, conversation,
+                                               route, guidance, start_time))
+        admitted = self.circuit.allow()
+        if admitted is None:
+            # Ollama is known to be failing: answer now instead of waiting on a timeout
+            return (yield from self._degraded_answer(prompt, use_cache, route, guidance, severity, start_time))
+        result = None
+        try:
+            result = yield from self._ask_model(prompt, use_cache, priority, on_queue, conversation,
+                                                route, guidance, start_time)
+        finally:
+            if result is None:
+                # Abandoned mid-stream (e.g. past the emergency deadline)
+                self.circuit.release(admitted)
+            else:
+                self.circuit.record(admitted, result.get('error_type'))
+        if result.get('error_type') == 'circuit_open':
+            return (yield from self._degraded_answer(prompt, use_cache, route, guidance, severity, start_time))
+        return result
+
+    def _degraded_answer(self, prompt: str, use_cache: bool, route: Dict[str, Any],
+                         guidance: Optional[Dict[str, Any]], severity: Optional[str],
+                         start_time: float) -> Generator[str, None, Dict[str, Any]]:
+        """
+        Answer while Ollama is unavailable (circuit open or health check
+        failing): a cached answer (even for questions that normally bypass
+        the cache), else the best approved guidance snippet, else a fixed
+        template
+        """
+        cached = None if use_cache else self.response_cache.get(prompt, route['model'], route['generation_options'])
+        snippets = guidance['snippets'] if guidance is not None else []
+        if cached is not None:
+            answer, model_used, cache_status = cached['response'], route['model'], cached['cache_tier']
+        elif snippets:
+            answer, model_used, cache_status = snippets[0]['text'], 'Approved guidance', 'skipped'
+        else:
+            answer, model_used, cache_status = unavailable_template(severity), 'Offline template', 'skipped'
+        yield answer
+        response_time = time.time() - start_time
+        return {
+            'success': True,
+            'response': answer,
+            'model_used': model_used,
+            'response_time': response_time,
+            'time_to_first_token': response_time,
+            'cache_status': cache_status,
+            'guidance_sources': [snippets[0]['title']] if cached is None and snippets else [],
+            'degraded': True,
+            'circuit_state': self.circuit.state if self.circuit is not None else None,
+            'circuit_error_type': self.circuit.last_error_type if self.circuit is not None else None
+        }
+
+    def _ask_model(self, prompt: str, use_cache: bool, priority: int,
+                   on_queue: Optional[Callable[[int, float], None]],
+                   conversation: Optional[ConversationMemory], route: Dict[str, Any],
+                   guidance: Optional[Dict[str, Any]], start_time: float
+                   ) -> Generator[str, None, Dict[str, Any]]:
+        """Generate the answer with Ollama, failing over between backends"""
+        model_name, options = route['model'], route['generation_options']
+        try:
+            snippets = guidance['snippets'] if guidance is not None else []
+            reference = ''.join(f"- {snippet['text']}\n" for snippet in snippets)
+            reference = f"Approved guidance to base the answer on:\n{reference}" if reference else ''
+
+            context = conversation.reusable_context(model_name) if conversation is not None else None
+            if context:
+                # The server already holds the instructions and earlier turns
+                dental_prompt = f"""
+            {reference}
+            Question: {prompt}
+            
+            Short response:"""
+            else:
+                history = conversation.history_text() if conversation is not None else ''
+                history = f"Conversation so far:\n{history}\n" if history else ''
+                # Optimized prompt for Gemma model
+                dental_prompt = f"""You are DentiBuddy, a dental health assistant.
+            Provide helpful, accurate dental guidance in 1-2 short sentences.
+            If serious, recommend seeing a dentist immediately.
+            {history}{reference}
+            Question: {prompt}
+            
+            Short response:"""
+            
+            payload = {
+                "model": model_name,
+                "prompt": dental_prompt,
+                "stream": True,
+                "keep_alive": self.keep_alive,
+                "options": options
+            }
+            if context:
+                payload["context"] = context
+            
+            was_loaded = self.warmer is None or self.warmer.is_loaded()
+            read_timeout = route['timeout']
+            # The adaptive timeout learns from default-model latencies only
+            variant = route['name'] != 'default'
+
+            tried = []
+            with self.scheduler.slot(priority, on_wait=on_queue) as ticket:
+                if self.circuit is not None and self.circuit.state == OPEN:
+                    # Opened while this question was queued
+                    raise CircuitOpen()
+                # Sized once admitted, so the queue depth is current
+                budget = self.budget.decide(queue_depth=self.scheduler.stats()['queue_depth'],
+                                            max_tokens=options['num_predict'], max_timeout=route['timeout'])
+                max_length = budget['char_budget']
+                payload["options"] = dict(options, num_predict=budget['num_predict'])
+                # A cold model can take longer to load than to answer
+                if not was_loaded:
+                    read_timeout = max(route['timeout'], route['cold_timeout'])
+                elif not variant:
+                    read_timeout = budget['timeout']
+
+                while True:
+                    backend = self.backends.acquire(exclude=tried)
+                    tried.append(backend)
+                    backend_start = time.time()
+                    backend_error = None
+
+                    first_token_time = None
+                    final_chunk = {}
+                    raw = ''            # Model output, with leading prefixes removed once decided
+                    emitted = ''        # Cleaned text already yielded
+                    prefixes_done = False
+                    truncated = False
+                    tokens_seen = 0     # Ollama streams one token per chunk
+
+                    try:
+                        with self.http_client.stream_post(backend.url, json=payload, timeout=read_timeout) as response:
+                            response.raise_for_status()
+
+                            # Normally read to the end of the stream (the 'done' chunk
+                            # is last) so the keep-alive connection goes back to the pool
+                            for line in response.iter_lines():
+                                if not line:
+                                    continue
+                                try:
+                                    chunk = json.loads(line)
+                                except json.JSONDecodeError:
+                                    continue
+
+                                if chunk.get('done'):
+                                    final_chunk = chunk
+                                piece = chunk.get('response', '')
+                                if piece:
+                                    tokens_seen += 1
+                                    if first_token_time is None:
+                                        first_token_time = time.time()
+                                raw += piece
+
+                                if not prefixes_done:
+                                    stripped = self._strip_prefixes(raw, final=False)
+                                    if stripped is None:
+                                        continue
+                                    raw, prefixes_done = stripped, True
+
+                                cleaned = ' '.join(raw.split())
+                                if len(cleaned) > max_length:
+                                    # Stop reading: closing the stream frees the model
+                                    truncated = True
+                                    break
+
+                                # Only emit complete words; the last one may still grow
+                                complete = cleaned if raw[-1:].isspace() else cleaned.rpartition(' ')[0]
+                                if len(emitted) < len(complete) < max_length:
+                                    yield complete[len(emitted):]
+                                    emitted = complete
+                        break
+
+                    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                        backend_error = 'timeout_error' if isinstance(e, requests.exceptions.Timeout) else 'connection_error'
+                        # Fail over to another backend unless the user already
+                        # saw part of this answer or every backend was tried
+                        if emitted or len(tried) == len(self.backends.backends):
+                            raise
+
+                    except requests.exceptions.HTTPError:
+                        backend_error = 'server_error'
+                        raise
+
+                    finally:
+                        self.backends.release(
+                            backend,
+                            latency=(first_token_time - backend_start) if first_token_time else None,
+                            error=backend_error
+                        )
+
+            if not prefixes_done:
+                raw = self._strip_prefixes(raw, final=True)
+            answer = ' '.join(raw.split())
+            if not truncated and answer and not answer.endswith(('.', '!', '?')):
+                answer += '.'
+            
+            # Slightly longer responses allowed since model is faster
+            if len(answer) > max_length:
+                answer = answer[:max_length]
+                answer = answer.rsplit(' ', 1)[0] + "..."
+
+            if len(answer) > len(emitted):
+                yield answer[len(emitted):]
+            
+            end_time = time.time()
+
+            # Ollama reports generation stats in the final chunk, unless the
+            # stream was cut short at max_response_length
+            tokens_per_second = None
+            if final_chunk.get('eval_count') and final_chunk.get('eval_duration'):
+                tokens_per_second = final_chunk['eval_count'] / (final_chunk['eval_duration'] / 1e9)
+
+            if not variant:
+                self.budget.observe(
+                    end_time - start_time,
+                    first_token=(first_token_time - backend_start) if first_token_time else None,
+                    chars=len(raw),
+                    tokens=final_chunk.get('eval_count') or tokens_seen
+                )
+
+            # Answers shortened under load are not worth keeping
+            if use_cache and answer and max_length >= self.max_response_length:
+                self.response_cache.put(prompt, model_name, options, answer)
+
+            if self.warmer is not None:
+                self.warmer.mark_used()
+            # load_duration is only large when Ollama had to load the model
+            load_time = final_chunk['load_duration'] / 1e9 if final_chunk.get('load_duration') else None
+            cold = load_time > COLD_LOAD_SECONDS if load_time is not None else not was_loaded
+
+            prompt_eval_saved = None
+            if conversation is not None and answer:
+                prompt_eval_saved = conversation.record(
+                    prompt, answer, final_chunk.get('context'),
+                    final_chunk.get('prompt_eval_count'), final_chunk.get('prompt_eval_duration'),
+                    context_reused=len(context or ()), model=model_name
+                )
+
+            return {
+                'success': True,
+                'response': answer,
+                'model_used': model_name,
+                'response_time': end_time - start_time,
+                'time_to_first_token': (first_token_time or end_time) - start_time,
+                'queue_time': ticket.granted_at - ticket.enqueued_at,
+                'backend': backend.url,
+                'tokens_per_second': tokens_per_second,
+                'num_predict': budget['num_predict'],
+                'char_budget': max_length,
+                'read_timeout': read_timeout,
+                'guidance_sources': list(dict.fromkeys(snippet['title'] for snippet in snippets)),
+                'retrieval_time': guidance['seconds'] if guidance is not None else None,
+                'model_start': 'cold' if cold else 'warm',
+                'load_time': load_time,
+                'context_tokens_reused': len(context or ()),
+                'prompt_eval_saved': prompt_eval_saved,
+                'cache_status': 'miss' if use_cache else 'skipped'
+            }
+                
+        except CircuitOpen:
+            return {
+                'success': False,
+                'error': "Ollama is not responding, so no new answers are being generated for now.",
+                'error_type': 'circuit_open'
+            }
+
+        except QueueTimeout:
+            return {
+                'success': False,
+                'error': f"DentiBuddy is very busy right now and no model slot freed up within {self.scheduler.queue_timeout:.0f} seconds. Please try again shortly.",
+                'error_type': 'busy_error'
+            }
+
+        except requests.exceptions.HTTPError as e:
+            if e.response.status_code == 404:
+                return {
+                    'success': False,
+                    'error': f"Model '{model_name}' not found. Try: ollama pull {model_name}",
+                    'error_type': 'model_not_found'
+                }
+            else:
+                return {
+                    'success': False,
+                    'error': f"Ollama server error (HTTP {e.response.status_code}): {e.response.text}",
+                    'error_type': 'server_error'
+                }
+
+        except requests.exceptions.ConnectionError:
+            return {
+                'success': False,
+                'error': f"Cannot connect to Ollama at {', '.join(backend.url for backend in tried) or self.ollama_url}. Make sure it's running: 'ollama serve'",
+                'error_type': 'connection_error'
+            }
+        
+        except requests.exceptions.Timeout:
+            return {
+                'success': False,
+                'error': f"Request timed out after {read_timeout:.0f} seconds. The model may be too slow. Try again.",
+                'error_type': 'timeout_error'
+            }
+        
+        except requests.exceptions.RequestException as e:
+            return {
+                'success': False,
+                'error': f"Network error: {str(e)[:50]}...",
+                'error_type': 'network_error'
+            }
+        
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f"Unexpected error while processing response: {str(e)[:50]}...",
+                'error_type': 'unknown_error'
+            }
+    
+    def _clean_response(self, response: str) -> str:
+        """Clean and format the AI response"""
+        response = self._strip_prefixes(response.strip(), final=True)
+        
+        response = ' '.join(response.split())
+        
+        if response and not response.endswith(('.', '!', '?')):
+            response += '.'
+        
+        return response
+
+    def _strip_prefixes(self, response: str, final: bool) -> Optional[str]:
+        """
+        Remove boilerplate prefixes the model likes to start with. While
+        streaming (final=False), returns None if more text is needed to decide.
+        """
+        prefixes_to_remove = [
+            'DentiBuddy says:', 'Answer:', 'Response:', 
+            'I recommend:', 'My advice:', 'Suggestion:'
+        ]
+
+        response = response.lstrip()
+
+        for prefix in prefixes_to_remove:
+            if response.lower().startswith(prefix.lower()):
+                response = response[len(prefix):].lstrip()
+            elif not final and prefix.lower().startswith(response.lower()):
+                return None
+
+        return response
+    
+    def get_cached_model_status(self) -> Dict[str, Any]:
+        """
+        Last known model status from the process-wide background health
+        monitor. Never waits on Ollama, so page renders stay fast.
+        """
+        monitor = get_health_monitor(
+            ','.join(backend.status_url for backend in self.backends.backends),
+            self.get_model_status,
+            ttl=float(os.getenv("DENTIBUDDY_HEALTH_TTL", "5")),
+            interval=float(os.getenv("DENTIBUDDY_HEALTH_INTERVAL", "15")),
+            failure_threshold=int(os.getenv("DENTIBUDDY_HEALTH_FAILURE_THRESHOLD", "2")),
+        )
+        status = monitor.status()
+        model_name = self.model_name
+        if status.get('model') not in (None, model_name):
+            # Probed before the model was changed in the config: answer from
+            # the model list we have and probe again for the rest
+            status = dict(status, model=model_name,
+                          model_available=model_name in status.get('available_models', []),
+                          model_loaded=None)
+            monitor.refresh()
+        return status
+
+    @timed(STATUS_PROBE_SECONDS)
+    def get_model_status(self) -> Dict[str, Any]:
+        """Check if Ollama and the model are available with detailed error info"""
+        model_name = self.model_name
+        results = []
+        for backend in self.backends.backends:
+            status = self._probe_backend(backend.status_url, model_name)
+            # Probe results also eject or reinstate backends in the pool
+            self.backends.record_probe(backend, status['ollama_running'], status.get('error'))
+            results.append(status)
+
+        if len(results) == 1:
+            return results[0]
+
+        running = [status for status in results if status['ollama_running']]
+        loaded = [status.get('model_loaded') for status in running if status.get('model_loaded') is not None]
+        combined = {
+            'ollama_running': bool(running),
+            'model_available': any(status['model_available'] for status in running),
+            'model_loaded': any(loaded) if loaded else None,
+            'available_models': sorted({name for status in running for name in status['available_models']}),
+            'model': model_name,
+            'status_url': ', '.join(status['status_url'] for status in results),
+            'backends': results
+        }
+        if not running:
+            combined['error'] = '; '.join(f"{status['status_url']}: {status['error']}" for status in results)
+        return combined
+
+    def _probe_backend(self, status_url: str, model_name: str) -> Dict[str, Any]:
+        """Probe one Ollama instance's /api/tags and /api/ps endpoints for `model_name`"""
+        try:
+            response = self.http_client.get(status_url, timeout=10)  # Increased timeout
+            
+            if response.status_code == 200:
+                models = response.json().get('models', [])
+                model_names = [model['name'] for model in models]
+                
+                return {
+                    'ollama_running': True,
+                    'model_available': model_name in model_names,
+                    'model_loaded': self._probe_loaded(status_url.replace('/api/tags', '/api/ps'), model_name),
+                    'available_models': model_names,
+                    'model': model_name,
+                    'status_url': status_url
+                }
+            else:
+                return {
+                    'ollama_running': False, 
+                    'model_available': False,
+                    'error': f"HTTP {response.status_code}",
+                    'model': model_name,
+                    'status_url': status_url
+                }
+                
+        except Exception as e:
+            return {
+                'ollama_running': False,
+                'model_available': False,
+                'error': str(e),
+                'model': model_name,
+                'status_url': status_url
+            }
+
+    def _probe_loaded(self, ps_url: str, model_name: str) -> Optional[bool]:
+        """Whether the model is in memory according to /api/ps (None if unsupported)"""
+        try:
+            response = self.http_client.get(ps_url, timeout=10)
+            if response.status_code != 200:
+                return None
+            return any(model.get('name') == model_name for model in response.json().get('models', []))
+        except Exception:
+            return None
+
+    def _warm_model(self) -> Dict[str, Any]:
+        """
+        Load the model, and every variant model in the config, on every
+        backend with an empty request (used by the warmer)
+        """
+        start_time = time.time()
+        errors = []
+        models = self.config.models()
+        for backend in self.backends.backends:
+            for model_name in models:
+                try:
+                    with self.http_client.stream_post(
+                        backend.url,
+                        json={"model": model_name, "keep_alive": self.keep_alive},
+                        timeout=self.cold_timeout
+                    ) as response:
+                        response.raise_for_status()
+                        response.json()
+                except (requests.exceptions.RequestException, ValueError) as e:
+                    errors.append(f"{backend.url} ({model_name}): {str(e)[:100]}")
+        elapsed = time.time() - start_time
+        MODEL_WARMUP_SECONDS.observe(elapsed)
+        return {
+            'success': len(errors) < len(self.backends.backends) * len(models),
+            'seconds': elapsed,
+            'error': '; '.join(errors) or None
+        }
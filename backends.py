@@ -0,0 +1,134 @@
+"""
+Load balancing across several Ollama instances.
+
+OLLAMA_URL may list several /api/generate endpoints separated by commas.
+Requests go to the healthy backend with the fewest outstanding requests
+(ties broken by smoothed latency). Backends that keep failing with
+connection errors or timeouts are ejected for a while, and they come back
+once a status probe succeeds or the ejection period runs out.
+"""
+
+import threading
+import time
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+
+class Backend:
+    """One Ollama instance and its live counters"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.status_url = url.replace('/api/generate', '/api/tags')
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.consecutive_failures = 0
+        self.latency_ewma: Optional[float] = None
+        self.ejected_until = 0.0
+        self.last_error: Optional[str] = None
+
+    def is_ejected(self, now: float) -> bool:
+        return now < self.ejected_until
+
+    def snapshot(self, now: float) -> Dict[str, Any]:
+        return {
+            'url': self.url,
+            'healthy': not self.is_ejected(now),
+            'in_flight': self.in_flight,
+            'requests': self.requests,
+            'errors': self.errors,
+            'latency_ewma': self.latency_ewma,
+            'last_error': self.last_error,
+        }
+
+
+class BackendPool:
+    """
+    Least-outstanding-requests balancer with passive ejection.
+    """
+
+    def __init__(self, urls: Iterable[str], eject_after: int = 2,
+                 eject_seconds: float = 30.0, latency_alpha: float = 0.3):
+        self.backends = [Backend(url) for url in urls]
+        self.eject_after = eject_after
+        self.eject_seconds = eject_seconds
+        self.latency_alpha = latency_alpha
+        self._lock = threading.Lock()
+
+    def acquire(self, exclude: Iterable[Backend] = ()) -> Optional[Backend]:
+        """
+        Pick a backend and count the request against it. Ejected backends are
+        only used when no healthy one is left, so a full outage still gets a
+        real error instead of an empty pool.
+        """
+        excluded = set(id(backend) for backend in exclude)
+        now = time.time()
+        with self._lock:
+            candidates = [backend for backend in self.backends if id(backend) not in excluded]
+            if not candidates:
+                return None
+            healthy = [backend for backend in candidates if not backend.is_ejected(now)] or candidates
+            backend = min(healthy, key=self._load_key)
+            backend.in_flight += 1
+            backend.requests += 1
+            return backend
+
+    def release(self, backend: Backend, latency: Optional[float] = None,
+                error: Optional[str] = None) -> None:
+        """Record the outcome of a request started with acquire()"""
+        with self._lock:
+            backend.in_flight -= 1
+            if error is None:
+                backend.consecutive_failures = 0
+                if latency is not None:
+                    if backend.latency_ewma is None:
+                        backend.latency_ewma = latency
+                    else:
+                        backend.latency_ewma += self.latency_alpha * (latency - backend.latency_ewma)
+            else:
+                self._record_failure(backend, error)
+
+    def record_probe(self, backend: Backend, healthy: bool, error: Optional[str] = None) -> None:
+        """Feed in a /api/tags probe result; a good probe reinstates an ejected backend"""
+        with self._lock:
+            if healthy:
+                backend.consecutive_failures = 0
+                backend.ejected_until = 0.0
+            else:
+                self._record_failure(backend, error or 'probe_failed')
+
+    def stats(self) -> List[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            return [backend.snapshot(now) for backend in self.backends]
+
+    def _record_failure(self, backend: Backend, error: str) -> None:
+        backend.errors += 1
+        backend.consecutive_failures += 1
+        backend.last_error = error
+        if backend.consecutive_failures >= self.eject_after:
+            backend.ejected_until = time.time() + self.eject_seconds
+
+    @staticmethod
+    def _load_key(backend: Backend) -> Tuple[int, float]:
+        # Unmeasured backends sort first among equals so they get sampled
+        return (backend.in_flight, backend.latency_ewma or 0.0)
+
+
+def parse_backend_urls(value: str) -> List[str]:
+    """Split a comma-separated OLLAMA_URL into individual endpoints"""
+    return [url.strip() for url in value.split(',') if url.strip()]
+
+
+_pools: Dict[Tuple[str, ...], BackendPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_backend_pool(urls: List[str]) -> BackendPool:
+    """Process-wide pool per backend list, shared by every DentiBuddy instance"""
+    key = tuple(urls)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = BackendPool(urls)
+        return pool
@@ -0,0 +1,295 @@
+"""
+Headless batch mode for DentiBuddy.
+
+Reads questions from a CSV or JSONL file, triages them on a process pool,
+answers them through Ollama with bounded concurrency and writes one result
+per question as it goes, so memory use does not grow with the file size.
+A checkpoint next to the output records how far the run got, and a rerun
+picks up from there after an interruption.
+
+Usage: python batch.py questions.csv -o answers.jsonl [--column question]
+                       [--id-column id] [--concurrency N] [--triage-only]
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import signal
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+from scheduler import PRIORITY_HIGH, PRIORITY_NORMAL
+from config import get_config_watcher
+
+OUTPUT_FIELDS = ['row', 'id', 'is_emergency', 'severity', 'triggers', 'success',
+                 'response', 'error', 'error_type', 'cache_status', 'degraded', 'response_time']
+
+Record = Tuple[int, Any, str]
+
+
+def read_questions(path: str, column: str = 'question', id_column: str = 'id') -> Iterator[Record]:
+    """
+    Yield (row, id, question) from a .csv or .jsonl file one record at a
+    time. Rows without an id column use their row number.
+    """
+    if path.lower().endswith('.csv'):
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            for row, record in enumerate(csv.DictReader(f)):
+                yield row, record.get(id_column) or row, (record.get(column) or '').strip()
+    else:
+        with open(path, encoding='utf-8') as f:
+            row = 0
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    record = {}
+                if not isinstance(record, dict):
+                    record = {}
+                yield row, record.get(id_column, row), str(record.get(column) or '').strip()
+                row += 1
+
+
+def _ignore_interrupts() -> None:
+    """Process pool initializer: leave Ctrl-C handling to the parent"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _triage_chunk(questions: List[str]) -> List[Dict[str, Any]]:
+    """Process pool worker: triage a chunk of questions with the configured keyword lists"""
+    engine = get_config_watcher().triage_engine()
+    return [engine.scan(question) for question in questions]
+
+
+def _chunks(records: Iterator[Record], size: int) -> Iterator[List[Record]]:
+    chunk: List[Record] = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class BatchCheckpoint:
+    """
+    Progress of one batch run: how many input rows are fully written and
+    the output size at that point. Saved atomically so a crash leaves either
+    the old or the new checkpoint.
+    """
+
+    def __init__(self, path: str, input_path: str):
+        self.path = path
+        self.input_path = os.path.abspath(input_path)
+        self.rows_done = 0
+        self.output_bytes = 0
+
+    def load(self) -> bool:
+        """Resume from an existing checkpoint for the same input; returns True if found"""
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if saved.get('input') != self.input_path:
+            raise ValueError(f"Checkpoint {self.path} belongs to {saved.get('input')}, not {self.input_path}")
+        self.rows_done = saved['rows_done']
+        self.output_bytes = saved['output_bytes']
+        return True
+
+    def save(self) -> None:
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump({
+                'input': self.input_path,
+                'rows_done': self.rows_done,
+                'output_bytes': self.output_bytes,
+                'updated_at': time.time(),
+            }, f)
+        os.replace(temp_path, self.path)
+
+    def remove(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class _ResultWriter:
+    """Appends results as JSONL or CSV (by output extension) to a binary file"""
+
+    def __init__(self, path: str, offset: int):
+        self.as_csv = path.lower().endswith('.csv')
+        self.file = open(path, 'r+b' if offset else 'wb')
+        # Drop anything written after the last checkpoint
+        self.file.seek(offset)
+        self.file.truncate()
+        if self.as_csv and offset == 0:
+            self._write_csv(OUTPUT_FIELDS)
+
+    def write(self, result: Dict[str, Any]) -> None:
+        if self.as_csv:
+            row = dict(result, triggers='; '.join(result['triggers']))
+            self._write_csv([row.get(field) for field in OUTPUT_FIELDS])
+        else:
+            self.file.write((json.dumps(result, ensure_ascii=False) + '\n').encode('utf-8'))
+
+    def sync(self) -> int:
+        """Flush to disk and return the output size"""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return self.file.tell()
+
+    def close(self) -> None:
+        self.file.close()
+
+    def _write_csv(self, values: List[Any]) -> None:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(values)
+        self.file.write(buffer.getvalue().encode('utf-8'))
+
+
+def run_batch(bot, input_path: str, output_path: str, column: str = 'question',
+              id_column: str = 'id', concurrency: Optional[int] = None,
+              triage_workers: Optional[int] = None, chunk_size: int = 256,
+              answer: bool = True, checkpoint_path: Optional[str] = None,
+              checkpoint_every: int = 50, restart: bool = False) -> Dict[str, Any]:
+    """
+    Triage and answer every question in input_path, writing results to
+    output_path in input order. See DentiBuddy.answer_batch.
+    """
+    concurrency = concurrency or bot.scheduler.max_in_flight
+    triage_workers = triage_workers or os.cpu_count() or 1
+    checkpoint = BatchCheckpoint(checkpoint_path or output_path + '.checkpoint', input_path)
+    resumed = False if restart else checkpoint.load()
+    if resumed and not os.path.exists(output_path):
+        raise FileNotFoundError(f"Checkpoint {checkpoint.path} found but {output_path} is missing; use restart=True")
+    resumed_from = checkpoint.rows_done
+
+    stats = {'rows': 0, 'emergencies': 0, 'answered': 0, 'cache_hits': 0, 'degraded': 0, 'errors': 0,
+             'resumed_from': resumed_from if resumed else None}
+    started = time.time()
+
+    def answer_one(question: str, scan: Dict[str, Any]) -> Dict[str, Any]:
+        if not question:
+            return {'success': False, 'error': 'No question in this row', 'error_type': 'invalid_input'}
+        if not answer:
+            return {}
+        # Same policy as the UI: emergencies get a fresh answer and HIGH goes first
+        return bot.query_ollama(
+            question,
+            use_cache=not scan['is_emergency'],
+            priority=PRIORITY_HIGH if scan['severity'] == 'HIGH' else PRIORITY_NORMAL,
+            severity=scan['severity'],
+        )
+
+    writer = _ResultWriter(output_path, checkpoint.output_bytes if resumed else 0)
+    triage_pool = ProcessPoolExecutor(max_workers=triage_workers, initializer=_ignore_interrupts)
+    answer_pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="dentibuddy-batch")
+    triaging: deque = deque()   # (chunk, future of triage results), in input order
+    pending: deque = deque()    # (row, id, scan, future of answer), in input order
+    window = concurrency * 4
+
+    def write_next() -> None:
+        row, record_id, scan, future = pending.popleft()
+        outcome = future.result()
+        result = {
+            'row': row,
+            'id': record_id,
+            'is_emergency': scan['is_emergency'],
+            'severity': scan['severity'],
+            'triggers': scan['triggers'],
+            'success': outcome.get('success'),
+            'response': outcome.get('response'),
+            'error': outcome.get('error'),
+            'error_type': outcome.get('error_type'),
+            'cache_status': outcome.get('cache_status'),
+            'degraded': bool(outcome.get('degraded')),
+            'response_time': outcome.get('response_time'),
+        }
+        writer.write(result)
+
+        stats['rows'] += 1
+        stats['emergencies'] += scan['is_emergency']
+        stats['answered'] += bool(outcome.get('success'))
+        stats['cache_hits'] += outcome.get('cache_status') in ('exact', 'fuzzy')
+        stats['degraded'] += bool(outcome.get('degraded'))
+        stats['errors'] += outcome.get('success') is False
+        checkpoint.rows_done = row + 1
+        if stats['rows'] % checkpoint_every == 0:
+            checkpoint.output_bytes = writer.sync()
+            checkpoint.save()
+
+    def answer_chunk(chunk: List[Record], scans: List[Dict[str, Any]]) -> None:
+        for (row, record_id, question), scan in zip(chunk, scans):
+            pending.append((row, record_id, scan, answer_pool.submit(answer_one, question, scan)))
+            while len(pending) >= window or (pending and pending[0][3].done()):
+                write_next()
+
+    records = read_questions(input_path, column, id_column)
+    remaining = (record for record in records if record[0] >= resumed_from)
+    completed = False
+    try:
+        for chunk in _chunks(remaining, chunk_size):
+            triaging.append((chunk, triage_pool.submit(_triage_chunk, [question for _, _, question in chunk])))
+            # Keep a couple of chunks triaging ahead of the answers
+            if len(triaging) > triage_workers + 1:
+                done_chunk, future = triaging.popleft()
+                answer_chunk(done_chunk, future.result())
+        while triaging:
+            done_chunk, future = triaging.popleft()
+            answer_chunk(done_chunk, future.result())
+        while pending:
+            write_next()
+        completed = True
+    finally:
+        answer_pool.shutdown(wait=completed, cancel_futures=True)
+        triage_pool.shutdown(wait=completed, cancel_futures=True)
+        checkpoint.output_bytes = writer.sync()
+        writer.close()
+        if completed:
+            checkpoint.remove()
+        else:
+            checkpoint.save()
+
+    stats['seconds'] = time.time() - started
+    stats['rows_per_second'] = stats['rows'] / stats['seconds'] if stats['seconds'] else None
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Triage and answer a file of dental questions")
+    parser.add_argument('input', help="Questions as .csv or .jsonl")
+    parser.add_argument('-o', '--output', required=True, help="Results as .jsonl or .csv")
+    parser.add_argument('--column', default='question', help="Field holding the question")
+    parser.add_argument('--id-column', default='id', help="Field holding the record id")
+    parser.add_argument('--concurrency', type=int, default=None,
+                        help="Questions in flight at once (default: OLLAMA_MAX_IN_FLIGHT)")
+    parser.add_argument('--triage-workers', type=int, default=None, help="Triage processes (default: CPU count)")
+    parser.add_argument('--triage-only', action='store_true', help="Skip Ollama and only pre-screen")
+    parser.add_argument('--checkpoint', default=None, help="Checkpoint path (default: <output>.checkpoint)")
+    parser.add_argument('--restart', action='store_true', help="Ignore an existing checkpoint and start over")
+    args = parser.parse_args()
+
+    from assistant import DentiBuddy
+
+    # Treat a kill like Ctrl-C so the checkpoint is saved
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        stats = DentiBuddy().answer_batch(
+            args.input, args.output, column=args.column, id_column=args.id_column,
+            concurrency=args.concurrency, triage_workers=args.triage_workers,
+            answer=not args.triage_only, checkpoint_path=args.checkpoint, restart=args.restart,
+        )
+    except KeyboardInterrupt:
+        raise SystemExit("Interrupted; run the same command again to resume from the checkpoint")
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == '__main__':
+    main()
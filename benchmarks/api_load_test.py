@@ -0,0 +1,207 @@
+"""
+Load test for the headless API (api.py) compared with the Streamlit path.
+
+Starts the mock Ollama server and `python api.py` with --workers
+processes, then drives /triage, /ask and /ask with SSE from a thread pool.
+The same questions are then asked through the Streamlit script, one
+AppTest session per thread, which is what every browser interaction costs.
+The model slots are the same for both: --max-in-flight in total, split
+across the API workers. Retrieval, the fuzzy cache and coalescing are kept
+out of the way so every question reaches the (mock) model.
+
+Usage: python benchmarks/api_load_test.py [--workers 4] [--concurrency 1 8 32]
+                                          [--requests 200] [--output results.json]
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, List
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_triage import SHORT_INPUTS  # noqa: E402
+from load_test import QUESTIONS, git_revision, print_phase, run_phase  # noqa: E402
+from mock_ollama import MockOllamaServer  # noqa: E402
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_api(port: int, workers: int, env: Dict[str, str]) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, 'api.py', '--host', '127.0.0.1', '--port', str(port), '--workers', str(workers)],
+        cwd=ROOT, env=env)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return server
+        except requests.exceptions.ConnectionError:
+            pass
+        time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("The API server did not become healthy within 60s")
+
+
+def sse_ask(session: requests.Session, url: str, question: str) -> Dict[str, Any]:
+    """POST /ask as SSE and return the done event, with time to the first text event"""
+    started = time.perf_counter()
+    first_text = None
+    event = None
+    with session.post(url, json={'question': question, 'use_cache': False},
+                      headers={'Accept': 'text/event-stream'}, stream=True, timeout=600) as response:
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith('event: '):
+                event = line[len('event: '):]
+            elif line.startswith('data: ') and event == 'text' and first_text is None:
+                first_text = time.perf_counter() - started
+            elif line.startswith('data: ') and event == 'done':
+                result = json.loads(line[len('data: '):])
+                result['time_to_first_token'] = first_text
+                return result
+    return {'success': False, 'error_type': 'stream_ended'}
+
+
+def streamlit_asker():
+    """ask(question) through app.py, with one AppTest session per thread"""
+    from streamlit.testing.v1 import AppTest
+
+    sessions = threading.local()
+    # AppTest sessions cannot be started concurrently
+    start_lock = threading.Lock()
+
+    def ask(question: str) -> Dict[str, Any]:
+        if not hasattr(sessions, 'app'):
+            with start_lock:
+                sessions.app = AppTest.from_file(os.path.join(ROOT, 'app.py'), default_timeout=600).run()
+        app = sessions.app
+        app.text_area(key='user_input').input(question)
+        app.button[0].click().run()
+        if app.exception:
+            return {'success': False, 'error_type': 'exception'}
+        answered = any('DentiBuddy says' in markdown.value for markdown in app.markdown)
+        return {'success': answered, 'error_type': None if answered else 'no_answer'}
+
+    return ask
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DentiBuddy API load test")
+    parser.add_argument('--workers', type=int, default=4, help="uvicorn worker processes")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--requests', type=int, default=200, help="/ask calls per concurrency level")
+    parser.add_argument('--triage-calls', type=int, default=5000, help="/triage calls per concurrency level")
+    parser.add_argument('--streamlit-requests', type=int, default=None,
+                        help="Streamlit questions per concurrency level (default: --requests)")
+    parser.add_argument('--max-in-flight', type=int, default=8,
+                        help="Model slots in total, split across the API workers")
+    parser.add_argument('--token-rate', type=float, default=500.0)
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--skip-streamlit', action='store_true')
+    parser.add_argument('--output', default=None,
+                        help="JSON results path (default: benchmarks/results/api-<rev>-<time>.json)")
+    args = parser.parse_args()
+
+    mock = MockOllamaServer(token_rate=args.token_rate, latency=args.latency).start()
+    workdir = tempfile.mkdtemp(prefix='dentibuddy-api-')
+    os.environ.update({
+        'DENTIBUDDY_EVENT_LOG': os.path.join(workdir, 'events.jsonl'),
+        'OLLAMA_URL': mock.url,
+        'DENTIBUDDY_CACHE_DB': '',
+        'DENTIBUDDY_CACHE_FUZZY': '0',
+        'DENTIBUDDY_GUIDANCE_DIR': '',
+        'DENTIBUDDY_WARMUP': '0',
+        'DENTIBUDDY_QUEUE_TIMEOUT': '600',
+        'OLLAMA_POOL_SIZE': str(max(20, max(args.concurrency))),
+    })
+    api_env = dict(os.environ, OLLAMA_MAX_IN_FLIGHT=str(math.ceil(args.max_in_flight / args.workers)))
+    os.environ['OLLAMA_MAX_IN_FLIGHT'] = str(args.max_in_flight)
+
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    server = start_api(port, args.workers, api_env)
+    session = requests.Session()
+    session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=max(args.concurrency)))
+
+    def post(path: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        response = session.post(base + path, json=body, timeout=600)
+        result = response.json()
+        result.setdefault('success', response.status_code == 200)
+        return result
+
+    phases: List[Dict[str, Any]] = []
+    try:
+        for concurrency in args.concurrency:
+            # A unique suffix keeps coalescing and the cache out of the comparison
+            questions = [f"{QUESTIONS[i % len(QUESTIONS)]} ({concurrency}-{i})" for i in range(args.requests)]
+            triage_inputs = [SHORT_INPUTS[i % len(SHORT_INPUTS)] for i in range(args.triage_calls)]
+            for phase in (
+                run_phase('api_triage', lambda q: post('/triage', {'question': q}),
+                          triage_inputs, concurrency, False),
+                run_phase('api_ask', lambda q: post('/ask', {'question': q, 'use_cache': False}),
+                          questions, concurrency, False),
+                run_phase('api_ask_sse', lambda q: sse_ask(session, base + '/ask', q),
+                          [f"{q} sse" for q in questions], concurrency, False),
+            ):
+                print_phase(phase)
+                phases.append(phase)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    try:
+        if not args.skip_streamlit:
+            ask = streamlit_asker()
+            count = args.streamlit_requests or args.requests
+            for concurrency in args.concurrency:
+                questions = [f"{QUESTIONS[i % len(QUESTIONS)]} (streamlit {concurrency}-{i})" for i in range(count)]
+                phase = run_phase('streamlit_ask', ask, questions, concurrency, False)
+                print_phase(phase)
+                phases.append(phase)
+    finally:
+        mock.stop()
+
+    results = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {
+            'workers': args.workers,
+            'max_in_flight': args.max_in_flight,
+            'requests': args.requests,
+            'triage_calls': args.triage_calls,
+            'token_rate': args.token_rate,
+            'latency': args.latency,
+        },
+        'phases': phases,
+    }
+
+    output = args.output
+    if output is None:
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(ROOT, 'benchmarks', 'results', f"api-{results['git_revision'] or 'local'}-{stamp}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
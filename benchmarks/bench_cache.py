@@ -0,0 +1,130 @@
+"""
+Benchmark for the response cache lookup tiers.
+
+First checks the fuzzy tier against labelled question pairs: near-duplicates
+must reuse the cached answer, and pairs that differ by a negation or a
+condition word ("while pregnant" / "while not pregnant") must not. Then
+times exact hits, fuzzy hits and misses against a cache filled with
+--entries questions.
+
+Usage: python benchmarks/bench_cache.py [--entries 1000] [--iterations 20000]
+                                        [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from load_test import QUESTIONS, git_revision, summarize, format_ms  # noqa: E402
+from response_cache import ResponseCache  # noqa: E402
+
+MODEL = 'gemma:1b'
+OPTIONS = {'temperature': 0.5}
+
+# (cached question, asked question, whether the cached answer may be reused)
+FUZZY_PAIRS = [
+    ("Why are my gums bleeding when brushing?", "Bleeding gums while brushing, why?", True),
+    ("What is the best toothpaste for sensitive teeth?", "Best toothpaste for sensitive teeth", True),
+    ("Can I take ibuprofen for tooth pain while pregnant?",
+     "Can I take ibuprofen for tooth pain while not pregnant?", False),
+    ("My gums bleed when I brush my teeth", "My gums don't bleed when I brush my teeth", False),
+    ("My gums bleed when I brush my teeth", "My gums dont bleed when I brush my teeth", False),
+    ("Is it normal to have tooth pain after a filling?", "Is it normal to have tooth pain before a filling?", False),
+    ("How much fluoride toothpaste should I use for brushing teeth?",
+     "How much fluoride toothpaste should I use for brushing my child's teeth?", False),
+    ("Can I brush my teeth after an extraction with mouthwash?",
+     "Can I brush my teeth after an extraction without mouthwash?", False),
+]
+
+
+def check_fuzzy_pairs() -> None:
+    for cached, asked, reused in FUZZY_PAIRS:
+        cache = ResponseCache()
+        cache.put(cached, MODEL, OPTIONS, "cached answer")
+        hit = cache.get(asked, MODEL, OPTIONS)
+        assert (hit is not None) == reused, (cached, asked, hit)
+
+
+def check_expired_candidates() -> None:
+    """An expired best match must not hide a fresh near-duplicate"""
+    cache = ResponseCache(ttl_seconds=60)
+    cache.put("Why are my gums bleeding when brushing teeth?", MODEL, OPTIONS, "stale answer")
+    cache.put("Why are my gums bleeding when brushing teeth hard?", MODEL, OPTIONS, "fresh answer")
+    stale = cache._entries[next(iter(cache._entries))]
+    stale['created_at'] -= 120
+    hit = cache.get("Gums bleeding when brushing teeth, why?", MODEL, OPTIONS)
+    assert hit is not None and hit['response'] == "fresh answer", hit
+    assert cache.stats()['expired'] == 1, cache.stats()
+
+
+def time_lookups(cache: ResponseCache, questions, iterations: int):
+    timings = []
+    for i in range(iterations):
+        question = questions[i % len(questions)]
+        started = time.perf_counter()
+        cache.get(question, MODEL, OPTIONS)
+        timings.append(time.perf_counter() - started)
+    return summarize(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DentiBuddy response cache benchmark")
+    parser.add_argument('--entries', type=int, default=1000, help="Questions in the cache")
+    parser.add_argument('--iterations', type=int, default=20000)
+    parser.add_argument('--output', default=None,
+                        help="JSON results path (default: benchmarks/results/cache-<rev>-<time>.json)")
+    args = parser.parse_args()
+
+    check_fuzzy_pairs()
+    check_expired_candidates()
+    print(f"fuzzy pairs      {len(FUZZY_PAIRS)} checked, expired candidates skipped")
+
+    cache = ResponseCache(max_entries=args.entries * 2)
+    stored = [f"{QUESTIONS[i % len(QUESTIONS)]} case {i}" for i in range(args.entries)]
+    for question in stored:
+        cache.put(question, MODEL, OPTIONS, "cached answer")
+
+    lookups = {
+        'exact': stored,
+        # Same content words in another order and case
+        'fuzzy': [' '.join(reversed(question.split())).upper() for question in stored],
+        'miss': [f"unrelated question about item {i}" for i in range(args.entries)],
+    }
+    tiers = {}
+    for tier, questions in lookups.items():
+        tiers[tier] = time_lookups(cache, questions, args.iterations)
+        print(f"{tier:<16} p50={format_ms(tiers[tier]['p50'] * 1000)}us p99={format_ms(tiers[tier]['p99'] * 1000)}us")
+    stats = cache.stats()
+    print(f"counters         exact={stats['exact_hits']} fuzzy={stats['fuzzy_hits']} misses={stats['misses']}")
+
+    results = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {'entries': args.entries, 'iterations': args.iterations},
+        'fuzzy_pairs': len(FUZZY_PAIRS),
+        'lookup_s': tiers,
+        'counters': stats,
+    }
+
+    output = args.output
+    if output is None:
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(ROOT, 'benchmarks', 'results',
+                              f"cache-{results['git_revision'] or 'local'}-{stamp}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
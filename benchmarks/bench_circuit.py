@@ -0,0 +1,140 @@
+"""
+Benchmark for the circuit breaker around Ollama calls.
+
+The mock Ollama server is made to stall for longer than the read timeout,
+as an overloaded server does, and a burst of questions is answered with
+and without the breaker. Without it every question waits out the timeout,
+and questions queue behind each other for the model slots. With it, only
+the first few do; the rest fail fast and get a degraded answer. The mock
+then recovers, and the run measures how long the half-open probe takes to
+close the circuit. A micro-benchmark times allow() plus record(), which is
+all a healthy request pays.
+
+Usage: python benchmarks/bench_circuit.py [--requests 64] [--concurrency 16]
+                                          [--timeout 1] [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from load_test import QUESTIONS, git_revision, summarize, format_ms, run_phase, print_phase  # noqa: E402
+from mock_ollama import MockOllamaServer  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DentiBuddy circuit breaker benchmark")
+    parser.add_argument('--requests', type=int, default=64, help="Questions per phase")
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--timeout', type=float, default=1.0, help="Read timeout set in the config file")
+    parser.add_argument('--stall', type=float, default=3.0, help="Mock first-token latency during the outage")
+    parser.add_argument('--failures', type=int, default=5, help="Failures that open the circuit")
+    parser.add_argument('--reset', type=float, default=2.0, help="Seconds before the circuit goes half-open")
+    parser.add_argument('--micro-calls', type=int, default=200000)
+    parser.add_argument('--output', default=None,
+                        help="JSON results path (default: benchmarks/results/circuit-<rev>-<time>.json)")
+    args = parser.parse_args()
+
+    mock = MockOllamaServer(token_rate=500.0, latency=args.stall).start()
+    workdir = tempfile.mkdtemp(prefix='dentibuddy-circuit-')
+    config_path = os.path.join(workdir, 'config.json')
+    with open(config_path, 'w') as f:
+        json.dump({'timeout': args.timeout}, f)
+    os.environ.update({
+        'OLLAMA_URL': mock.url,
+        'DENTIBUDDY_CONFIG': config_path,
+        'DENTIBUDDY_EVENT_LOG': '',
+        'DENTIBUDDY_CACHE_DB': '',
+        'DENTIBUDDY_GUIDANCE_DIR': '',
+        'DENTIBUDDY_WARMUP': '0',
+        'DENTIBUDDY_QUEUE_TIMEOUT': '600',
+        'OLLAMA_POOL_SIZE': str(max(20, args.concurrency)),
+    })
+
+    from assistant import DentiBuddy
+    from circuit import CircuitBreaker
+
+    bot = DentiBuddy()
+    phases = []
+    try:
+        for name, breaker in (
+            ('no_breaker', None),
+            ('breaker', CircuitBreaker(failure_threshold=args.failures, reset_timeout=args.reset)),
+        ):
+            bot.circuit = breaker
+            questions = [f"{QUESTIONS[i % len(QUESTIONS)]} ({name}-{i})" for i in range(args.requests)]
+            phase = run_phase(name, lambda q: bot.query_ollama(q, use_cache=False),
+                              questions, args.concurrency, False)
+            phase['degraded'] = None
+            if breaker is not None:
+                phase['degraded'] = breaker.stats()['rejected'] + breaker.stats()['released']
+                phase['circuit'] = breaker.stats()
+            print_phase(phase)
+            phases.append(phase)
+
+        # Recovery: the next question after the reset timeout is the probe
+        mock.latency = 0.02
+        recovered_at = time.perf_counter()
+        probes = 0
+        while bot.circuit.state != 'closed' and time.perf_counter() - recovered_at < args.reset + 30:
+            bot.query_ollama(f"{QUESTIONS[0]} (probe {probes})", use_cache=False)
+            probes += 1
+            time.sleep(0.05)
+        recovery = {
+            'seconds_to_close': time.perf_counter() - recovered_at,
+            'questions': probes,
+            'transitions': bot.circuit.stats()['transitions'],
+        }
+        print(f"recovery         closed after {recovery['seconds_to_close']:.2f}s and {probes} questions "
+              f"(reset timeout {args.reset:g}s)")
+    finally:
+        mock.stop()
+
+    breaker = CircuitBreaker()
+    timings = []
+    for _ in range(args.micro_calls):
+        started = time.perf_counter()
+        breaker.record(breaker.allow(), None)
+        timings.append(time.perf_counter() - started)
+    micro = summarize(timings)
+    print(f"allow+record     p50={format_ms(micro['p50'] * 1000)}us p99={format_ms(micro['p99'] * 1000)}us")
+
+    results = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'timeout': args.timeout,
+            'stall': args.stall,
+            'failures': args.failures,
+            'reset': args.reset,
+        },
+        'phases': phases,
+        'recovery': recovery,
+        'allow_record_s': micro,
+    }
+
+    output = args.output
+    if output is None:
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(ROOT, 'benchmarks', 'results',
+                              f"circuit-{results['git_revision'] or 'local'}-{stamp}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark for conversation memory.
+
+First checks follow-up detection against labelled questions: questions that
+lean on an earlier turn must keep the conversation, and standalone questions
+that merely contain "you", "it" or "that" must not lose the response cache.
+Then times is_follow_up() and record() on a session with --turns turns.
+
+Usage: python benchmarks/bench_conversation.py [--turns 200] [--iterations 20000]
+                                               [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from load_test import QUESTIONS, git_revision, summarize, format_ms  # noqa: E402
+from conversation import ConversationMemory  # noqa: E402
+
+# (question asked after an earlier turn, whether it is a follow-up)
+FOLLOW_UP_CASES = [
+    ("Does it need a filling?", True),
+    ("Is that normal?", True),
+    ("Should I be worried about it?", True),
+    ("How long does that last?", True),
+    ("Is it going to get worse?", True),
+    ("Will they grow back on their own?", True),
+    ("What about the other one?", True),
+    ("And if the swelling gets worse?", True),
+    ("Which one is better for sensitive teeth?", True),
+    ("Can I still use the mouthwash you recommended?", True),
+    ("Can you tell me how to floss?", False),
+    ("Is it normal for gums to bleed when brushing?", False),
+    ("Is it true that fluoride is bad for children?", False),
+    ("Why do my teeth hurt when they touch cold water?", False),
+    ("Does this tooth need a crown?", False),
+    ("How often should I replace my toothbrush?", False),
+    ("Is there one toothpaste you would suggest for sensitive teeth?", False),
+    ("Your advice on whitening strips with braces?", False),
+]
+
+
+def check_follow_ups() -> None:
+    for question, follow_up in FOLLOW_UP_CASES:
+        memory = ConversationMemory()
+        memory.record("My back tooth hurts when I chew", "That may be a cavity.")
+        assert memory.is_follow_up(question) == follow_up, (question, follow_up)
+
+
+def time_calls(call, iterations: int):
+    timings = []
+    for i in range(iterations):
+        started = time.perf_counter()
+        call(i)
+        timings.append(time.perf_counter() - started)
+    return summarize(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DentiBuddy conversation memory benchmark")
+    parser.add_argument('--turns', type=int, default=200, help="Turns recorded before timing")
+    parser.add_argument('--iterations', type=int, default=20000)
+    parser.add_argument('--output', default=None,
+                        help="JSON results path (default: benchmarks/results/conversation-<rev>-<time>.json)")
+    args = parser.parse_args()
+
+    check_follow_ups()
+    print(f"follow-up cases  {len(FOLLOW_UP_CASES)} checked")
+
+    memory = ConversationMemory()
+    for i in range(args.turns):
+        memory.record(QUESTIONS[i % len(QUESTIONS)], "An answer of a typical length. " * 8)
+
+    calls = {
+        'is_follow_up': lambda i: memory.is_follow_up(QUESTIONS[i % len(QUESTIONS)]),
+        'record': lambda i: memory.record(QUESTIONS[i % len(QUESTIONS)], "An answer of a typical length. " * 8),
+    }
+    timings = {}
+    for name, call in calls.items():
+        timings[name] = time_calls(call, args.iterations)
+        print(f"{name:<16} p50={format_ms(timings[name]['p50'] * 1000)}us p99={format_ms(timings[name]['p99'] * 1000)}us")
+    stats = memory.stats()
+    print(f"memory           turns={stats['turns']} history_tokens={stats['history_tokens']}")
+
+    results = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {'turns': args.turns, 'iterations': args.iterations},
+        'follow_up_cases': len(FOLLOW_UP_CASES),
+        'call_s': timings,
+        'memory': stats,
+    }
+
+    output = args.output
+    if output is None:
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(ROOT, 'benchmarks', 'results',
+                              f"conversation-{results['git_revision'] or 'local'}-{stamp}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+Benchmark for the write-behind event log.
+
+Records question events from several threads, as the UI and API do after
+each answer, into JSONL and SQLite logs in a temporary directory. It reports
+the latency of record(), which is all the request path pays, and how fast
+the writer thread drains the queue. A burst into a deliberately small queue
+shows that events are dropped and counted rather than slowing callers down.
+
+Usage: python benchmarks/bench_event_log.py [--events 200000] [--threads 8]
+                                           [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from event_log import EventLog  # noqa: E402
+from load_test import git_revision, summarize, format_ms  # noqa: E402
+
+SAMPLE_EVENT = {
+    'severity': 'MODERATE',
+    'categories': ['infection'],
+    'success': True,
+    'error_type': None,
+    'source': 'model',
+    'cache_status': 'miss',
+    'model': 'gemma:1b',
+    'backend': 'http://127.0.0.1:11434/api/generate',
+    'latency': 1.84,
+    'first_token': 0.21,
+    'queue_time': 0.0,
+    'question_chars': 57,
+}
+
+
+def record_from_threads(log: EventLog, events: int, threads: int) -> Dict[str, Any]:
+    """record() `events` events split across `threads` threads; returns per-call latency"""
+    latencies: List[List[float]] = [[] for _ in range(threads)]
+
+    def worker(index: int) -> None:
+        session = log.hash_session(f"session-{index}")
+        timings = latencies[index]
+        for _ in range(events // threads):
+            event = dict(SAMPLE_EVENT, ts=time.time(), session=session)
+            started = time.perf_counter()
+            log.record(event)
+            timings.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    record_seconds = time.perf_counter() - started
+    flushed = log.flush(timeout=120)
+    drain_seconds = time.perf_counter() - started
+    stats = log.stats()
+    return {
+        'record_s': summarize([value for timings in latencies for value in timings]),
+        'record_phase_s': record_seconds,
+        'drain_s': drain_seconds,
+        'flushed': flushed,
+        'written_per_s': stats['written'] / drain_seconds if drain_seconds else None,
+        'stats': stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DentiBuddy event log benchmark")
+    parser.add_argument('--events', type=int, default=200000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--burst-queue', type=int, default=1000,
+                        help="Queue size for the burst run, well below --events")
+    parser.add_argument('--output', default=None,
+                        help="JSON results path (default: benchmarks/results/event-log-<rev>-<time>.json)")
+    args = parser.parse_args()
+
+    runs = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, filename, max_queue in (
+            ('jsonl', 'events.jsonl', args.events),
+            ('sqlite', 'events.sqlite3', args.events),
+            ('jsonl_burst', 'burst.jsonl', args.burst_queue),
+        ):
+            log = EventLog(os.path.join(workdir, filename), max_queue=max_queue, max_bytes=8 * 1024 * 1024)
+            run = dict(record_from_threads(log, args.events, args.threads), run=name, max_queue=max_queue)
+            record, stats = run['record_s'], run['stats']
+            print(f"{name:<12} record p50={format_ms(record['p50'] * 1000)}us p99={format_ms(record['p99'] * 1000)}us "
+                  f"max={format_ms(record['max'])}ms  written={stats['written']} dropped={stats['dropped']} "
+                  f"rotations={stats['rotations']}  drained in {run['drain_s']:.2f}s "
+                  f"({run['written_per_s']:.0f} events/s)")
+            runs.append(run)
+
+    results = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {'events': args.events, 'threads': args.threads, 'burst_queue': args.burst_queue},
+        'runs': runs,
+    }
+
+    output = args.output
+    if output is None:
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(ROOT, 'benchmarks', 'results',
+                              f"event-log-{results['git_revision'] or 'local'}-{stamp}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""
+Benchmark for the approved-guidance retrieval index.
+
+First checks which questions the bundled guidance answers directly: each
+labelled question must get its expected entry, or fall back to the model
+when none fits. Then measures index build time and size, the time to open
+(memory-map) an existing index, and search latency for a mix of questions, including ones
+the guidance does not cover. --scale repeats the guidance folder to show
+how the numbers grow with a larger corpus.
+
+Usage: python benchmarks/bench_retrieval.py [--scale 1 10 100] [--iterations 2000]
+                                            [--guidance DIR] [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Any
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from load_test import QUESTIONS, git_revision, summarize, format_ms  # noqa: E402
+from retrieval import build_index, GuidanceIndex, GuidanceRetriever, read_passages  # noqa: E402
+
+# Covered, partly covered and unrelated questions
+SEARCH_QUESTIONS = QUESTIONS + [
+    "My breath smells bad even after brushing",
+    "When should my baby first see a dentist?",
+    "Can I eat popcorn with braces?",
+    "Is teeth whitening safe for sensitive teeth?",
+    "Dry socket after extraction, what do I do?",
+    "How do I treat a canker sore on my tongue?",
+    "What is the best way to clean a retainer and my aligners every day",
+    "I have a cracked crown on my back molar",
+]
+
+# (question, title of the entry that must answer it directly, or None when
+# the question must go to the model)
+LABELLED_QUESTIONS = [
+    ("Why do my gums bleed when I floss?", "Flossing and bleeding gums"),
+    ("How do I get rid of bad breath?", "Mouthwash and bad breath"),
+    ("Is mouthwash necessary if I brush twice a day?", "Mouthwash and bad breath"),
+    ("When should my child first see a dentist?", "Children's teeth"),
+    ("Does whitening toothpaste remove stains?", "Whitening and stains"),
+    ("Do wisdom teeth need to be removed?", "Wisdom teeth and checkups"),
+    ("Is soreness after braces normal?", "Braces and aligners"),
+    # Covered by more than one entry, or only in part
+    ("How often should I brush my teeth", None),
+    ("Can I whiten my teeth with braces", None),
+    ("Is teeth whitening safe for sensitive teeth?", None),
+    ("Can I eat popcorn with braces?", None),
+    # Covered further into an entry than fits in an answer
+    ("How often should I replace my toothbrush?", None),
+    # Not covered
+    ("How do I treat a canker sore on my tongue?", None),
+    ("I have a cracked crown on my back molar", None),
+]
+
+
+def check_labelled(guidance_dir: str, max_chars: int = 300) -> None:
+    with tempfile.TemporaryDirectory() as workdir:
+        index_path = os.path.join(workdir, 'guidance.idx')
+        build_index(guidance_dir, index_path)
+        index = GuidanceIndex(index_path)
+        retriever = GuidanceRetriever(index)
+        for question, title in LABELLED_QUESTIONS:
+            result = retriever.retrieve(question, max_chars=max_chars)
+            answer = result['answer']
+            assert (answer['title'] if answer else None) == title, (question, answer and answer['title'])
+            assert answer is None or len(answer['text']) <= max_chars, (question, answer['text'])
+        index.close()
+
+
+def copy_guidance(source_dir: str, target_dir: str, copies: int) -> None:
+    for copy in range(copies):
+        for name in os.listdir(source_dir):
+            if name.endswith(('.md', '.txt')):
+                shutil.copy(os.path.join(source_dir, name), os.path.join(target_dir, f"{copy:04d}-{name}"))
+
+
+def run_scale(guidance_dir: str, copies: int, iterations: int) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as workdir:
+        corpus = os.path.join(workdir, 'guidance')
+        os.mkdir(corpus)
+        copy_guidance(guidance_dir, corpus, copies)
+        index_path = os.path.join(workdir, 'guidance.idx')
+
+        build = build_index(corpus, index_path)
+        started = time.perf_counter()
+        index = GuidanceIndex(index_path)
+        open_seconds = time.perf_counter() - started
+        retriever = GuidanceRetriever(index)
+
+        latencies = []
+        outcomes = Counter()
+        for i in range(iterations):
+            result = retriever.retrieve(SEARCH_QUESTIONS[i % len(SEARCH_QUESTIONS)])
+            latencies.append(result['seconds'])
+            outcomes[result['outcome']] += 1
+        index.close()
+
+    return {
+        'copies': copies,
+        'passages': build['passages'],
+        'terms': build['terms'],
+        'index_bytes': build['bytes'],
+        'build_s': build['seconds'],
+        'open_s': open_seconds,
+        'search_s': summarize(latencies),
+        'outcomes': dict(outcomes),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DentiBuddy guidance retrieval benchmark")
+    parser.add_argument('--guidance', default=os.path.join(ROOT, 'guidance'))
+    parser.add_argument('--scale', type=int, nargs='+', default=[1, 10, 100],
+                        help="Copies of the guidance folder to index")
+    parser.add_argument('--iterations', type=int, default=2000, help="Searches per scale")
+    parser.add_argument('--output', default=None,
+                        help="JSON results path (default: benchmarks/results/retrieval-<rev>-<time>.json)")
+    args = parser.parse_args()
+
+    print(f"{len(read_passages(args.guidance))} passages in {args.guidance}")
+    if os.path.samefile(args.guidance, os.path.join(ROOT, 'guidance')):
+        check_labelled(args.guidance)
+        print(f"{len(LABELLED_QUESTIONS)} labelled questions checked")
+    runs = []
+    for copies in args.scale:
+        run = run_scale(args.guidance, copies, args.iterations)
+        search = run['search_s']
+        print(f"x{copies:<5} passages={run['passages']:<6} index={run['index_bytes'] / 1024:.1f}KB "
+              f"build={format_ms(run['build_s'])}ms open={format_ms(run['open_s'])}ms "
+              f"search p50={format_ms(search['p50'])}ms p99={format_ms(search['p99'])}ms "
+              f"{dict(run['outcomes'])}")
+        runs.append(run)
+
+    results = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {'guidance': args.guidance, 'iterations': args.iterations},
+        'runs': runs,
+    }
+
+    output = args.output
+    if output is None:
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(ROOT, 'benchmarks', 'results',
+                              f"retrieval-{results['git_revision'] or 'local'}-{stamp}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
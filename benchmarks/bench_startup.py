@@ -0,0 +1,139 @@
+"""
+Startup benchmark for the Streamlit app.
+
+Measures two things:
+- import cost: `python -X importtime -c "import <module>"` in fresh
+  interpreters, reporting the module's cumulative import time and its
+  slowest dependencies
+- render time: the first run of app.py (cold start, including building the
+  shared DentiBuddy client) and the reruns Streamlit performs on every
+  interaction, using Streamlit's AppTest harness against the mock Ollama
+  server
+
+Usage: python benchmarks/bench_startup.py [--imports 5] [--reruns 20]
+                                          [--modules assistant app] [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, Any, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from load_test import git_revision, summarize, format_ms  # noqa: E402
+from mock_ollama import MockOllamaServer  # noqa: E402
+
+
+def import_cost(module: str, runs: int, env: Dict[str, str]) -> Dict[str, Any]:
+    """Median cumulative import time of module and its slowest direct dependencies"""
+    totals: List[float] = []
+    process_seconds: List[float] = []
+    dependencies: Dict[str, List[float]] = {}
+    for _ in range(runs):
+        started = time.perf_counter()
+        completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+                                   cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+        process_seconds.append(time.perf_counter() - started)
+        for line in completed.stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            _, cumulative, name = line[len('import time:'):].split('|')
+            seconds = int(cumulative) / 1e6
+            if name.strip() == module and not name.startswith(' ' * 2):
+                totals.append(seconds)
+            elif name.startswith('   ') and not name.startswith('    '):
+                # Direct dependencies are indented one level under the module
+                dependencies.setdefault(name.strip(), []).append(seconds)
+    slowest = sorted(((statistics.median(times), name) for name, times in dependencies.items()), reverse=True)[:8]
+    return {
+        'module': module,
+        'import_s': statistics.median(totals) if totals else None,
+        'process_s': statistics.median(process_seconds),
+        'slowest_dependencies': [{'module': name, 'import_s': seconds} for seconds, name in slowest],
+    }
+
+
+def render_times(reruns: int) -> Dict[str, Any]:
+    """Time the first run of app.py and subsequent reruns in one process"""
+    from streamlit.testing.v1 import AppTest
+
+    started = time.perf_counter()
+    app = AppTest.from_file(os.path.join(ROOT, 'app.py'), default_timeout=60).run()
+    first_run = time.perf_counter() - started
+    if app.exception:
+        raise RuntimeError(f"app.py raised: {app.exception}")
+
+    latencies = []
+    for _ in range(reruns):
+        started = time.perf_counter()
+        app.run()
+        latencies.append(time.perf_counter() - started)
+    return {'first_run_s': first_run, 'rerun_s': summarize(latencies)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DentiBuddy startup benchmark")
+    parser.add_argument('--imports', type=int, default=5, help="Fresh interpreters per module")
+    parser.add_argument('--reruns', type=int, default=20)
+    parser.add_argument('--modules', nargs='+', default=['assistant', 'app'])
+    parser.add_argument('--output', default=None,
+                        help="JSON results path (default: benchmarks/results/startup-<rev>-<time>.json)")
+    args = parser.parse_args()
+
+    mock = MockOllamaServer(token_rate=200, latency=0.01).start()
+    workdir = tempfile.mkdtemp(prefix='dentibuddy-startup-')
+    os.environ.update({
+        'OLLAMA_URL': mock.url,
+        'DENTIBUDDY_CACHE_DB': '',
+        'DENTIBUDDY_WARMUP': '0',
+        'DENTIBUDDY_GUIDANCE_INDEX': os.path.join(workdir, 'guidance.idx'),
+    })
+    try:
+        imports = []
+        for module in args.modules:
+            cost = import_cost(module, args.imports, dict(os.environ))
+            print(f"import {module:<12} {format_ms(cost['import_s'])}ms "
+                  f"(interpreter total {format_ms(cost['process_s'])}ms)  slowest: "
+                  + ', '.join(f"{dep['module']} {format_ms(dep['import_s'])}ms"
+                              for dep in cost['slowest_dependencies'][:4]))
+            imports.append(cost)
+
+        render = render_times(args.reruns)
+        rerun = render['rerun_s']
+        print(f"first run {format_ms(render['first_run_s'])}ms  rerun p50={format_ms(rerun['p50'])}ms "
+              f"p95={format_ms(rerun['p95'])}ms")
+    finally:
+        mock.stop()
+
+    results = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {'imports': args.imports, 'reruns': args.reruns},
+        'imports': imports,
+        'render': render,
+    }
+
+    output = args.output
+    if output is None:
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(ROOT, 'benchmarks', 'results',
+                              f"startup-{results['git_revision'] or 'local'}-{stamp}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Micro-benchmark for the emergency triage engine.
+
+Compares the precompiled single-pass TriageEngine against the original
+per-keyword implementation of DentiBuddy.detect_emergency on short messages
+and multi-kilobyte pasted symptom histories, and checks both agree. Accuracy
+on typos and other languages, and scaling with the vocabulary, are in
+bench_triage_fuzzy.py.
+
+Usage: python benchmarks/bench_triage.py [--iterations N]
+"""
+
+import argparse
+import os
+import re
+import sys
+import timeit
+from typing import Dict, Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from triage import TRIAGE_ENGINE, KEYWORD_CATEGORIES  # noqa: E402
+
+
+def legacy_detect_emergency(user_input: str, keyword_categories=KEYWORD_CATEGORIES) -> Dict[str, Any]:
+    """The original detect_emergency loop, kept here as the baseline"""
+    user_input_lower = user_input.lower()
+    detected_triggers = []
+
+    pain_patterns = [
+        r'(\d+)/10', r'(\d+)\s*out\s*of\s*10', r'pain\s*level\s*(\d+)',
+        r'(\d+)/10\s*pain', r'(\d+)\s*on\s*10', r'scale\s*of\s*(\d+)',
+    ]
+    for pattern in pain_patterns:
+        for match in re.findall(pattern, user_input_lower):
+            if int(match) >= 6:
+                detected_triggers.append(f"Pain level {int(match)}/10")
+                break
+
+    for _, label, first_only, keywords in keyword_categories:
+        for keyword in keywords:
+            if keyword in user_input_lower:
+                detected_triggers.append(f"{label}: '{keyword}'")
+                if first_only:
+                    break
+
+    return {
+        'is_emergency': len(detected_triggers) > 0,
+        'triggers': list(set(detected_triggers)),
+        'severity': 'HIGH' if len(detected_triggers) >= 2 else 'MODERATE' if detected_triggers else 'LOW'
+    }
+
+
+SHORT_INPUTS = [
+    "I have sharp pain in my back tooth when I bite down.",
+    "My face swollen and the pain is 8/10, can't sleep at all",
+    "How often should I replace my toothbrush?",
+    "Knocked out tooth after an accident, bleeding a lot!! pain level 9",
+    "I have 8/10 pain in my lower jaw",
+]
+
+FILLER = (
+    "Last week I noticed some sensitivity on the lower left side when drinking "
+    "cold water. It comes and goes and is worse in the evening after dinner. "
+)
+
+
+def long_input(size: int) -> str:
+    """Build a pasted symptom history of roughly `size` characters"""
+    body = (FILLER * (size // len(FILLER) + 1))[:size]
+    return body + " Now the jaw swollen and it's 7 out of 10, urgent."
+
+
+def check_agreement(samples) -> None:
+    for text in samples:
+        new, old = TRIAGE_ENGINE.scan(text), legacy_detect_emergency(text)
+        assert new['is_emergency'] == old['is_emergency'], text
+        assert new['severity'] == old['severity'], text
+        assert sorted(new['triggers']) == sorted(old['triggers']), text
+
+
+# Fuzzy matches the legacy scan has no opinion on: (text, severity, triggers).
+# A misspelled word counts once, real words near a keyword don't match, and
+# fuzzy hits alone stop at MODERATE.
+FUZZY_CASES = [
+    ("I think I have an infecion", 'MODERATE', 1),
+    ("the emergence of wisdom teeth", 'LOW', 0),
+    ("I was blending a smoothie and my tooth felt cold", 'LOW', 0),
+    ("Do I need to see a dentist for an immediate replacement of a filling?", 'LOW', 0),
+    ("My gums are bleading and I have a bad abcess", 'MODERATE', 2),
+    ("infection and 9/10 pain", 'HIGH', 2),
+]
+
+
+def check_fuzzy_cases() -> None:
+    for text, severity, triggers in FUZZY_CASES:
+        result = TRIAGE_ENGINE.scan(text)
+        assert result['severity'] == severity, (text, result)
+        assert len(result['triggers']) == triggers, (text, result)
+
+
+def bench(label: str, func, text: str, iterations: int) -> float:
+    seconds = timeit.timeit(lambda: func(text), number=iterations)
+    per_call_us = seconds / iterations * 1e6
+    mb_per_s = len(text) * iterations / seconds / 1e6
+    print(f"  {label:<8} {per_call_us:10.1f} us/call  {mb_per_s:8.2f} MB/s")
+    return per_call_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    cases = [('short', text) for text in SHORT_INPUTS]
+    cases += [(f'{size // 1024}KB', long_input(size)) for size in (2048, 8192, 32768)]
+    check_agreement(text for _, text in cases)
+    check_fuzzy_cases()
+
+    for label, text in cases:
+        print(f"{label} ({len(text)} chars)")
+        legacy = bench('legacy', legacy_detect_emergency, text, args.iterations)
+        engine = bench('engine', TRIAGE_ENGINE.scan, text, args.iterations)
+        print(f"  speedup  {legacy / engine:10.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,248 @@
+"""
+Accuracy and vocabulary-scaling benchmark for multilingual, typo-tolerant triage.
+
+Accuracy: a labelled set of messages (exact English, misspelled English,
+Spanish, French, and benign questions including words one edit away from a
+keyword) is triaged by the original per-keyword loop, by the engine with
+exact word matching only, and by the full engine. For each group it reports
+how often is_emergency is right, and the precision and recall of the
+reported categories.
+
+Scaling: synthetic keywords are added to the vocabulary, and per-message
+latency of the original loop (with the same keywords appended) is compared
+with the engine's, along with index build time and size.
+
+Usage: python benchmarks/bench_triage_fuzzy.py [--vocabulary 1000 5000 10000]
+                                               [--iterations 2000] [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable, Dict, Any, List, Set, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_triage import SHORT_INPUTS, legacy_detect_emergency, long_input  # noqa: E402
+from load_test import git_revision, summarize, format_ms  # noqa: E402
+from triage import (  # noqa: E402
+    KEYWORD_CATEGORIES, PAIN_LEVEL_CATEGORY, TRANSLATED_KEYWORDS, TriageEngine
+)
+
+# (group, message, expected categories)
+LABELLED_MESSAGES: List[Tuple[str, str, Set[str]]] = [
+    ('english', "My face is swollen and I have a fever", {'infection'}),
+    ('english', "Knocked out my front tooth playing football, lots of blood", {'trauma'}),
+    ('english', "The pain is 9/10 and I can't sleep", {PAIN_LEVEL_CATEGORY, 'sleep_loss'}),
+    ('english', "Excruciating pain in my jaw, please help asap", {'severe_pain', 'emergency'}),
+    ('english', "There is pus coming from my gum", {'infection'}),
+    ('english', "I have a cracked tooth after an accident", {'trauma'}),
+    ('english', "Toothache kept me awake all night", {'sleep_loss'}),
+    ('english', "I think I have an infection under my crown", {'infection'}),
+    ('typo', "I think I have an abcess", {'infection'}),
+    ('typo', "Bad sweling on the left side of my jaw", {'infection'}),
+    ('typo', "excrutiating toothache since yesterday", {'severe_pain'}),
+    ('typo', "This is an emergancy, my tooth fell out", {'emergency'}),
+    ('typo', "My gums are bleading a lot", {'trauma'}),
+    ('typo', "I think the tooth is infcted", {'infection'}),
+    ('typo', "unbearible pain when I chew", {'severe_pain'}),
+    ('typo', "my jaw is swolen and hot", {'infection'}),
+    ('typo', "I can’t sleep because of my molar", {'sleep_loss'}),
+    ('typo', "Had an acident on my bike and chiped tooth", {'trauma'}),
+    ('spanish', "Tengo la cara hinchada y fiebre", {'infection'}),
+    ('spanish', "Me duele muchísimo, es un dolor insoportable", {'severe_pain'}),
+    ('spanish', "Se me cayó un diente y hay mucha sangre", {'trauma'}),
+    ('spanish', "No puedo dormir por el dolor de muela", {'sleep_loss'}),
+    ('spanish', "Creo que tengo un absceso con pus", {'infection'}),
+    ('spanish', "Es una emergencia, necesito ayuda ahora mismo", {'emergency'}),
+    ('spanish', "Tengo la encia inflamada y el diente roto", {'infection', 'trauma'}),
+    ('spanish', "Tengo una infeccion en la muela", {'infection'}),
+    ('french', "J'ai la joue gonflée et de la fièvre", {'infection'}),
+    ('french', "Douleur insupportable depuis hier soir", {'severe_pain'}),
+    ('french', "Je me suis cassé une dent, dent cassée et ça saigne", {'trauma'}),
+    ('french', "Je ne peux pas dormir, mal aux dents toute la nuit", {'sleep_loss'}),
+    ('french', "C'est une urgence, j'ai un abcès", {'emergency', 'infection'}),
+    ('benign', "How often should I replace my toothbrush?", set()),
+    ('benign', "Is it normal for gums to bleed when flossing?", set()),
+    ('benign', "What can I do about sensitive teeth when drinking cold water?", set()),
+    ('benign', "I had an injection at the dentist yesterday, how long does numbness last?", set()),
+    ('benign', "My breath is smelling bad in the morning", set()),
+    ('benign', "Is a dental screening included in a checkup?", set()),
+    ('benign', "Can I watch streaming videos to relax during treatment?", set()),
+    ('benign', "The injected anaesthetic made my lip numb", set()),
+    ('benign', "I never floss, is that bad?", set()),
+    ('benign', "Several of my teeth are yellow", set()),
+    ('benign', "Does the emergence of wisdom teeth hurt?", set()),
+    ('benign', "Is blending fruit into smoothies bad for enamel?", set()),
+    ('benign', "Is immediate loading of an implant safe?", set()),
+    ('benign', "¿Cada cuánto debo cambiar el cepillo de dientes?", set()),
+    ('benign', "¿Es bueno usar hilo dental todos los días?", set()),
+    ('benign', "Quel dentifrice choisir pour des dents sensibles ?", set()),
+    ('benign', "Est-ce que le blanchiment abîme l'émail ?", set()),
+]
+
+SYLLABLES = ['ka', 'lo', 'mi', 'zu', 'tre', 'vos', 'nak', 'pel', 'qui', 'dro', 'bex', 'yam', 'sul', 'fen']
+
+
+def synthetic_keywords(count: int, seed: int = 0) -> List[str]:
+    """Pseudo-words of one to three words, none of which occur in the messages"""
+    rng = random.Random(seed)
+    keywords = set()
+    while len(keywords) < count:
+        keywords.add(' '.join(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+                              for _ in range(rng.choice((1, 1, 2, 3)))))
+    return sorted(keywords)
+
+
+def legacy_categories(text: str) -> Set[str]:
+    """Categories the original loop would have reported"""
+    triggers = legacy_detect_emergency(text)['triggers']
+    found = {PAIN_LEVEL_CATEGORY} if any(trigger.startswith('Pain level') for trigger in triggers) else set()
+    lowered = text.lower()
+    for category, _, _, keywords in KEYWORD_CATEGORIES:
+        if any(keyword in lowered for keyword in keywords):
+            found.add(category)
+    return found
+
+
+def accuracy(categorize: Callable[[str], Set[str]]) -> Dict[str, Any]:
+    """Per-group emergency accuracy and category precision/recall, plus the misses"""
+    totals: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    mistakes = []
+    for group, text, expected in LABELLED_MESSAGES:
+        found = categorize(text)
+        for key in (group, 'all'):
+            counts = totals[key]
+            counts['messages'] += 1
+            counts['emergency_correct'] += bool(found) == bool(expected)
+            counts['true_positive'] += len(found & expected)
+            counts['false_positive'] += len(found - expected)
+            counts['false_negative'] += len(expected - found)
+        if found != expected:
+            mistakes.append({'text': text, 'expected': sorted(expected), 'found': sorted(found)})
+
+    groups = {}
+    for group in list(dict.fromkeys(group for group, _, _ in LABELLED_MESSAGES)) + ['all']:
+        counts = totals[group]
+        predicted = counts['true_positive'] + counts['false_positive']
+        relevant = counts['true_positive'] + counts['false_negative']
+        groups[group] = {
+            'messages': counts['messages'],
+            'emergency_accuracy': counts['emergency_correct'] / counts['messages'],
+            'category_precision': counts['true_positive'] / predicted if predicted else None,
+            'category_recall': counts['true_positive'] / relevant if relevant else None,
+        }
+    return {'groups': groups, 'mistakes': mistakes}
+
+
+def time_per_call(func: Callable[[str], Any], inputs: List[str], iterations: int) -> Dict[str, Any]:
+    for text in inputs:
+        func(text)  # Warm caches, as in a running server
+    latencies = []
+    for i in range(iterations):
+        text = inputs[i % len(inputs)]
+        started = time.perf_counter()
+        func(text)
+        latencies.append(time.perf_counter() - started)
+    return summarize(latencies)
+
+
+def scaling_run(extra: int, iterations: int) -> Dict[str, Any]:
+    """Latency of the original loop and of the engine with `extra` more infection keywords"""
+    keywords = synthetic_keywords(extra)
+    legacy_table = [
+        (category, label, first_only, words + keywords if category == 'infection' else words)
+        for category, label, first_only, words in KEYWORD_CATEGORIES
+    ]
+    translations = dict(TRANSLATED_KEYWORDS, synthetic={'infection': keywords})
+
+    started = time.perf_counter()
+    engine = TriageEngine(translations=translations)
+    build_seconds = time.perf_counter() - started
+    index = engine.keyword_index
+    vocabulary = sum(len(words) for _, _, _, words in KEYWORD_CATEGORIES) + sum(
+        len(words) for language in translations.values() for words in language.values())
+
+    inputs = SHORT_INPUTS + [text for _, text, _ in LABELLED_MESSAGES]
+    long_text = long_input(2048)
+    return {
+        'extra_keywords': extra,
+        'vocabulary': vocabulary,
+        'index_words': len(index.vocabulary),
+        'index_deletes': len(index.deletes),
+        'build_s': build_seconds,
+        'legacy_s': time_per_call(lambda text: legacy_detect_emergency(text, legacy_table), inputs, iterations),
+        'engine_s': time_per_call(engine.scan, inputs, iterations),
+        'legacy_2kb_s': time_per_call(lambda text: legacy_detect_emergency(text, legacy_table), [long_text],
+                                      max(1, iterations // 10)),
+        'engine_2kb_s': time_per_call(engine.scan, [long_text], max(1, iterations // 10)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DentiBuddy multilingual triage benchmark")
+    parser.add_argument('--vocabulary', type=int, nargs='+', default=[1000, 5000, 10000],
+                        help="Synthetic keywords to add for the scaling runs")
+    parser.add_argument('--iterations', type=int, default=2000, help="Timed scans per scaling run")
+    parser.add_argument('--output', default=None,
+                        help="JSON results path (default: benchmarks/results/triage-<rev>-<time>.json)")
+    args = parser.parse_args()
+
+    engines = {
+        'legacy': legacy_categories,
+        'exact_words': lambda text, engine=TriageEngine(translations=TRANSLATED_KEYWORDS, fuzzy=False):
+            set(engine.scan(text)['categories']),
+        'fuzzy': lambda text, engine=TriageEngine(translations=TRANSLATED_KEYWORDS):
+            set(engine.scan(text)['categories']),
+    }
+    accuracies = {}
+    for name, categorize in engines.items():
+        accuracies[name] = accuracy(categorize)
+        print(name)
+        for group, scores in accuracies[name]['groups'].items():
+            precision, recall = scores['category_precision'], scores['category_recall']
+            print(f"  {group:<8} emergency={scores['emergency_accuracy']:.0%} "
+                  f"precision={'-' if precision is None else f'{precision:.0%}'} "
+                  f"recall={'-' if recall is None else f'{recall:.0%}'}")
+    for mistake in accuracies['fuzzy']['mistakes']:
+        print(f"  fuzzy miss: {mistake['text']!r} expected {mistake['expected']} found {mistake['found']}")
+
+    runs = []
+    for extra in [0] + args.vocabulary:
+        run = scaling_run(extra, args.iterations)
+        print(f"+{extra:<6} keywords={run['vocabulary']:<6} build={format_ms(run['build_s'])}ms "
+              f"deletes={run['index_deletes']:<7} "
+              f"legacy p50={format_ms(run['legacy_s']['p50'])}ms engine p50={format_ms(run['engine_s']['p50'])}ms "
+              f"2KB legacy={format_ms(run['legacy_2kb_s']['p50'])}ms engine={format_ms(run['engine_2kb_s']['p50'])}ms")
+        runs.append(run)
+
+    results = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {'iterations': args.iterations, 'messages': len(LABELLED_MESSAGES)},
+        'accuracy': accuracies,
+        'scaling': runs,
+    }
+
+    output = args.output
+    if output is None:
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(ROOT, 'benchmarks', 'results',
+                              f"triage-{results['git_revision'] or 'local'}-{stamp}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
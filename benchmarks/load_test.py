@@ -0,0 +1,257 @@
+"""
+Load test for DentiBuddy against a local mock Ollama server.
+
+Drives DentiBuddy.query_ollama, stream_emergency, detect_emergency and
+_clean_response from a thread pool at one or more concurrency levels and
+reports throughput, latency percentiles and memory. Results are written as JSON so runs from
+different releases can be compared.
+
+Usage: python benchmarks/load_test.py [--concurrency 1 4 16] [--requests 200]
+                                      [--token-rate 50] [--latency 0.1]
+                                      [--error-rate 0.0] [--output results.json]
+Pass --ollama-url to load a real Ollama server instead of the mock.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Any, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_triage import SHORT_INPUTS, long_input  # noqa: E402
+from metrics import percentile  # noqa: E402
+from mock_ollama import MockOllamaServer  # noqa: E402
+
+QUESTIONS = [
+    "How often should I replace my toothbrush?",
+    "Is it normal for gums to bleed when flossing?",
+    "What can I do about sensitive teeth when drinking cold water?",
+    "How long after a filling can I eat?",
+    "Is mouthwash necessary if I brush twice a day?",
+]
+
+RAW_RESPONSES = [
+    "Answer: Replace your toothbrush every three months",
+    "DentiBuddy says:   Mild bleeding can mean gingivitis.  Floss gently every day and see a dentist if it continues",
+    "  Try a desensitising toothpaste and avoid very cold drinks for a while!",
+    "My advice: wait until the numbness wears off before eating, usually two hours.",
+]
+
+
+def drain(stream) -> Dict[str, Any]:
+    """Consume a DentiBuddy stream and return its result dict"""
+    while True:
+        try:
+            next(stream)
+        except StopIteration as finished:
+            return finished.value
+
+
+def summarize(latencies: List[float]) -> Dict[str, Any]:
+    return {
+        'mean': sum(latencies) / len(latencies) if latencies else None,
+        'p50': percentile(latencies, 0.50),
+        'p90': percentile(latencies, 0.90),
+        'p95': percentile(latencies, 0.95),
+        'p99': percentile(latencies, 0.99),
+        'max': max(latencies) if latencies else None,
+    }
+
+
+def peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_phase(name: str, call: Callable[[Any], Any], inputs: List[Any], concurrency: int,
+              trace_memory: bool) -> Dict[str, Any]:
+    """Run call(input) for every input on `concurrency` threads and collect timings"""
+
+    def timed_call(item):
+        started = time.perf_counter()
+        result = call(item)
+        return time.perf_counter() - started, result
+
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(timed_call, inputs))
+    elapsed = time.perf_counter() - started
+    traced_peak = None
+    if trace_memory:
+        traced_peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+
+    latencies = [latency for latency, _ in outcomes]
+    results = [result for _, result in outcomes]
+    failures = [result for result in results if isinstance(result, dict) and result.get('success') is False]
+    phase = {
+        'phase': name,
+        'concurrency': concurrency,
+        'calls': len(inputs),
+        'errors': len(failures),
+        'seconds': elapsed,
+        'throughput_per_s': len(inputs) / elapsed if elapsed else None,
+        'latency_s': summarize(latencies),
+        'peak_rss_mb': peak_rss_mb(),
+        'traced_peak_mb': traced_peak,
+    }
+    if failures:
+        phase['error_types'] = dict(Counter(result.get('error_type') for result in failures))
+    first_tokens = [result['time_to_first_token'] for result in results
+                    if isinstance(result, dict) and result.get('time_to_first_token') is not None]
+    if first_tokens:
+        phase['first_token_s'] = summarize(first_tokens)
+    queue_times = [result['queue_time'] for result in results
+                   if isinstance(result, dict) and result.get('queue_time') is not None]
+    if queue_times:
+        phase['queue_time_s'] = summarize(queue_times)
+    rates = [result['tokens_per_second'] for result in results
+             if isinstance(result, dict) and result.get('tokens_per_second')]
+    if rates:
+        phase['tokens_per_second'] = summarize(rates)
+    return phase
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def format_ms(value: Optional[float]) -> str:
+    return '-' if value is None else f"{value * 1000:.2f}"
+
+
+def print_phase(phase: Dict[str, Any]) -> None:
+    latency = phase['latency_s']
+    print(f"{phase['phase']:<16} c={phase['concurrency']:<3} calls={phase['calls']:<6} "
+          f"errors={phase['errors']:<4} {phase['throughput_per_s']:>10.1f}/s  "
+          f"p50={format_ms(latency['p50'])}ms p95={format_ms(latency['p95'])}ms "
+          f"p99={format_ms(latency['p99'])}ms  rss={phase['peak_rss_mb'] or 0:.1f}MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DentiBuddy load test")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--requests', type=int, default=100, help="query_ollama calls per concurrency level")
+    parser.add_argument('--micro-calls', type=int, default=20000,
+                        help="detect_emergency/_clean_response calls per concurrency level")
+    parser.add_argument('--max-in-flight', type=int, default=None,
+                        help="Scheduler slots (default: OLLAMA_MAX_IN_FLIGHT or the highest concurrency)")
+    parser.add_argument('--token-rate', type=float, default=50.0)
+    parser.add_argument('--latency', type=float, default=0.1)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--drop-rate', type=float, default=0.0)
+    parser.add_argument('--emergency-deadline', type=float, default=None,
+                        help="Model deadline for the emergency fast path (default: DENTIBUDDY_EMERGENCY_DEADLINE)")
+    parser.add_argument('--ollama-url', default=None, help="Use this Ollama endpoint instead of the mock")
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="Also report tracemalloc peaks (slows the run down)")
+    parser.add_argument('--output', default=None,
+                        help="JSON results path (default: benchmarks/results/load-<rev>-<time>.json)")
+    args = parser.parse_args()
+
+    mock = None
+    if args.ollama_url is None:
+        mock = MockOllamaServer(token_rate=args.token_rate, latency=args.latency,
+                                error_rate=args.error_rate, drop_rate=args.drop_rate).start()
+    ollama_url = args.ollama_url or mock.url
+
+    # The shared subsystems read their configuration on first use
+    os.environ['OLLAMA_URL'] = ollama_url
+    os.environ['DENTIBUDDY_CACHE_DB'] = ''
+    # Measure the model path; guidance answers are benchmarked by bench_retrieval.py
+    os.environ['DENTIBUDDY_GUIDANCE_DIR'] = ''
+    os.environ['DENTIBUDDY_QUEUE_TIMEOUT'] = '600'
+    if args.max_in_flight is not None:
+        os.environ['OLLAMA_MAX_IN_FLIGHT'] = str(args.max_in_flight)
+    else:
+        os.environ.setdefault('OLLAMA_MAX_IN_FLIGHT', str(max(args.concurrency)))
+    os.environ.setdefault('OLLAMA_POOL_SIZE', str(max(20, max(args.concurrency))))
+    from assistant import DentiBuddy
+
+    bot = DentiBuddy()
+    triage_inputs = SHORT_INPUTS + [long_input(2048)]
+    emergencies = [(text, bot.detect_emergency(text)) for text in triage_inputs]
+    emergencies = [(text, info) for text, info in emergencies if info['severity'] == 'HIGH']
+    if args.emergency_deadline is not None:
+        bot.emergency_deadline = args.emergency_deadline
+
+    phases = []
+    try:
+        for concurrency in args.concurrency:
+            questions = [QUESTIONS[i % len(QUESTIONS)] for i in range(args.requests)]
+            micro_triage = [triage_inputs[i % len(triage_inputs)] for i in range(args.micro_calls)]
+            micro_clean = [RAW_RESPONSES[i % len(RAW_RESPONSES)] for i in range(args.micro_calls)]
+            urgent = [emergencies[i % len(emergencies)] for i in range(args.requests)]
+
+            for phase in (
+                run_phase('query_ollama', lambda q: bot.query_ollama(q, use_cache=False),
+                          questions, concurrency, args.trace_memory),
+                # first_token_s is the templated answer; latency_s includes the model deadline
+                run_phase('stream_emergency', lambda item: drain(bot.stream_emergency(*item)),
+                          urgent, concurrency, args.trace_memory),
+                run_phase('detect_emergency', bot.detect_emergency, micro_triage, concurrency, args.trace_memory),
+                run_phase('_clean_response', bot._clean_response, micro_clean, concurrency, args.trace_memory),
+            ):
+                print_phase(phase)
+                phases.append(phase)
+    finally:
+        if mock is not None:
+            mock.stop()
+
+    results = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {
+            'ollama_url': 'mock' if mock is not None else ollama_url,
+            'model': bot.model_name,
+            'max_in_flight': bot.scheduler.max_in_flight,
+            'pool_size': bot.http_client.pool_size,
+            'emergency_deadline': bot.emergency_deadline,
+            'requests': args.requests,
+            'micro_calls': args.micro_calls,
+            'token_rate': args.token_rate if mock is not None else None,
+            'latency': args.latency if mock is not None else None,
+            'error_rate': args.error_rate if mock is not None else None,
+            'drop_rate': args.drop_rate if mock is not None else None,
+        },
+        'phases': phases,
+    }
+
+    output = args.output
+    if output is None:
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(ROOT, 'benchmarks', 'results', f"load-{results['git_revision'] or 'local'}-{stamp}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
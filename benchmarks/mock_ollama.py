@@ -0,0 +1,218 @@
+"""
+Local mock Ollama server for benchmarks and load tests.
+
+Speaks enough of the Ollama API for DentiBuddy: GET /api/tags and /api/ps
+and streaming NDJSON from POST /api/generate, with a configurable first-token
+latency, token rate, model load time and error injection. Like Ollama, a
+generate request without a prompt only loads the model.
+
+Usage: python benchmarks/mock_ollama.py --port 11434 --token-rate 40 --latency 0.2
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+DEFAULT_ANSWER = (
+    "Rinse gently with warm salt water, avoid very hot or cold food on that side, "
+    "and book a dental appointment soon so the cause can be checked properly. "
+    "If swelling or fever develops, see a dentist immediately."
+)
+
+
+def _keep_alive_seconds(value) -> float:
+    """Ollama keep_alive: seconds as a number, or a duration like '30m'; negative is forever"""
+    if isinstance(value, str):
+        units = {'s': 1, 'm': 60, 'h': 3600}
+        value = float(value[:-1]) * units[value[-1]] if value[-1:] in units else float(value)
+    return float('inf') if value < 0 else value
+
+
+class MockOllamaServer:
+    """
+    Threaded mock server. Use as a context manager or call start()/stop().
+    error_rate answers with HTTP 500, drop_rate closes the connection after
+    the first token, both as a fraction of /api/generate calls.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, models: Optional[List[str]] = None,
+                 token_rate: float = 50.0, latency: float = 0.1, error_rate: float = 0.0,
+                 drop_rate: float = 0.0, load_time: float = 0.0, keep_alive: float = 300.0,
+                 answer: str = DEFAULT_ANSWER, seed: Optional[int] = None):
+        self.models = models or ['gemma:1b']
+        self.token_rate = token_rate
+        self.latency = latency
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.load_time = load_time
+        self.keep_alive = keep_alive
+        self.loaded_until: Dict[str, float] = {}
+        self.tokens = [word + ' ' for word in answer.split()]
+        self.random = random.Random(seed)
+        self.requests = 0
+        self._lock = threading.Lock()
+
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/api/generate"
+
+    def start(self) -> 'MockOllamaServer':
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="mock-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> 'MockOllamaServer':
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def _load(self, model: str, keep_alive) -> float:
+        """Load the model if it has expired; returns the load time in seconds"""
+        with self._lock:
+            loaded = self.loaded_until.get(model, 0) > time.time()
+        load_time = 0.0 if loaded else self.load_time
+        time.sleep(load_time)
+        seconds = self.keep_alive if keep_alive is None else _keep_alive_seconds(keep_alive)
+        with self._lock:
+            self.loaded_until[model] = time.time() + seconds
+        return load_time
+
+    def _roll(self, rate: float) -> bool:
+        with self._lock:
+            return self.random.random() < rate
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, payload) -> None:
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _write_chunk(self, payload) -> None:
+                data = (json.dumps(payload) + '\n').encode()
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+                self.wfile.flush()
+
+            def do_GET(self):
+                if self.path == '/api/tags':
+                    self._send_json(200, {'models': [{'name': name} for name in server.models]})
+                elif self.path == '/api/ps':
+                    now = time.time()
+                    with server._lock:
+                        loaded = [name for name, until in server.loaded_until.items() if until > now]
+                    self._send_json(200, {'models': [{'name': name} for name in loaded]})
+                else:
+                    self._send_json(404, {'error': 'not found'})
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                request = json.loads(self.rfile.read(length) or b'{}')
+                with server._lock:
+                    server.requests += 1
+
+                if self.path != '/api/generate':
+                    self._send_json(404, {'error': 'not found'})
+                    return
+                if request.get('model') not in server.models:
+                    self._send_json(404, {'error': f"model '{request.get('model')}' not found"})
+                    return
+                if server._roll(server.error_rate):
+                    self._send_json(500, {'error': 'injected failure'})
+                    return
+
+                load_time = server._load(request['model'], request.get('keep_alive'))
+                if not request.get('prompt'):
+                    self._send_json(200, {'model': request['model'], 'response': '', 'done': True,
+                                          'done_reason': 'load'})
+                    return
+
+                drop = server._roll(server.drop_rate)
+                num_predict = request.get('options', {}).get('num_predict') or len(server.tokens)
+                tokens = server.tokens[:num_predict]
+                started = time.time()
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/x-ndjson')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+
+                try:
+                    time.sleep(server.latency)
+                    for index, token in enumerate(tokens):
+                        self._write_chunk({'model': request['model'], 'response': token, 'done': False})
+                        if drop:
+                            self.close_connection = True
+                            return
+                        if index + 1 < len(tokens):
+                            time.sleep(1.0 / server.token_rate)
+                    eval_duration = int((time.time() - started - server.latency) * 1e9)
+                    # Like Ollama, only the new prompt is evaluated when a context is passed
+                    prompt_tokens = len(request.get('prompt', '').split())
+                    self._write_chunk({
+                        'model': request['model'], 'response': '', 'done': True,
+                        'context': (request.get('context') or []) + list(range(prompt_tokens + len(tokens))),
+                        'load_duration': int(load_time * 1e9) + 1000000,
+                        'prompt_eval_count': prompt_tokens,
+                        'prompt_eval_duration': int(server.latency * 1e9),
+                        'eval_count': len(tokens),
+                        'eval_duration': max(eval_duration, 1),
+                    })
+                    self.wfile.write(b'0\r\n\r\n')
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client stopped reading (e.g. max_response_length)
+                    self.close_connection = True
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Ollama server for DentiBuddy benchmarks")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=11434)
+    parser.add_argument('--model', action='append', dest='models', help="Model name to advertise (repeatable)")
+    parser.add_argument('--token-rate', type=float, default=50.0, help="Tokens per second")
+    parser.add_argument('--latency', type=float, default=0.1, help="Seconds before the first token")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of generations answered with HTTP 500")
+    parser.add_argument('--drop-rate', type=float, default=0.0, help="Fraction of generations cut off mid-stream")
+    parser.add_argument('--load-time', type=float, default=0.0, help="Seconds to load an unloaded model")
+    parser.add_argument('--keep-alive', type=float, default=300.0, help="Default seconds a model stays loaded")
+    args = parser.parse_args()
+
+    server = MockOllamaServer(
+        host=args.host, port=args.port, models=args.models, token_rate=args.token_rate,
+        latency=args.latency, error_rate=args.error_rate, drop_rate=args.drop_rate,
+        load_time=args.load_time, keep_alive=args.keep_alive
+    )
+    print(f"Mock Ollama listening on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
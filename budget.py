@@ -0,0 +1,144 @@
+"""
+Adaptive generation budget for DentiBuddy.
+
+Answers are cut at max_response_length characters, so generating more
+tokens than that only burns model time. The controller sizes num_predict
+from the character budget and the chars-per-token ratio observed in real
+answers. It shrinks the character budget while p95 latency is above the
+SLO or questions are queueing, and grows it back once things calm down.
+The HTTP read timeout follows recent time-to-first-token percentiles, so a
+stuck backend is given up on (and failed over) sooner.
+"""
+
+import math
+import os
+import threading
+from collections import deque
+from typing import Dict, Any, List, Optional
+
+from metrics import percentile
+
+
+class GenerationController:
+    """
+    Per-process controller for num_predict, character budget and timeout.
+
+    The budget scale moves multiplicatively: down by `shrink` when the
+    windowed p95 latency is over `slo_seconds`, up by `grow` when it is
+    comfortably below, and never under `min_scale`. Each queued request
+    trims a further `queue_penalty` off the budget of the next decision.
+    """
+
+    def __init__(self, max_chars: int = 300, max_tokens: int = 100, max_timeout: float = 30.0,
+                 slo_seconds: float = 10.0, enabled: bool = True, min_scale: float = 0.5,
+                 min_tokens: int = 16, min_timeout: float = 5.0, window: int = 100,
+                 min_samples: int = 10, headroom: float = 1.15, chars_per_token: float = 4.0,
+                 shrink: float = 0.85, grow: float = 1.05, queue_penalty: float = 0.1):
+        self.max_chars = max_chars
+        self.max_tokens = max_tokens
+        self.max_timeout = max_timeout
+        self.slo_seconds = slo_seconds
+        self.enabled = enabled
+        self.min_scale = min_scale
+        self.min_tokens = min_tokens
+        self.min_timeout = min_timeout
+        self.min_samples = min_samples
+        self.headroom = headroom
+        self.shrink = shrink
+        self.grow = grow
+        self.queue_penalty = queue_penalty
+
+        self._lock = threading.Lock()
+        self._chars_per_token = chars_per_token
+        self._scale = 1.0
+        self._latencies: deque = deque(maxlen=window)
+        self._first_tokens: deque = deque(maxlen=window)
+        self._last: Dict[str, Any] = {}
+        self.counters = {'decisions': 0, 'shrinks': 0, 'grows': 0}
+
+    def decide(self, queue_depth: int = 0, max_tokens: Optional[int] = None,
+               max_timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Budget for the next generation: num_predict, char_budget (the cut-off
+        for the cleaned answer), timeout (read timeout in seconds) and the
+        current scale. max_tokens and max_timeout override the configured
+        caps for this call, e.g. after the config file changed them.
+        """
+        max_tokens = self.max_tokens if max_tokens is None else max_tokens
+        max_timeout = self.max_timeout if max_timeout is None else max_timeout
+        with self._lock:
+            self.counters['decisions'] += 1
+            if not self.enabled:
+                decision = {'num_predict': max_tokens, 'char_budget': self.max_chars,
+                            'timeout': max_timeout, 'scale': 1.0}
+                self._last = decision
+                return decision
+
+            scale = max(self.min_scale, self._scale / (1 + self.queue_penalty * queue_depth))
+            char_budget = max(1, int(self.max_chars * scale))
+            num_predict = math.ceil(char_budget / self._chars_per_token * self.headroom)
+            num_predict = max(min(self.min_tokens, max_tokens), min(max_tokens, num_predict))
+
+            timeout = max_timeout
+            if len(self._first_tokens) >= self.min_samples:
+                # Generous multiple of the slowest recent first token; more
+                # queued work means a busier server
+                timeout = (3 * percentile(list(self._first_tokens), 0.99) + 2) * (1 + self.queue_penalty * queue_depth)
+                timeout = max(min(self.min_timeout, max_timeout), min(max_timeout, timeout))
+
+            decision = {'num_predict': num_predict, 'char_budget': char_budget,
+                        'timeout': timeout, 'scale': scale}
+            self._last = decision
+            return decision
+
+    def observe(self, response_time: float, first_token: Optional[float] = None,
+                chars: int = 0, tokens: int = 0) -> None:
+        """Feed back a finished generation: its latency and, if known, output size"""
+        with self._lock:
+            self._latencies.append(response_time)
+            if first_token is not None:
+                self._first_tokens.append(first_token)
+            if chars and tokens:
+                self._chars_per_token += 0.2 * (chars / tokens - self._chars_per_token)
+
+            if len(self._latencies) < self.min_samples:
+                return
+            p95 = percentile(list(self._latencies), 0.95)
+            if p95 > self.slo_seconds and self._scale > self.min_scale:
+                self._scale = max(self.min_scale, self._scale * self.shrink)
+                self.counters['shrinks'] += 1
+            elif p95 < 0.75 * self.slo_seconds and self._scale < 1.0:
+                self._scale = min(1.0, self._scale * self.grow)
+                self.counters['grows'] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.counters)
+            stats.update({
+                'enabled': self.enabled,
+                'scale': self._scale,
+                'chars_per_token': self._chars_per_token,
+                'slo_seconds': self.slo_seconds,
+                'latency_p95': percentile(list(self._latencies), 0.95) if self._latencies else None,
+                'last_num_predict': self._last.get('num_predict'),
+                'last_char_budget': self._last.get('char_budget'),
+                'last_timeout': self._last.get('timeout'),
+            })
+        return stats
+
+
+_shared_controller: Optional[GenerationController] = None
+_shared_controller_lock = threading.Lock()
+
+
+def get_generation_controller(max_chars: int, max_tokens: int, max_timeout: float) -> GenerationController:
+    """Process-wide controller shared by every DentiBuddy instance, configured from the environment"""
+    global _shared_controller
+    with _shared_controller_lock:
+        if _shared_controller is None:
+            _shared_controller = GenerationController(
+                max_chars=max_chars, max_tokens=max_tokens, max_timeout=max_timeout,
+                slo_seconds=float(os.getenv("DENTIBUDDY_LATENCY_SLO", "10")),
+                enabled=os.getenv("DENTIBUDDY_ADAPTIVE_BUDGET", "1") != "0",
+            )
+        return _shared_controller
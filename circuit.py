@@ -0,0 +1,156 @@
+"""
+Circuit breaker around DentiBuddy's Ollama calls.
+
+When Ollama is down or overloaded, every question would otherwise wait out
+its connect or read timeout before failing, and threads pile up behind it.
+After `failure_threshold` consecutive calls fail with a connection, timeout,
+server or network error, the breaker opens. While it is open, calls are
+refused at once and the assistant serves a cached or templated answer
+instead. After `reset_timeout` seconds it goes half-open and lets a few
+real questions through as probes: one success closes it again, and a
+failure reopens it.
+"""
+
+import os
+import threading
+import time
+from typing import Dict, Any, Optional
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+# Error types (from DentiBuddy._generate) that say Ollama is unavailable
+TRIP_ERRORS = frozenset(['connection_error', 'timeout_error', 'server_error', 'network_error'])
+# Error types that say nothing about Ollama: the call never reached it or
+# failed on our side
+NEUTRAL_ERRORS = frozenset(['busy_error', 'unknown_error', 'circuit_open'])
+
+
+class CircuitOpen(Exception):
+    """Raised by a caller that finds the circuit open after it was admitted"""
+
+
+class CircuitBreaker:
+    """
+    Closed, open and half-open states shared by every request in the process.
+
+    allow() is called before each Ollama call and returns the state the call
+    was admitted in, or None if it must not be made. Every admitted call
+    reports back through record(), or release() if it was abandoned
+    before it finished. In the half-open state at most `half_open_probes`
+    calls are in flight at once. Error types outside TRIP_ERRORS and
+    NEUTRAL_ERRORS (such as model_not_found) mean Ollama answered, so they
+    count as successes.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 10.0, half_open_probes: int = 1):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self.last_error_type: Optional[str] = None
+        self.counters = {'allowed': 0, 'rejected': 0, 'successes': 0, 'failures': 0, 'released': 0}
+        # "closed->open" etc. -> count
+        self.transitions: Dict[str, int] = {}
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._check_reset(time.monotonic())
+            return self._state
+
+    def allow(self) -> Optional[str]:
+        """Admit a call: the state it was admitted in, or None to fail fast"""
+        with self._lock:
+            self._check_reset(time.monotonic())
+            if self._state == OPEN or (self._state == HALF_OPEN
+                                       and self._probes_in_flight >= self.half_open_probes):
+                self.counters['rejected'] += 1
+                return None
+            if self._state == HALF_OPEN:
+                self._probes_in_flight += 1
+            self.counters['allowed'] += 1
+            return self._state
+
+    def record(self, admitted: str, error_type: Optional[str]) -> None:
+        """Outcome of a call allow() admitted in state `admitted`: None on success, else its error type"""
+        if error_type in NEUTRAL_ERRORS:
+            self.release(admitted)
+            return
+        failed = error_type in TRIP_ERRORS
+        with self._lock:
+            if admitted == HALF_OPEN:
+                # A reopen and reset in between may already have cleared it
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+            if failed:
+                self.counters['failures'] += 1
+                self.last_error_type = error_type
+                self._consecutive_failures += 1
+                if self._state == HALF_OPEN or (
+                        self._state == CLOSED and self._consecutive_failures >= self.failure_threshold):
+                    self._opened_at = time.monotonic()
+                    self._transition(OPEN)
+            else:
+                self.counters['successes'] += 1
+                self._consecutive_failures = 0
+                # A late success from before the circuit opened proves
+                # nothing about now; only probes close it
+                if self._state == HALF_OPEN:
+                    self._transition(CLOSED)
+
+    def release(self, admitted: str) -> None:
+        """An admitted call ended without saying anything about Ollama"""
+        with self._lock:
+            if admitted == HALF_OPEN:
+                # A reopen and reset in between may already have cleared it
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+            self.counters['released'] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            self._check_reset(now)
+            stats = dict(self.counters)
+            stats.update({
+                'state': self._state,
+                'consecutive_failures': self._consecutive_failures,
+                'probes_in_flight': self._probes_in_flight,
+                'last_error_type': self.last_error_type,
+                'retry_in': max(0.0, self._opened_at + self.reset_timeout - now) if self._state == OPEN else None,
+                'transitions': dict(self.transitions),
+            })
+        return stats
+
+    def _check_reset(self, now: float) -> None:
+        if self._state == OPEN and now - self._opened_at >= self.reset_timeout:
+            self._probes_in_flight = 0
+            self._transition(HALF_OPEN)
+
+    def _transition(self, state: str) -> None:
+        key = f"{self._state}->{state}"
+        self.transitions[key] = self.transitions.get(key, 0) + 1
+        self._state = state
+
+
+_shared_breaker: Optional[CircuitBreaker] = None
+_shared_breaker_loaded = False
+_shared_breaker_lock = threading.Lock()
+
+
+def get_circuit_breaker() -> Optional[CircuitBreaker]:
+    """Process-wide breaker for the Ollama backends, or None when DENTIBUDDY_CIRCUIT_BREAKER=0"""
+    global _shared_breaker, _shared_breaker_loaded
+    with _shared_breaker_lock:
+        if not _shared_breaker_loaded:
+            _shared_breaker_loaded = True
+            if os.getenv("DENTIBUDDY_CIRCUIT_BREAKER", "1") != "0":
+                _shared_breaker = CircuitBreaker(
+                    failure_threshold=int(os.getenv("DENTIBUDDY_CIRCUIT_FAILURES", "5")),
+                    reset_timeout=float(os.getenv("DENTIBUDDY_CIRCUIT_RESET", "10")),
+                    half_open_probes=int(os.getenv("DENTIBUDDY_CIRCUIT_PROBES", "1")),
+                )
+        return _shared_breaker
@@ -0,0 +1,342 @@
+"""
+Hot-reloadable configuration for DentiBuddy.
+
+The model, generation options, timeouts, triage keyword lists and A/B model
+variants can be set in a local JSON file (DENTIBUDDY_CONFIG, default
+dentibuddy_config.json). A background thread polls its modification time
+and swaps in a new snapshot when it changes, so none of these settings needs
+a restart. A file that does not parse or validate is reported and ignored,
+and the previous snapshot stays in use. Without a file, everything comes
+from the environment as before.
+
+Example:
+
+    {
+      "model": "gemma:1b",
+      "generation_options": {"temperature": 0.4},
+      "timeout": 30,
+      "variants": [
+        {"name": "large-high", "model": "gemma:7b", "percent": 50,
+         "severity": ["HIGH"], "timeout": 60}
+      ],
+      "triage": {"keywords": {"infection": ["swollen", "pus", "abscess", "gumboil"]},
+                 "languages": ["es"]}
+    }
+"""
+
+import json
+import os
+import random
+import sys
+import threading
+import time
+from typing import Dict, Any, List, Optional
+
+from triage import (
+    KEYWORD_CATEGORIES, TRANSLATED_KEYWORDS, TRIAGE_ENGINE, TRIAGE_FUZZY, TRIAGE_LANGUAGES, TriageEngine
+)
+
+DEFAULT_GENERATION_OPTIONS: Dict[str, Any] = {
+    "temperature": 0.5,  # Lower for more focused responses
+    "top_p": 0.85,
+    "num_predict": 100,   # Reduced token count for speed
+    "stop": ["Question:", "\n\n"]  # Added newline stop
+}
+
+SEVERITIES = ('LOW', 'MODERATE', 'HIGH')
+
+TOP_LEVEL_KEYS = {'model', 'generation_options', 'timeout', 'cold_timeout', 'emergency_deadline',
+                  'variants', 'triage'}
+VARIANT_KEYS = {'name', 'model', 'percent', 'severity', 'generation_options', 'timeout', 'cold_timeout'}
+TRIAGE_KEYS = {'keywords', 'translations', 'languages', 'fuzzy'}
+
+
+def _positive_number(value: Any, where: str) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+        raise ValueError(f"{where} must be a positive number")
+    return float(value)
+
+
+def _options(value: Any, base: Dict[str, Any], where: str) -> Dict[str, Any]:
+    if not isinstance(value, dict):
+        raise ValueError(f"{where} must be an object")
+    options = dict(base, **value)
+    num_predict = options.get('num_predict')
+    if isinstance(num_predict, bool) or not isinstance(num_predict, int) or num_predict <= 0:
+        raise ValueError(f"{where}.num_predict must be a positive integer")
+    return options
+
+
+def _check_keys(section: Dict[str, Any], allowed: set, where: str) -> None:
+    unknown = sorted(set(section) - allowed)
+    if unknown:
+        raise ValueError(f"Unknown {where} setting(s): {', '.join(unknown)}")
+
+
+def _keyword_lists(value: Any, where: str) -> Dict[str, List[str]]:
+    """category -> keywords, for categories the triage engine knows"""
+    categories = {category for category, _, _, _ in KEYWORD_CATEGORIES}
+    if not isinstance(value, dict):
+        raise ValueError(f"{where} must be an object of category -> keyword list")
+    for category, keywords in value.items():
+        if category not in categories:
+            raise ValueError(f"{where}: unknown category '{category}' (expected one of {', '.join(sorted(categories))})")
+        if (not isinstance(keywords, list) or not keywords
+                or not all(isinstance(keyword, str) and keyword.strip() for keyword in keywords)):
+            raise ValueError(f"{where}.{category} must be a non-empty list of keywords")
+    return {category: [keyword.strip().lower() for keyword in keywords] for category, keywords in value.items()}
+
+
+def parse_config(raw: Any, defaults: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Validate a config file's contents and resolve it over `defaults`.
+    Returns a snapshot with 'default' and 'variants' routes (name, model,
+    percent, severity, generation_options, timeout, cold_timeout),
+    'emergency_deadline' and 'triage'. Raises ValueError on bad settings.
+    """
+    if not isinstance(raw, dict):
+        raise ValueError("The config file must contain a JSON object")
+    _check_keys(raw, TOP_LEVEL_KEYS, 'top-level')
+
+    default = {
+        'name': 'default',
+        'model': raw.get('model', defaults['model']),
+        'percent': None,
+        'severity': None,
+        'generation_options': _options(raw.get('generation_options', {}), defaults['generation_options'],
+                                       'generation_options'),
+        'timeout': _positive_number(raw.get('timeout', defaults['timeout']), 'timeout'),
+        'cold_timeout': _positive_number(raw.get('cold_timeout', defaults['cold_timeout']), 'cold_timeout'),
+    }
+    if not isinstance(default['model'], str) or not default['model']:
+        raise ValueError("model must be a non-empty string")
+
+    entries = raw.get('variants', [])
+    if not isinstance(entries, list):
+        raise ValueError("variants must be a list of objects")
+    variants = []
+    names = {'default'}
+    for position, entry in enumerate(entries):
+        where = f"variants[{position}]"
+        if not isinstance(entry, dict):
+            raise ValueError(f"{where} must be an object")
+        _check_keys(entry, VARIANT_KEYS, where)
+        name, model = entry.get('name'), entry.get('model')
+        if not isinstance(name, str) or not name or name in names:
+            raise ValueError(f"{where}.name must be a unique non-empty string other than 'default'")
+        if not isinstance(model, str) or not model:
+            raise ValueError(f"{where}.model must be a non-empty string")
+        percent = entry.get('percent')
+        if isinstance(percent, bool) or not isinstance(percent, (int, float)) or not 0 <= percent <= 100:
+            raise ValueError(f"{where}.percent must be a number from 0 to 100")
+        severity = entry.get('severity')
+        if severity is not None:
+            if (not isinstance(severity, list) or not severity
+                    or not all(level in SEVERITIES for level in severity)):
+                raise ValueError(f"{where}.severity must be a list of {', '.join(SEVERITIES)}")
+            severity = tuple(severity)
+        names.add(name)
+        variants.append({
+            'name': name,
+            'model': model,
+            'percent': float(percent),
+            'severity': severity,
+            'generation_options': _options(entry.get('generation_options', {}), default['generation_options'],
+                                           f"{where}.generation_options"),
+            'timeout': _positive_number(entry.get('timeout', default['timeout']), f"{where}.timeout"),
+            'cold_timeout': _positive_number(entry.get('cold_timeout', default['cold_timeout']),
+                                             f"{where}.cold_timeout"),
+        })
+
+    for level in SEVERITIES:
+        share = sum(variant['percent'] for variant in variants
+                    if variant['severity'] is None or level in variant['severity'])
+        if share > 100:
+            raise ValueError(f"Variants take {share:g}% of {level} traffic; the total must be at most 100")
+
+    triage = raw.get('triage', {})
+    if not isinstance(triage, dict):
+        raise ValueError("triage must be an object")
+    _check_keys(triage, TRIAGE_KEYS, 'triage')
+    translations = triage.get('translations', {})
+    if not isinstance(translations, dict):
+        raise ValueError("triage.translations must be an object of language -> category -> keywords")
+    translations = {language: _keyword_lists(keywords, f"triage.translations.{language}")
+                    for language, keywords in translations.items()}
+    languages = triage.get('languages', TRIAGE_LANGUAGES)
+    known = set(TRANSLATED_KEYWORDS) | set(translations)
+    if not isinstance(languages, list) or not all(
+            isinstance(language, str) and language in known for language in languages):
+        raise ValueError(f"triage.languages must be a list of {', '.join(sorted(known))}")
+    fuzzy = triage.get('fuzzy', TRIAGE_FUZZY)
+    if not isinstance(fuzzy, bool):
+        raise ValueError("triage.fuzzy must be true or false")
+
+    return {
+        'default': default,
+        'variants': variants,
+        'emergency_deadline': _positive_number(raw.get('emergency_deadline', defaults['emergency_deadline']),
+                                               'emergency_deadline'),
+        'triage': {
+            'keywords': _keyword_lists(triage.get('keywords', {}), 'triage.keywords'),
+            'translations': translations,
+            'languages': languages,
+            'fuzzy': fuzzy,
+        },
+    }
+
+
+def build_triage_engine(triage: Dict[str, Any]) -> TriageEngine:
+    """TriageEngine for a snapshot's triage section"""
+    keyword_categories = [
+        (category, label, first_only, triage['keywords'].get(category, keywords))
+        for category, label, first_only, keywords in KEYWORD_CATEGORIES
+    ]
+    translations = {}
+    for language in triage['languages']:
+        # Categories given in the file replace the built-in list for that language
+        translations[language] = dict(TRANSLATED_KEYWORDS.get(language, {}), **triage['translations'].get(language, {}))
+    return TriageEngine(keyword_categories, translations=translations, fuzzy=triage['fuzzy'])
+
+
+class ConfigWatcher:
+    """
+    Current configuration snapshot, reloaded when the file changes.
+
+    The file is checked every `interval` seconds by a daemon thread. Each
+    successful load gets a new version number. The triage engine is only
+    rebuilt when the triage section changed, and readers always see a
+    complete snapshot: current() and triage_engine() just return the
+    latest objects.
+    """
+
+    def __init__(self, path: Optional[str], defaults: Dict[str, Any], interval: float = 2.0):
+        self.path = path
+        self.defaults = defaults
+        self.interval = interval
+
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        self._snapshot = dict(parse_config({}, defaults), version=0, source=None, loaded_at=time.time())
+        self._engine = TRIAGE_ENGINE
+        self._engine_triage = self._snapshot['triage']
+        self.counters = {'reloads': 0, 'errors': 0}
+        self.last_error: Optional[str] = None
+
+        self.reload()
+        if path:
+            self._thread = threading.Thread(target=self._run, name="dentibuddy-config", daemon=True)
+            self._thread.start()
+
+    def current(self) -> Dict[str, Any]:
+        """The latest valid snapshot; treat it as read-only"""
+        return self._snapshot
+
+    def triage_engine(self) -> TriageEngine:
+        return self._engine
+
+    def route(self, severity: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Pick the model route for one request: a variant with probability
+        percent/100 among those that apply to `severity`, else the default.
+        """
+        snapshot = self._snapshot
+        draw = random.random() * 100
+        for variant in snapshot['variants']:
+            if variant['severity'] is not None and severity not in variant['severity']:
+                continue
+            if draw < variant['percent']:
+                return variant
+            draw -= variant['percent']
+        return snapshot['default']
+
+    def models(self) -> List[str]:
+        """Every model the current snapshot can route to, default first"""
+        snapshot = self._snapshot
+        return list(dict.fromkeys([snapshot['default']['model']] + [variant['model'] for variant in snapshot['variants']]))
+
+    def reload(self) -> bool:
+        """Load the file if it changed since the last check; True if a new snapshot was applied"""
+        with self._lock:
+            try:
+                mtime = os.stat(self.path).st_mtime if self.path else None
+            except OSError:
+                mtime = None
+            if mtime == self._mtime:
+                return False
+            self._mtime = mtime
+
+            try:
+                if mtime is None:
+                    # Removing the file goes back to the environment defaults
+                    raw = {}
+                else:
+                    with open(self.path, encoding='utf-8') as f:
+                        raw = json.load(f)
+                snapshot = parse_config(raw, self.defaults)
+                engine = self._engine
+                if snapshot['triage'] != self._engine_triage:
+                    engine = build_triage_engine(snapshot['triage'])
+            except (OSError, ValueError) as e:
+                # json.JSONDecodeError is a ValueError too
+                self.counters['errors'] += 1
+                self.last_error = f"{self.path}: {e}"
+                return False
+
+            self._engine, self._engine_triage = engine, snapshot['triage']
+            self._snapshot = dict(snapshot, version=self._snapshot['version'] + 1,
+                                  source=self.path if mtime is not None else None, loaded_at=time.time())
+            self.counters['reloads'] += 1
+            self.last_error = None
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        with self._lock:
+            stats = dict(self.counters)
+            stats['last_error'] = self.last_error
+        stats.update({
+            'version': snapshot['version'],
+            'source': snapshot['source'],
+            'loaded_at': snapshot['loaded_at'],
+            'model': snapshot['default']['model'],
+            'variants': [{'name': variant['name'], 'model': variant['model'], 'percent': variant['percent'],
+                          'severity': list(variant['severity']) if variant['severity'] else None}
+                         for variant in snapshot['variants']],
+        })
+        return stats
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.reload()
+            except Exception as e:
+                # Whatever the file holds, the thread must keep watching it
+                with self._lock:
+                    self.counters['errors'] += 1
+                    self.last_error = f"{self.path}: {type(e).__name__}: {e}"
+                print(f"DentiBuddy config reload failed: {self.last_error}", file=sys.stderr)
+
+
+_shared_watcher: Optional[ConfigWatcher] = None
+_shared_watcher_lock = threading.Lock()
+
+
+def get_config_watcher() -> ConfigWatcher:
+    """Process-wide configuration shared by every DentiBuddy instance"""
+    global _shared_watcher
+    with _shared_watcher_lock:
+        if _shared_watcher is None:
+            _shared_watcher = ConfigWatcher(
+                os.getenv("DENTIBUDDY_CONFIG", "dentibuddy_config.json") or None,
+                defaults={
+                    'model': os.getenv("OLLAMA_MODEL", "gemma:1b"),
+                    'generation_options': DEFAULT_GENERATION_OPTIONS,
+                    'timeout': 30.0,
+                    'cold_timeout': float(os.getenv("DENTIBUDDY_COLD_TIMEOUT", "120")),
+                    'emergency_deadline': float(os.getenv("DENTIBUDDY_EMERGENCY_DEADLINE", "5")),
+                },
+                interval=float(os.getenv("DENTIBUDDY_CONFIG_INTERVAL", "2")),
+            )
+        return _shared_watcher
@@ -0,0 +1,209 @@
+"""
+Per-session conversation memory for DentiBuddy.
+
+Follow-up questions need the earlier turns, but resending the whole history
+would make every prompt longer than the last. The memory keeps recent turns
+within a token budget, folds evicted turns into a short topic summary, and
+holds on to the `context` array Ollama returns so the next request can
+continue from the server's KV cache instead of re-evaluating the prefix.
+"""
+
+import re
+from array import array
+from collections import deque
+from typing import Dict, Any, List, Optional
+
+# Rough size of a token for budgeting; Ollama does not expose its tokenizer
+CHARS_PER_TOKEN = 4
+
+# Pronouns that can stand for something from an earlier turn ("does it need
+# a filling?", "is that normal?"). They only count when the question has not
+# named its own subject before them (see NON_SUBJECT_WORDS).
+REFERENCE_PRONOUNS = frozenset([
+    'it', "it's", 'its', 'they', "they're", 'them', 'their', 'this', 'that', 'these', 'those',
+])
+DEMONSTRATIVES = frozenset(['this', 'that', 'these', 'those'])
+# Word pairs that point back wherever they appear ("what about the other one?")
+REFERENCE_PHRASES = frozenset([
+    ('you', 'said'), ('you', 'mentioned'), ('you', 'suggested'), ('you', 'recommended'),
+    ('the', 'same'), ('the', 'other'), ('the', 'previous'), ('which', 'one'),
+    ('this', 'one'), ('that', 'one'), ('these', 'ones'), ('those', 'ones'),
+])
+# Words a pronoun cannot refer to: function words plus the verbs and
+# adjectives patients put around one ("how long does it last?", "should I be
+# worried about it?"). Any other word before a pronoun is taken as the
+# question's own subject ("my teeth hurt when they touch cold water").
+NON_SUBJECT_WORDS = REFERENCE_PRONOUNS | frozenset([
+    'a', 'an', 'the', 'some', 'any', 'my', 'your', 'our', 'i', "i'm", 'me', 'we', 'us', 'you',
+    'is', 'are', 'am', 'was', 'were', 'be', 'been', 'being', 'do', 'does', 'did', 'have', 'has', 'had',
+    'can', 'could', 'should', 'would', 'will', 'may', 'might', 'must',
+    'isnt', 'dont', 'doesnt', 'cant', 'wont', 'shouldnt',
+    'what', 'why', 'how', 'when', 'where', 'which', 'who',
+    'of', 'to', 'in', 'on', 'at', 'for', 'with', 'about', 'from', 'by', 'up', 'out', 'off',
+    'if', 'or', 'and', 'so', 'not', 'no', 'long', 'much', 'often', 'soon', 'still', 'really',
+    'just', 'ever', 'again', 'too', 'very', 'get', 'rid', 'go', 'take', 'use', 'make', 'keep',
+    'stop', 'fix', 'treat', 'help', 'need', 'mean', 'cause', 'hurt', 'last', 'heal', 'happen',
+    'worry', 'worried', 'explain', 'tell', 'know', 'see', 'try', 'avoid', 'leave', 'ignore',
+    'pull', 'remove', 'normal', 'bad', 'serious', 'safe', 'okay', 'ok', 'fine', 'dangerous',
+    'true', 'better', 'worse', 'common', 'painful', 'possible',
+])
+# "Is it normal for gums to bleed?": an 'it' that introduces a clause later
+# in the question rather than standing for anything
+_DUMMY_IT_CLAUSES = frozenset(['to', 'for', 'if', 'when', 'that'])
+# Openings that continue the previous question ("and if it gets worse?")
+CONTINUATION_WORDS = frozenset(['and', 'but', 'so', 'or', 'also'])
+CONTINUATION_OPENINGS = frozenset([('what', 'about'), ('how', 'about'), ('what', 'if'), ('why', 'not')])
+# Questions this short ("why?", "how long?") only make sense after another one
+FOLLOW_UP_MAX_WORDS = 3
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def _is_dummy_it(words: List[str], index: int) -> bool:
+    """Whether words[index] is the 'it' of "is it normal to..." / "it's safe if..." """
+    word = words[index]
+    if word == 'it':
+        if index == 0 or words[index - 1] not in ('is', 'was', 'isnt'):
+            return False
+    elif word != "it's":
+        return False
+    following = words[index + 1:index + 4]
+    if not following or following[0].endswith('ing'):
+        return False  # "is it going to get worse?", "it's bleeding again"
+    return any(word in _DUMMY_IT_CLAUSES for word in following)
+
+
+def refers_back(question: str) -> bool:
+    """
+    Whether `question` needs an earlier turn to make sense: it is too short
+    to stand alone, opens as a continuation, uses a reference phrase, or
+    leads with a pronoun before naming any subject of its own.
+    """
+    words = _WORD_RE.findall(question.lower())
+    if len(words) <= FOLLOW_UP_MAX_WORDS:
+        return True
+    if words[0] in CONTINUATION_WORDS or tuple(words[:2]) in CONTINUATION_OPENINGS:
+        return True
+    if any(pair in REFERENCE_PHRASES for pair in zip(words, words[1:])):
+        return True
+    for index, word in enumerate(words):
+        if word not in NON_SUBJECT_WORDS:
+            return False  # The question names its own subject; later pronouns point at it
+        if word not in REFERENCE_PRONOUNS or _is_dummy_it(words, index):
+            continue
+        following = words[index + 1:index + 2]
+        if word in DEMONSTRATIVES and following and following[0] not in NON_SUBJECT_WORDS:
+            continue  # "does this tooth need a crown?": a determiner, not a reference
+        return True
+    return False
+
+
+class ConversationMemory:
+    """
+    Bounded history for one chat session.
+
+    Turns are kept while they fit in `token_budget`; older ones are evicted
+    and their questions kept as a topic summary of at most `summary_tokens`.
+    The Ollama context is reused only while it also fits in the budget, so
+    both the text history and the context array stay bounded per session.
+    """
+
+    def __init__(self, token_budget: int = 1024, summary_tokens: int = 128):
+        self.token_budget = token_budget
+        self.summary_tokens = summary_tokens
+        self.turns: deque = deque()      # (question, answer, tokens)
+        self.summary: deque = deque()    # topics of evicted turns
+        self.context: Optional[array] = None
+        self.context_model: Optional[str] = None  # Context arrays only make sense to the model that made them
+        self.total_turns = 0
+        self.prompt_eval_saved = 0.0
+        self.last_saved: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self.turns)
+
+    def is_follow_up(self, question: str) -> bool:
+        """
+        Whether `question` seems to lean on earlier turns: it refers back to
+        them, opens as a continuation ("and...", "what about..."), or is too
+        short to stand alone. Always False before the first turn.
+        """
+        if not self.turns:
+            return False
+        return refers_back(question)
+
+    def reusable_context(self, model: Optional[str] = None) -> Optional[List[int]]:
+        """The last Ollama context array, if the next request (to `model`) can continue from it"""
+        if self.context is None or (model is not None and model != self.context_model):
+            return None
+        return self.context.tolist()
+
+    def history_text(self) -> str:
+        """Earlier turns as prompt text, for when there is no reusable context"""
+        lines = []
+        if self.summary:
+            lines.append(f"Earlier topics: {'; '.join(self.summary)}")
+        for question, answer, _ in self.turns:
+            lines.append(f"Patient: {question}")
+            lines.append(f"DentiBuddy: {answer}")
+        return '\n'.join(lines)
+
+    def record(self, question: str, answer: str, context: Optional[List[int]] = None,
+               prompt_eval_count: Optional[int] = None, prompt_eval_duration: Optional[int] = None,
+               context_reused: int = 0, model: Optional[str] = None) -> Optional[float]:
+        """
+        Add a completed turn and the context `model` returned with it. Returns
+        the prompt-eval time saved by reusing context_reused tokens, estimated
+        from this turn's per-token prompt-eval rate, or None if nothing could
+        be measured.
+        """
+        # A pasted essay should not take the whole budget on its own
+        question = question[:self.token_budget * CHARS_PER_TOKEN // 2]
+        self.turns.append((question, answer, estimate_tokens(question) + estimate_tokens(answer)))
+        self.total_turns += 1
+        self._evict()
+
+        if context and len(context) <= self.token_budget:
+            self.context = array('l', context)
+            self.context_model = model
+        else:
+            # Too long (or missing): the next prompt carries the text history instead
+            self.context = None
+
+        saved = None
+        if context_reused and prompt_eval_count and prompt_eval_duration:
+            # If the server evaluated at least as many tokens as we tried to
+            # reuse, its KV cache did not cover the prefix
+            per_token = prompt_eval_duration / 1e9 / prompt_eval_count
+            saved = context_reused * per_token if prompt_eval_count < context_reused else 0.0
+            self.prompt_eval_saved += saved
+        self.last_saved = saved
+        return saved
+
+    def clear(self) -> None:
+        self.turns.clear()
+        self.summary.clear()
+        self.context = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'turns': len(self.turns),
+            'total_turns': self.total_turns,
+            'history_tokens': sum(tokens for _, _, tokens in self.turns),
+            'context_tokens': len(self.context) if self.context is not None else 0,
+            'summarized_topics': len(self.summary),
+            'prompt_eval_saved': self.prompt_eval_saved,
+            'last_saved': self.last_saved,
+        }
+
+    def _evict(self) -> None:
+        budget = self.token_budget - self.summary_tokens
+        while len(self.turns) > 1 and sum(tokens for _, _, tokens in self.turns) > budget:
+            question, _, _ = self.turns.popleft()
+            self.summary.append(' '.join(question.split())[:80])
+        while self.summary and estimate_tokens('; '.join(self.summary)) > self.summary_tokens:
+            self.summary.popleft()
@@ -0,0 +1,86 @@
+"""
+Precomputed first-aid answers for dental emergencies.
+
+A HIGH-severity question should not wait on the model before the patient
+sees what to do. Each triage category maps to a short, reviewed template,
+and every combination the fast path can produce is assembled at import
+time, so building the answer is a dictionary lookup.
+"""
+
+import itertools
+from typing import Dict, Any, Iterable, Optional, Tuple
+
+from triage import PAIN_LEVEL_CATEGORY
+
+EMERGENCY_TEMPLATES: Dict[str, str] = {
+    'trauma': (
+        "If a permanent tooth was knocked out, hold it by the crown, rinse it briefly without "
+        "scrubbing and put it back in the socket or keep it in milk. Bite on clean gauze to "
+        "stop bleeding and see a dentist within 30 minutes if you can."
+    ),
+    'infection': (
+        "Swelling, pus or fever can mean a spreading dental infection. Call your dentist today, "
+        "and go to the emergency room now if the swelling spreads toward your eye or neck or "
+        "you have trouble swallowing or breathing."
+    ),
+    'pain': (
+        "For severe tooth pain, take an over-the-counter pain reliever as directed on the label, "
+        "rinse with warm salt water and avoid very hot, cold or sweet food. Call your dentist "
+        "for an urgent appointment today."
+    ),
+    'sleep_loss': (
+        "Pain that keeps you awake needs prompt care. Keep your head raised when lying down, "
+        "hold a cold compress on your cheek for 20 minutes at a time and call your dentist as "
+        "soon as they open."
+    ),
+    'emergency': (
+        "This sounds urgent. Call your dentist now, or an emergency dental clinic if they are closed."
+    ),
+}
+
+# Triage category -> template
+CATEGORY_TEMPLATES: Dict[str, str] = {
+    PAIN_LEVEL_CATEGORY: 'pain',
+    'severe_pain': 'pain',
+    'infection': 'infection',
+    'trauma': 'trauma',
+    'sleep_loss': 'sleep_loss',
+    'emergency': 'emergency',
+}
+
+# Most time-critical advice first; at most MAX_TEMPLATES are combined
+TEMPLATE_PRIORITY = ['trauma', 'infection', 'pain', 'sleep_loss', 'emergency']
+MAX_TEMPLATES = 2
+
+_COMBINED: Dict[Tuple[str, ...], str] = {
+    keys: ' '.join(EMERGENCY_TEMPLATES[key] for key in keys)
+    for size in range(1, MAX_TEMPLATES + 1)
+    for keys in itertools.combinations(TEMPLATE_PRIORITY, size)
+}
+
+
+def template_keys(categories: Iterable[str]) -> Tuple[str, ...]:
+    """Templates for a set of triage categories, most urgent first"""
+    wanted = {CATEGORY_TEMPLATES[category] for category in categories if category in CATEGORY_TEMPLATES}
+    keys = tuple(key for key in TEMPLATE_PRIORITY if key in wanted)[:MAX_TEMPLATES]
+    return keys or ('emergency',)
+
+
+def emergency_template(emergency_info: Dict[str, Any]) -> str:
+    """Precomputed answer for a detect_emergency result"""
+    return _COMBINED[template_keys(emergency_info.get('categories', ()))]
+
+
+# Served while the model is unreachable and nothing better is cached
+UNAVAILABLE_TEMPLATE = (
+    "DentiBuddy cannot reach its AI model right now, so this is general advice rather than an "
+    "answer to your question. Please try again in a few minutes, and call your dentist if the "
+    "problem is painful, swollen or getting worse."
+)
+
+
+def unavailable_template(severity: Optional[str] = None) -> str:
+    """Answer for when the model cannot be asked; urgent questions lead with what to do"""
+    if severity in ('MODERATE', 'HIGH'):
+        return f"{EMERGENCY_TEMPLATES['emergency']} {UNAVAILABLE_TEMPLATE}"
+    return UNAVAILABLE_TEMPLATE
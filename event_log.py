@@ -0,0 +1,206 @@
+"""
+Write-behind event log for DentiBuddy analytics.
+
+Answered questions are recorded as small anonymized events: a salted hash of
+the session ID, triage result, latency, error type and cache status, but no
+question text unless that is explicitly turned on. record() only appends to
+a bounded in-memory queue. A background thread writes the queue out in
+batches to a JSONL or SQLite file that is rotated by size, so logging never
+waits on the disk. When the queue is full, events are dropped and counted
+instead of slowing the request down.
+"""
+
+import atexit
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional
+
+
+class EventLog:
+    """
+    Bounded queue of events drained by one writer thread.
+
+    Events are written every `flush_interval` seconds, or as soon as
+    `batch_size` are waiting. The file format follows the extension: `.db`,
+    `.sqlite` and `.sqlite3` go to an `events (ts, data)` table with the
+    event as JSON, and anything else is JSON Lines. Once the file reaches
+    `max_bytes` it is renamed to `<path>.1` (older files move up to
+    `<path>.<backups>`, and the oldest is deleted) and a new one is started.
+    """
+
+    def __init__(self, path: str, max_queue: int = 10000, batch_size: int = 500,
+                 flush_interval: float = 1.0, max_bytes: int = 50 * 1024 * 1024,
+                 backups: int = 5, salt: Optional[str] = None):
+        self.path = path
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.sqlite = path.lower().endswith(('.db', '.sqlite', '.sqlite3'))
+        # Without a configured salt, hashes only link events within one process
+        self._salt = (salt or os.urandom(16).hex()).encode()
+
+        self._lock = threading.Lock()
+        self._events: deque = deque()
+        self._wake = threading.Event()
+        self._flushed = threading.Condition(self._lock)
+        self._pending = 0  # Taken off the queue but not yet written
+        self._db: Optional[sqlite3.Connection] = None
+        self._file = None
+        self.counters = {
+            'recorded': 0,
+            'written': 0,
+            'dropped': 0,
+            'failed': 0,
+            'batches': 0,
+            'rotations': 0,
+        }
+        self.last_flush_seconds: Optional[float] = None
+
+        self._thread = threading.Thread(target=self._run, name="dentibuddy-event-log", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush, 5.0)
+
+    def hash_session(self, session_id: Optional[str]) -> Optional[str]:
+        """Salted hash of a session ID, so log readers cannot match it to what the user sees"""
+        if not session_id:
+            return None
+        return hashlib.sha256(self._salt + session_id.encode()).hexdigest()[:16]
+
+    def record(self, event: Dict[str, Any]) -> bool:
+        """Queue an event without blocking; False if the queue was full and it was dropped"""
+        with self._lock:
+            if len(self._events) >= self.max_queue:
+                self.counters['dropped'] += 1
+                return False
+            self._events.append(event)
+            self.counters['recorded'] += 1
+            full_batch = len(self._events) >= self.batch_size
+        if full_batch:
+            self._wake.set()
+        return True
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until everything queued so far is written; False on timeout"""
+        deadline = time.time() + timeout
+        self._wake.set()
+        with self._lock:
+            while self._events or self._pending:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                self._flushed.wait(remaining)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.counters)
+            stats['queue_depth'] = len(self._events)
+        stats['last_flush_seconds'] = self.last_flush_seconds
+        return stats
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            while True:
+                with self._lock:
+                    batch = [self._events.popleft() for _ in range(min(self.batch_size, len(self._events)))]
+                    self._pending = len(batch)
+                if not batch:
+                    break
+                self._write(batch)
+                with self._lock:
+                    self._pending = 0
+                    self._flushed.notify_all()
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        started = time.perf_counter()
+        try:
+            lines = [json.dumps(event, separators=(',', ':')) for event in batch]
+            if self.sqlite:
+                db = self._open_db()
+                db.executemany("INSERT INTO events (ts, data) VALUES (?, ?)",
+                               [(event.get('ts'), line) for event, line in zip(batch, lines)])
+                db.commit()
+            else:
+                f = self._open_file()
+                f.write('\n'.join(lines) + '\n')
+                f.flush()
+            written = True
+        except (OSError, sqlite3.Error, TypeError, ValueError):
+            written = False
+
+        with self._lock:
+            self.counters['written' if written else 'failed'] += len(batch)
+            self.counters['batches'] += 1
+        self.last_flush_seconds = time.perf_counter() - started
+        if written:
+            self._rotate_if_full()
+
+    def _open_db(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS events (ts REAL NOT NULL, data TEXT NOT NULL)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS events_ts ON events (ts)")
+            self._db.commit()
+        return self._db
+
+    def _open_file(self):
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        return self._file
+
+    def _rotate_if_full(self) -> None:
+        try:
+            if os.path.getsize(self.path) < self.max_bytes:
+                return
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if self.backups <= 0:
+                os.remove(self.path)
+            else:
+                for number in range(self.backups - 1, 0, -1):
+                    older = f"{self.path}.{number}"
+                    if os.path.exists(older):
+                        os.replace(older, f"{self.path}.{number + 1}")
+                os.replace(self.path, f"{self.path}.1")
+        except OSError:
+            return
+        with self._lock:
+            self.counters['rotations'] += 1
+
+
+_shared_event_log: Optional[EventLog] = None
+_shared_event_log_loaded = False
+_shared_event_log_lock = threading.Lock()
+
+
+def get_event_log() -> Optional[EventLog]:
+    """Process-wide event log, or None when DENTIBUDDY_EVENT_LOG is empty"""
+    global _shared_event_log, _shared_event_log_loaded
+    with _shared_event_log_lock:
+        if not _shared_event_log_loaded:
+            _shared_event_log_loaded = True
+            path = os.getenv("DENTIBUDDY_EVENT_LOG", "dentibuddy_events.jsonl")
+            if path:
+                _shared_event_log = EventLog(
+                    path,
+                    max_queue=int(os.getenv("DENTIBUDDY_EVENT_LOG_QUEUE", "10000")),
+                    batch_size=int(os.getenv("DENTIBUDDY_EVENT_LOG_BATCH", "500")),
+                    flush_interval=float(os.getenv("DENTIBUDDY_EVENT_LOG_INTERVAL", "1")),
+                    max_bytes=int(float(os.getenv("DENTIBUDDY_EVENT_LOG_MAX_MB", "50")) * 1024 * 1024),
+                    backups=int(os.getenv("DENTIBUDDY_EVENT_LOG_BACKUPS", "5")),
+                    salt=os.getenv("DENTIBUDDY_EVENT_LOG_SALT") or None,
+                )
+        return _shared_event_log
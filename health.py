@@ -0,0 +1,126 @@
+"""
+Background model health monitor for DentiBuddy.
+
+Probing Ollama's /api/tags on every Streamlit rerun blocks each page render
+on a network round trip. The monitor instead runs the probe in a daemon
+thread, shares the last result with every session in the process, and hands
+it back immediately.
+"""
+
+import threading
+import time
+from typing import Callable, Dict, Any, Optional
+
+
+class HealthMonitor:
+    """
+    Caches the result of a status probe and refreshes it in the background.
+
+    The cached status is refreshed every `interval` seconds, or sooner when
+    a caller finds it older than `ttl`. After a failed probe the monitor
+    retries every `failure_interval` seconds, and once `failure_threshold`
+    consecutive probes have failed the status is reported as degraded. Until
+    then the last successful status is kept, so one dropped probe does not
+    take the UI down.
+    """
+
+    def __init__(self, probe: Callable[[], Dict[str, Any]], ttl: float = 5.0,
+                 interval: float = 15.0, failure_interval: float = 1.0,
+                 failure_threshold: int = 2, initial_wait: float = 1.0):
+        self.probe = probe
+        self.ttl = ttl
+        self.interval = interval
+        self.failure_interval = failure_interval
+        self.failure_threshold = failure_threshold
+        self.initial_wait = initial_wait
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._first_result = threading.Event()
+        self._last_good: Optional[Dict[str, Any]] = None
+        self._last_result: Optional[Dict[str, Any]] = None
+        self._checked_at = 0.0
+        self._consecutive_failures = 0
+        self._probe_count = 0
+
+        self._thread = threading.Thread(target=self._run, name="dentibuddy-health", daemon=True)
+        self._thread.start()
+
+    def status(self) -> Dict[str, Any]:
+        """Return the last known status without blocking on the network"""
+        # Only the very first render of a fresh process waits, briefly
+        self._first_result.wait(self.initial_wait)
+
+        with self._lock:
+            age = time.time() - self._checked_at
+            if self._last_result is None:
+                return {
+                    'ollama_running': None,
+                    'model_available': None,
+                    'checking': True,
+                    'degraded': False,
+                    'consecutive_failures': 0,
+                }
+
+            degraded = self._consecutive_failures >= self.failure_threshold
+            if degraded or self._last_good is None:
+                status = dict(self._last_result)
+            else:
+                status = dict(self._last_good)
+            status.update({
+                'degraded': degraded,
+                'consecutive_failures': self._consecutive_failures,
+                'checked_at': self._checked_at,
+                'age': age,
+            })
+
+        if age > self.ttl:
+            self._wake.set()
+        return status
+
+    def refresh(self) -> None:
+        """Ask the background thread to probe now"""
+        self._wake.set()
+
+    def _is_healthy(self, result: Dict[str, Any]) -> bool:
+        return bool(result.get('ollama_running'))
+
+    def _run(self) -> None:
+        while True:
+            try:
+                result = self.probe()
+            except Exception as e:
+                result = {'ollama_running': False, 'model_available': False, 'error': str(e)}
+
+            with self._lock:
+                self._probe_count += 1
+                self._last_result = result
+                self._checked_at = time.time()
+                if self._is_healthy(result):
+                    self._last_good = result
+                    self._consecutive_failures = 0
+                else:
+                    self._consecutive_failures += 1
+                failing = self._consecutive_failures > 0
+            self._first_result.set()
+
+            self._wake.wait(self.failure_interval if failing else self.interval)
+            self._wake.clear()
+
+
+_monitors: Dict[str, HealthMonitor] = {}
+_monitors_lock = threading.Lock()
+
+
+def get_health_monitor(status_url: str, probe: Callable[[], Dict[str, Any]], **kwargs) -> HealthMonitor:
+    """
+    Process-wide monitor per status URL, shared by every session. The model
+    can change at runtime, so it is not part of the key: the probe reports
+    which model it checked and callers compare it with theirs.
+    """
+    key = status_url
+    with _monitors_lock:
+        monitor = _monitors.get(key)
+        if monitor is None:
+            monitor = _monitors[key] = HealthMonitor(probe, **kwargs)
+        return monitor
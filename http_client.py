@@ -0,0 +1,149 @@
+"""
+Process-wide pooled HTTP client for talking to Ollama.
+
+Every DentiBuddy instance (one per Streamlit browser session) shares a single
+requests.Session, so TCP connections are kept alive and reused instead of
+being opened for every question and every status probe.
+"""
+
+import os
+import socket
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.util.retry import Retry
+
+
+class _KeepAliveAdapter(HTTPAdapter):
+    """HTTPAdapter that enables TCP keep-alive probes on pooled sockets"""
+
+    def __init__(self, *args, tcp_keepalive: bool = True, **kwargs):
+        self.tcp_keepalive = tcp_keepalive
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        if self.tcp_keepalive:
+            kwargs['socket_options'] = HTTPConnection.default_socket_options + [
+                (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            ]
+        super().init_poolmanager(*args, **kwargs)
+
+
+class OllamaHTTPClient:
+    """
+    Thin wrapper around a pooled requests.Session with bounded retries on
+    connection errors and pool utilization metrics.
+    """
+
+    def __init__(self, pool_size: int = 20, keep_alive: bool = True,
+                 connect_timeout: float = 3.05, read_timeout: float = 30,
+                 retries: int = 2, backoff_factor: float = 0.2):
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+
+        # Only connection failures are retried: the request never reached
+        # Ollama, so retrying a POST cannot duplicate a generation
+        retry = Retry(
+            total=retries, connect=retries, read=0, status=0, other=0,
+            backoff_factor=backoff_factor, allowed_methods=None, raise_on_status=False
+        )
+        self.adapter = _KeepAliveAdapter(
+            pool_connections=4, pool_maxsize=pool_size, max_retries=retry,
+            tcp_keepalive=keep_alive
+        )
+        self.session = requests.Session()
+        self.session.mount('http://', self.adapter)
+        self.session.mount('https://', self.adapter)
+        self.session.headers.update({
+            'Content-Type': 'application/json',
+            'Connection': 'keep-alive' if keep_alive else 'close',
+        })
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        self._requests = 0
+        self._errors = 0
+
+    @classmethod
+    def from_env(cls) -> 'OllamaHTTPClient':
+        return cls(
+            pool_size=int(os.getenv("OLLAMA_POOL_SIZE", "20")),
+            keep_alive=os.getenv("OLLAMA_KEEP_ALIVE_CONNECTIONS", "1") not in ("0", "false", "no"),
+            connect_timeout=float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "3.05")),
+            read_timeout=float(os.getenv("OLLAMA_READ_TIMEOUT", "30")),
+            retries=int(os.getenv("OLLAMA_CONNECT_RETRIES", "2")),
+            backoff_factor=float(os.getenv("OLLAMA_RETRY_BACKOFF", "0.2")),
+        )
+
+    def _timeout(self, read_timeout: Optional[float]):
+        return (self.connect_timeout, read_timeout if read_timeout is not None else self.read_timeout)
+
+    @contextmanager
+    def _track(self) -> Iterator[None]:
+        with self._lock:
+            self._in_flight += 1
+            self._requests += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+        try:
+            yield
+        except requests.exceptions.RequestException:
+            with self._lock:
+                self._errors += 1
+            raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def get(self, url: str, timeout: Optional[float] = None, **kwargs) -> requests.Response:
+        """GET with the body fully read, so the connection returns to the pool"""
+        with self._track():
+            return self.session.get(url, timeout=self._timeout(timeout), **kwargs)
+
+    @contextmanager
+    def stream_post(self, url: str, timeout: Optional[float] = None, **kwargs) -> Iterator[requests.Response]:
+        """
+        Streaming POST. The response is closed on exit; read it to the end
+        first so the keep-alive connection can be reused.
+        """
+        with self._track():
+            response = self.session.post(url, timeout=self._timeout(timeout), stream=True, **kwargs)
+            try:
+                yield response
+            finally:
+                response.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool utilization and request counters"""
+        pool_map = self.adapter.poolmanager.pools
+        pools = [pool for pool in map(pool_map.get, pool_map.keys()) if pool is not None]
+        with self._lock:
+            stats = {
+                'in_flight': self._in_flight,
+                'peak_in_flight': self._peak_in_flight,
+                'requests': self._requests,
+                'errors': self._errors,
+            }
+        stats['pool_size'] = self.pool_size
+        stats['utilization'] = stats['in_flight'] / self.pool_size if self.pool_size else 0.0
+        stats['connections_opened'] = sum(pool.num_connections for pool in pools)
+        return stats
+
+
+_shared_client: Optional[OllamaHTTPClient] = None
+_shared_client_lock = threading.Lock()
+
+
+def get_http_client() -> OllamaHTTPClient:
+    """Process-wide client shared by every DentiBuddy instance, configured from the environment"""
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is None:
+            _shared_client = OllamaHTTPClient.from_env()
+        return _shared_client
@@ -0,0 +1,219 @@
+"""
+Lightweight in-process metrics for DentiBuddy.
+
+Counters and histograms are rendered in the Prometheus text exposition
+format and can be served by a small exporter thread for scraping. Each
+histogram also keeps a rolling window of recent samples so the UI can show
+p50/p95 without a monitoring stack.
+"""
+
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Any, Iterable, List, Optional, Tuple, Union
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+FAST_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.005, 0.01, 0.05)
+RATE_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 200)
+SIZE_BUCKETS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 50000)
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    escaped = [(name, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+               for name, value in pairs]
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def percentile(values: Iterable[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of values, or None with no samples"""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def _format_value(value: float) -> str:
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._lock = threading.Lock()
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(_label_key(labels), 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Cumulative bucket histogram plus a rolling sample window per label set"""
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS,
+                 window: int = 500):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self.window = window
+        self._lock = threading.Lock()
+        self._series: Dict[LabelKey, Dict[str, Any]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {
+                    'counts': [0] * len(self.buckets),
+                    'sum': 0.0,
+                    'count': 0,
+                    'recent': deque(maxlen=self.window),
+                }
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][index] += 1
+                    break
+            series['sum'] += value
+            series['count'] += 1
+            series['recent'].append(value)
+
+    def percentile(self, fraction: float, **labels) -> Optional[float]:
+        """Percentile over the rolling window, or None with no samples"""
+        with self._lock:
+            series = self._series.get(_label_key(labels))
+            samples = list(series['recent']) if series else []
+        return percentile(samples, fraction)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series['counts']):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(key, ('le', _format_value(bound)))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {series['count']}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(series['sum'])}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series['count']}")
+        return lines
+
+
+GaugeValue = Union[float, Dict[LabelKey, float]]
+
+
+class MetricsRegistry:
+    """Named counters, histograms and callback gauges for one process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Union[Counter, Histogram]] = {}
+        self._gauges: Dict[str, Tuple[str, str, Callable[[], GaugeValue]]] = {}
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._exporter_failed = False
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Counter(name, help_text)
+            return self._metrics[name]
+
+    def histogram(self, name: str, help_text: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Histogram(name, help_text, buckets)
+            return self._metrics[name]
+
+    def gauge(self, name: str, help_text: str, callback: Callable[[], GaugeValue],
+              metric_type: str = 'gauge') -> None:
+        """
+        Register a value read at scrape time. The callback returns a number, or
+        a dict mapping label tuples (see labels()) to numbers. Use
+        metric_type='counter' for totals kept by another component.
+        """
+        with self._lock:
+            self._gauges[name] = (help_text, metric_type, callback)
+
+    @staticmethod
+    def labels(**labels) -> LabelKey:
+        return _label_key(labels)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+            gauges = list(self._gauges.items())
+
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        for name, (help_text, metric_type, callback) in gauges:
+            try:
+                value = callback()
+            except Exception:
+                continue
+            lines.extend([f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"])
+            series = value if isinstance(value, dict) else {(): value}
+            for key, number in sorted(series.items()):
+                lines.append(f"{name}{_format_labels(key)} {_format_value(number or 0)}")
+        return '\n'.join(lines) + '\n'
+
+    def start_exporter(self, port: int, host: str = '127.0.0.1') -> bool:
+        """
+        Serve /metrics from a daemon thread. Later calls are no-ops; returns
+        False if the port could not be bound (e.g. another worker has it).
+        """
+        with self._lock:
+            if self._server is not None or self._exporter_failed:
+                return self._server is not None
+            registry = self
+
+            class MetricsHandler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split('?')[0] != '/metrics':
+                        self.send_error(404)
+                        return
+                    body = registry.render().encode()
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):
+                    pass
+
+            try:
+                self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+            except OSError:
+                self._exporter_failed = True
+                return False
+            self._server.daemon_threads = True
+            threading.Thread(target=self._server.serve_forever, name="dentibuddy-metrics", daemon=True).start()
+            return True
+
+
+# Process-wide registry shared by every DentiBuddy instance
+METRICS = MetricsRegistry()
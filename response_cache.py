@@ -0,0 +1,285 @@
+"""
+Persistent response cache for DentiBuddy.
+
+Answers are keyed by the normalized prompt, model name and generation
+options. Lookups try an exact-match tier first and then, optionally, a fuzzy
+tier that compares word shingles so near-duplicate questions ("gums bleeding
+when brushing" / "bleeding gums while brushing") reuse the same answer. A
+fuzzy match is refused when the two questions differ by a negation or a
+condition word, since "while pregnant" and "while not pregnant" need
+different answers.
+Entries live in an in-memory LRU with a TTL and are written through to SQLite
+so the cache survives Streamlit restarts.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Set
+
+# Words that carry no meaning for matching near-duplicate dental questions
+STOPWORDS = frozenset([
+    'a', 'an', 'the', 'i', 'my', 'me', 'is', 'are', 'am', 'it', 'its', 'of',
+    'to', 'in', 'on', 'at', 'and', 'or', 'when', 'while', 'whenever', 'do',
+    'does', 'did', 'have', 'has', 'had', 'be', 'been', 'with', 'for', 'what',
+    'why', 'how', 'should', 'can', 'could', 'after', 'during', 'this', 'that',
+])
+
+# Words that reverse or qualify a question. Two questions that differ by one
+# of these are never treated as near-duplicates.
+NEGATIONS = frozenset([
+    'not', 'no', 'never', 'without', 'nor', 'none', 'nothing', 'cannot', 'cant', 'dont', 'doesnt',
+    'didnt', 'isnt', 'arent', 'wasnt', 'wont', 'shouldnt', 'havent', 'hasnt',
+])
+CONDITION_WORDS = frozenset([
+    'pregnant', 'pregnancy', 'breastfeeding', 'nursing', 'allergic', 'allergy', 'diabetic', 'diabetes',
+    'child', 'children', 'kid', 'kids', 'baby', 'babies', 'toddler', 'infant', 'elderly',
+    'before', 'after', 'during', 'until', 'unless', 'only', 'also', 'still', 'anymore',
+])
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace"""
+    return ' '.join(_WORD_RE.findall(prompt.lower()))
+
+
+def prompt_shingles(normalized: str) -> Set[str]:
+    """Content-word shingles used by the fuzzy tier (order-insensitive)"""
+    return {word for word in normalized.split() if word not in STOPWORDS or word in CONDITION_WORDS}
+
+
+def changes_meaning(word: str) -> bool:
+    """Whether a word that only one of two questions has may change its meaning"""
+    if word.endswith("'s"):
+        word = word[:-2]
+    return word in CONDITION_WORDS or word.replace("'", '') in NEGATIONS or word.endswith("n't")
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class ResponseCache:
+    """
+    Thread-safe two-tier (exact + fuzzy) response cache with SQLite backing.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, max_entries: int = 1024,
+                 ttl_seconds: float = 7 * 24 * 3600, fuzzy: bool = True,
+                 fuzzy_threshold: float = 0.8):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.fuzzy = fuzzy
+        self.fuzzy_threshold = fuzzy_threshold
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # scope (model + options) -> shingle -> cache keys, for fuzzy lookups
+        self._shingle_index: Dict[str, Dict[str, Set[str]]] = {}
+        self.counters = {
+            'exact_hits': 0,
+            'fuzzy_hits': 0,
+            'misses': 0,
+            'skipped': 0,
+            'evictions': 0,
+            'expired': 0,
+        }
+
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, scope TEXT NOT NULL, prompt TEXT NOT NULL,"
+                " response TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._db.commit()
+            self._load_from_disk()
+
+    @staticmethod
+    def make_scope(model_name: str, options: Dict[str, Any]) -> str:
+        """Hash of everything besides the prompt that changes the answer"""
+        blob = json.dumps({'model': model_name, 'options': options}, sort_keys=True)
+        return hashlib.sha256(blob.encode()).hexdigest()[:16]
+
+    @staticmethod
+    def make_key(scope: str, normalized_prompt: str) -> str:
+        return hashlib.sha256(f"{scope}\n{normalized_prompt}".encode()).hexdigest()
+
+    def get(self, prompt: str, model_name: str, options: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached answer. Returns a dict with 'response' and 'cache_tier'
+        ('exact' or 'fuzzy'), or None on a miss.
+        """
+        scope = self.make_scope(model_name, options)
+        normalized = normalize_prompt(prompt)
+        key = self.make_key(scope, normalized)
+        now = time.time()
+
+        with self._lock:
+            entry = self._lookup_exact(key, now)
+            if entry is not None:
+                self.counters['exact_hits'] += 1
+                return {'response': entry['response'], 'cache_tier': 'exact'}
+
+            if self.fuzzy:
+                entry = self._lookup_fuzzy(scope, prompt_shingles(normalized), now)
+                if entry is not None:
+                    self.counters['fuzzy_hits'] += 1
+                    return {'response': entry['response'], 'cache_tier': 'fuzzy'}
+
+            self.counters['misses'] += 1
+            return None
+
+    def put(self, prompt: str, model_name: str, options: Dict[str, Any], response: str) -> None:
+        """Store a successful answer"""
+        scope = self.make_scope(model_name, options)
+        normalized = normalize_prompt(prompt)
+        key = self.make_key(scope, normalized)
+        now = time.time()
+
+        with self._lock:
+            self._insert(key, scope, normalized, response, now, now)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, scope, normalized, response, now, now)
+                )
+                self._db.commit()
+
+    def record_skip(self) -> None:
+        """Count a lookup deliberately bypassed (e.g. emergency queries)"""
+        with self._lock:
+            self.counters['skipped'] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.counters)
+            stats['entries'] = len(self._entries)
+        lookups = stats['exact_hits'] + stats['fuzzy_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['exact_hits'] + stats['fuzzy_hits']) / lookups if lookups else 0.0
+        return stats
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._shingle_index.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def _lookup_exact(self, key: str, now: float) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if now - entry['created_at'] > self.ttl_seconds:
+            self._remove(key)
+            self.counters['expired'] += 1
+            return None
+        self._entries.move_to_end(key)
+        entry['accessed_at'] = now
+        return entry
+
+    def _lookup_fuzzy(self, scope: str, shingles: Set[str], now: float) -> Optional[Dict[str, Any]]:
+        index = self._shingle_index.get(scope)
+        if not index or not shingles:
+            return None
+
+        candidates: Set[str] = set()
+        for shingle in shingles:
+            candidates |= index.get(shingle, set())
+
+        best_key, best_score = None, self.fuzzy_threshold
+        expired = []
+        for key in candidates:
+            entry = self._entries[key]
+            if now - entry['created_at'] > self.ttl_seconds:
+                # An expired entry must not shadow a fresh near-duplicate
+                expired.append(key)
+                continue
+            cached = entry['shingles']
+            score = jaccard(shingles, cached)
+            if score >= best_score and not any(changes_meaning(word) for word in shingles ^ cached):
+                best_key, best_score = key, score
+
+        for key in expired:
+            self._remove(key)
+            self.counters['expired'] += 1
+        return self._lookup_exact(best_key, now) if best_key else None
+
+    def _insert(self, key: str, scope: str, normalized: str, response: str,
+                created_at: float, accessed_at: float) -> None:
+        if key in self._entries:
+            self._remove(key)
+
+        shingles = prompt_shingles(normalized)
+        self._entries[key] = {
+            'scope': scope,
+            'response': response,
+            'shingles': shingles,
+            'created_at': created_at,
+            'accessed_at': accessed_at,
+        }
+        index = self._shingle_index.setdefault(scope, {})
+        for shingle in shingles:
+            index.setdefault(shingle, set()).add(key)
+
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.counters['evictions'] += 1
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        index = self._shingle_index.get(entry['scope'], {})
+        for shingle in entry['shingles']:
+            keys = index.get(shingle)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del index[shingle]
+        if self._db is not None:
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._db.commit()
+
+    def _load_from_disk(self) -> None:
+        """Warm the in-memory tiers with the most recently used rows"""
+        cutoff = time.time() - self.ttl_seconds
+        self._db.execute("DELETE FROM responses WHERE created_at < ?", (cutoff,))
+        self._db.commit()
+        rows = self._db.execute(
+            "SELECT key, scope, prompt, response, created_at, accessed_at FROM responses"
+            " ORDER BY accessed_at DESC LIMIT ?", (self.max_entries,)
+        ).fetchall()
+        with self._lock:
+            for key, scope, prompt, response, created_at, accessed_at in reversed(rows):
+                self._insert(key, scope, prompt, response, created_at, accessed_at)
+
+
+_shared_cache: Optional[ResponseCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Process-wide cache shared by every DentiBuddy instance, configured from the environment"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = ResponseCache(
+                db_path=os.getenv("DENTIBUDDY_CACHE_DB", "dentibuddy_cache.sqlite3") or None,
+                max_entries=int(os.getenv("DENTIBUDDY_CACHE_MAX_ENTRIES", "1024")),
+                ttl_seconds=float(os.getenv("DENTIBUDDY_CACHE_TTL", str(7 * 24 * 3600))),
+                fuzzy=os.getenv("DENTIBUDDY_CACHE_FUZZY", "1") not in ("0", "false", "no"),
+                fuzzy_threshold=float(os.getenv("DENTIBUDDY_CACHE_FUZZY_THRESHOLD", "0.8")),
+            )
+        return _shared_cache
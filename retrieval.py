@@ -0,0 +1,397 @@
+"""
+Local retrieval over approved dental guidance.
+
+Common questions have reviewed answers that are better than anything a 1B
+model writes from scratch. The guidance folder holds Markdown files: a
+`# Title` line followed by short paragraphs, each of which is one passage.
+They are indexed for BM25 into a single binary file that is memory-mapped
+at startup, so only the vocabulary is parsed and the postings and passage
+texts are read from the page cache on demand. The index is rebuilt
+automatically when the guidance files change.
+
+Index layout (little-endian):
+    b'DBIX' | version u32 | header length u32 | header JSON | padding to 4
+    postings: (passage id, term frequency) int32 pairs, grouped by term
+    passage texts: UTF-8
+"""
+
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import tempfile
+import threading
+import time
+from array import array
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+from response_cache import STOPWORDS, normalize_prompt
+
+MAGIC = b'DBIX'
+INDEX_VERSION = 1
+_PREFIX = struct.Struct('<4sII')
+
+# Common plurals and inflections collapse to one term
+_IRREGULAR = {'teeth': 'tooth', 'children': 'child', 'gums': 'gum'}
+_SUFFIXES = ('ing', 'ity', 'ed', 's')
+
+
+def _stem(word: str) -> str:
+    word = _IRREGULAR.get(word, word)
+    if word.endswith("'s"):
+        word = word[:-2]
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            break
+    # brace/braces, sensitive/sensitivity
+    return word[:-1] if word.endswith('e') and len(word) > 3 else word
+
+
+def tokenize(text: str) -> List[str]:
+    """Content-word terms for indexing and search"""
+    return [_stem(word) for word in normalize_prompt(text).split() if word not in STOPWORDS]
+
+
+def read_passages(guidance_dir: str) -> List[Dict[str, str]]:
+    """Split every .md/.txt file in guidance_dir into titled passages"""
+    passages = []
+    for name in sorted(os.listdir(guidance_dir)):
+        if not name.endswith(('.md', '.txt')):
+            continue
+        with open(os.path.join(guidance_dir, name), encoding='utf-8') as f:
+            blocks = [' '.join(block.split()) for block in re.split(r'\n\s*\n', f.read())]
+        title = os.path.splitext(name)[0].replace('_', ' ').capitalize()
+        for block in blocks:
+            if block.startswith('#'):
+                title = block.lstrip('#').strip()
+            elif block:
+                passages.append({'source': name, 'title': title, 'text': block})
+    return passages
+
+
+def clip_text(text: str, max_chars: int) -> str:
+    """Cut text to max_chars, at the end of a sentence if one fits, else at a word"""
+    if len(text) <= max_chars:
+        return text
+    clipped = text[:max_chars]
+    end = clipped.rfind('. ')
+    if end > 0:
+        return clipped[:end + 1]
+    return clipped.rsplit(' ', 1)[0] + '...'
+
+
+def source_fingerprint(guidance_dir: str) -> str:
+    """Changes whenever a guidance file is added, removed or edited"""
+    entries = []
+    for name in sorted(os.listdir(guidance_dir)):
+        if name.endswith(('.md', '.txt')):
+            stat = os.stat(os.path.join(guidance_dir, name))
+            entries.append(f"{name}:{stat.st_size}:{stat.st_mtime_ns}")
+    return '|'.join(entries)
+
+
+def build_index(guidance_dir: str, index_path: str, k1: float = 1.2, b: float = 0.75) -> Dict[str, Any]:
+    """
+    Index the guidance folder into index_path (written atomically).
+    Returns {'passages', 'terms', 'bytes', 'seconds'}.
+    """
+    start = time.perf_counter()
+    fingerprint = source_fingerprint(guidance_dir)
+    passages = read_passages(guidance_dir)
+
+    postings: Dict[str, List[Tuple[int, int]]] = {}
+    lengths = []
+    for passage_id, passage in enumerate(passages):
+        terms = tokenize(passage['title'] + ' ' + passage['text'])
+        lengths.append(len(terms))
+        counts: Dict[str, int] = {}
+        for term in terms:
+            counts[term] = counts.get(term, 0) + 1
+        for term, tf in counts.items():
+            postings.setdefault(term, []).append((passage_id, tf))
+
+    flat = array('i')
+    vocabulary = {}
+    for term in sorted(postings):
+        vocabulary[term] = [len(flat) // 2, len(postings[term])]
+        for passage_id, tf in postings[term]:
+            flat.extend((passage_id, tf))
+
+    texts = bytearray()
+    passage_meta = []
+    for passage, length in zip(passages, lengths):
+        encoded = passage['text'].encode('utf-8')
+        passage_meta.append([passage['source'], passage['title'], len(texts), len(encoded), length])
+        texts += encoded
+
+    header = json.dumps({
+        'fingerprint': fingerprint,
+        'k1': k1,
+        'b': b,
+        'avgdl': sum(lengths) / len(lengths) if lengths else 0.0,
+        'passages': passage_meta,
+        'terms': vocabulary,
+    }, separators=(',', ':')).encode('utf-8')
+    padding = -(_PREFIX.size + len(header)) % 4
+
+    if array('i').itemsize != 4 or struct.pack('=i', 1) != struct.pack('<i', 1):
+        raise RuntimeError("The guidance index needs 32-bit little-endian ints")
+    # A private temporary file, so workers rebuilding at the same time
+    # don't write into each other's copy
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(index_path) + '.',
+                                    dir=os.path.dirname(os.path.abspath(index_path)))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_PREFIX.pack(MAGIC, INDEX_VERSION, len(header)))
+            f.write(header)
+            f.write(b'\0' * padding)
+            flat.tofile(f)
+            f.write(texts)
+        os.replace(tmp_path, index_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+    return {
+        'passages': len(passages),
+        'terms': len(vocabulary),
+        'bytes': os.path.getsize(index_path),
+        'seconds': time.perf_counter() - start,
+    }
+
+
+class GuidanceIndex:
+    """
+    Read-only BM25 index over a memory-mapped index file.
+
+    search() ranks passages by BM25 and reports each hit's confidence: the
+    share of the question's terms, weighted by idf, that the passage
+    contains, and the same share for the whole entry it belongs to. Unlike
+    a ratio of scores it only reaches 1.0 when every term is covered, so
+    each question word the guidance lacks lowers it in proportion.
+    """
+
+    def __init__(self, index_path: str):
+        self.index_path = index_path
+        with open(index_path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, header_length = _PREFIX.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != INDEX_VERSION:
+            self._mmap.close()
+            raise ValueError(f"{index_path} is not a version {INDEX_VERSION} guidance index")
+        header_end = _PREFIX.size + header_length
+        header = json.loads(self._mmap[_PREFIX.size:header_end])
+
+        self.fingerprint: str = header['fingerprint']
+        self.k1: float = header['k1']
+        self.b: float = header['b']
+        self.avgdl: float = header['avgdl'] or 1.0
+        self.passages: List[List[Any]] = header['passages']
+        self.terms: Dict[str, List[int]] = header['terms']
+
+        postings_start = header_end + (-header_end % 4)
+        postings_count = sum(count for _, count in self.terms.values())
+        self._texts_start = postings_start + postings_count * 8
+        self._postings = memoryview(self._mmap)[postings_start:self._texts_start].cast('i')
+
+        count = len(self.passages)
+        # Idf of a term no passage contains, for question words the guidance lacks
+        self._unseen_idf = math.log(1 + (count + 0.5) / 0.5)
+        self._idf = {term: math.log(1 + (count - df + 0.5) / (df + 0.5))
+                     for term, (_, df) in self.terms.items()}
+
+    def __len__(self) -> int:
+        return len(self.passages)
+
+    def passage(self, passage_id: int) -> Dict[str, Any]:
+        source, title, offset, length, _ = self.passages[passage_id]
+        start = self._texts_start + offset
+        return {'source': source, 'title': title,
+                'text': bytes(self._mmap[start:start + length]).decode('utf-8')}
+
+    def entry_range(self, passage_id: int) -> Tuple[int, int]:
+        """First and last passage ids of the entry (same file and title) a passage belongs to"""
+        key = self.passages[passage_id][:2]
+        first = last = passage_id
+        while first > 0 and self.passages[first - 1][:2] == key:
+            first -= 1
+        while last + 1 < len(self.passages) and self.passages[last + 1][:2] == key:
+            last += 1
+        return first, last
+
+    def entry(self, passage_id: int) -> Dict[str, Any]:
+        """The whole guidance entry (every passage under the same title) a passage belongs to"""
+        first, last = self.entry_range(passage_id)
+        source, title = self.passages[passage_id][:2]
+        return {'source': source, 'title': title, 'entry': first,
+                'text': ' '.join(self.passage(i)['text'] for i in range(first, last + 1))}
+
+    def coverage(self, question: str, text: str) -> float:
+        """Share of the question's terms, weighted by idf, that text contains"""
+        query = set(tokenize(question))
+        if not query:
+            return 0.0
+        weights = {term: self._idf.get(term, self._unseen_idf) for term in query}
+        found = query & set(tokenize(text))
+        return sum(weights[term] for term in found) / sum(weights.values())
+
+    def search(self, question: str, top_k: int = 3) -> List[Dict[str, Any]]:
+        """Best passages for the question, highest score first"""
+        query = set(tokenize(question))
+        if not query or not self.passages:
+            return []
+
+        scores: Dict[int, float] = {}
+        # passage id -> question terms it contains
+        matched: Dict[int, Set[str]] = {}
+        idfs: Dict[str, float] = {}
+        ideal = 0.0
+        k1, b, avgdl = self.k1, self.b, self.avgdl
+        for term in query:
+            entry = self.terms.get(term)
+            if entry is None:
+                ideal += self._unseen_idf
+                continue
+            idf = idfs[term] = self._idf[term]
+            ideal += idf
+            offset, df = entry
+            postings = self._postings[offset * 2:(offset + df) * 2]
+            for i in range(0, len(postings), 2):
+                passage_id, tf = postings[i], postings[i + 1]
+                length = self.passages[passage_id][4]
+                scores[passage_id] = scores.get(passage_id, 0.0) + idf * tf * (k1 + 1) / (
+                    tf + k1 * (1 - b + b * length / avgdl))
+                matched.setdefault(passage_id, set()).add(term)
+
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        hits = []
+        for passage_id, score in best:
+            hit = self.passage(passage_id)
+            first, last = self.entry_range(passage_id)
+            entry_terms = set().union(*(matched.get(i, ()) for i in range(first, last + 1)))
+            hit.update({
+                'id': passage_id,
+                'entry': first,
+                'score': score,
+                'confidence': sum(idfs[term] for term in matched[passage_id]) / ideal,
+                'entry_confidence': sum(idfs[term] for term in entry_terms) / ideal,
+            })
+            hits.append(hit)
+        return hits
+
+    def close(self) -> None:
+        self._postings.release()
+        self._mmap.close()
+
+
+class GuidanceRetriever:
+    """
+    Decides what to do with retrieved guidance for one question. The best
+    passage's whole entry is the answer (a single paragraph may lean on the
+    ones before it) when the entry covers at least direct_threshold of the
+    question and its score is at least direct_margin times that of the
+    best passage from any other entry. An entry clipped to max_chars must
+    still cover direct_threshold of the question. Otherwise up to max_snippets
+    passages over snippet_threshold are passed to the prompt, clipped to
+    snippet_chars each.
+    """
+
+    def __init__(self, index: GuidanceIndex, direct_threshold: float = 0.6, direct_margin: float = 1.5,
+                 snippet_threshold: float = 0.3, max_snippets: int = 2, snippet_chars: int = 200):
+        self.index = index
+        self.direct_threshold = direct_threshold
+        self.direct_margin = direct_margin
+        self.snippet_threshold = snippet_threshold
+        self.max_snippets = max_snippets
+        self.snippet_chars = snippet_chars
+        self._lock = threading.Lock()
+        self.counters = {'direct': 0, 'snippets': 0, 'none': 0}
+
+    def retrieve(self, question: str, allow_direct: bool = True, max_chars: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Returns {'outcome': 'direct'|'snippets'|'none', 'answer': entry for a
+        direct answer (clipped to max_chars) or None, 'snippets': [passages],
+        'seconds': float}
+        """
+        start = time.perf_counter()
+        # Deep enough to find the best passage of another entry
+        hits = self.index.search(question, top_k=max(self.max_snippets, 5))
+        answer = None
+        snippets = []
+        if hits and allow_direct and self._is_direct(hits):
+            answer = dict(self.index.entry(hits[0]['id']), score=hits[0]['score'],
+                          confidence=hits[0]['entry_confidence'])
+            if max_chars and len(answer['text']) > max_chars:
+                # What is left must still answer the question
+                text = clip_text(answer['text'], max_chars)
+                answer.update(text=text, confidence=self.index.coverage(question, text))
+                if answer['confidence'] < self.direct_threshold:
+                    answer = None
+        if answer is not None:
+            outcome = 'direct'
+        else:
+            for hit in hits[:self.max_snippets]:
+                if hit['confidence'] >= self.snippet_threshold:
+                    snippets.append(dict(hit, text=clip_text(hit['text'], self.snippet_chars)))
+            outcome = 'snippets' if snippets else 'none'
+        with self._lock:
+            self.counters[outcome] += 1
+        return {'outcome': outcome, 'answer': answer, 'snippets': snippets,
+                'seconds': time.perf_counter() - start}
+
+    def _is_direct(self, hits: List[Dict[str, Any]]) -> bool:
+        best = hits[0]
+        if best['entry_confidence'] < self.direct_threshold:
+            return False
+        runner_up = next((hit for hit in hits if hit['entry'] != best['entry']), None)
+        return runner_up is None or best['score'] >= runner_up['score'] * self.direct_margin
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.counters)
+        stats['passages'] = len(self.index)
+        return stats
+
+
+def open_index(guidance_dir: str, index_path: str) -> GuidanceIndex:
+    """Map the index, building or rebuilding it first if the guidance changed"""
+    try:
+        index = GuidanceIndex(index_path)
+        if index.fingerprint == source_fingerprint(guidance_dir):
+            return index
+        index.close()
+    except (OSError, ValueError):
+        pass
+    build_index(guidance_dir, index_path)
+    return GuidanceIndex(index_path)
+
+
+_shared_retriever: Optional[GuidanceRetriever] = None
+_shared_retriever_loaded = False
+_shared_retriever_lock = threading.Lock()
+
+
+def get_retriever() -> Optional[GuidanceRetriever]:
+    """
+    Process-wide retriever, or None when DENTIBUDDY_GUIDANCE_DIR is empty or
+    does not exist
+    """
+    global _shared_retriever, _shared_retriever_loaded
+    with _shared_retriever_lock:
+        if not _shared_retriever_loaded:
+            _shared_retriever_loaded = True
+            default_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'guidance')
+            guidance_dir = os.getenv("DENTIBUDDY_GUIDANCE_DIR", default_dir)
+            if guidance_dir and os.path.isdir(guidance_dir):
+                index = open_index(
+                    guidance_dir, os.getenv("DENTIBUDDY_GUIDANCE_INDEX", "dentibuddy_guidance.idx"))
+                _shared_retriever = GuidanceRetriever(
+                    index,
+                    direct_threshold=float(os.getenv("DENTIBUDDY_RETRIEVAL_DIRECT", "0.6")),
+                    direct_margin=float(os.getenv("DENTIBUDDY_RETRIEVAL_MARGIN", "1.5")),
+                    snippet_threshold=float(os.getenv("DENTIBUDDY_RETRIEVAL_SNIPPETS", "0.3")),
+                )
+        return _shared_retriever
@@ -0,0 +1,184 @@
+"""
+Bounded-concurrency scheduler for Ollama generations.
+
+Each Streamlit session runs in its own thread and used to call Ollama
+directly, so a burst of questions would all hit the model at once. The
+scheduler admits at most `max_in_flight` generations and queues the rest in
+FIFO order, with HIGH-severity emergencies placed ahead of everything else.
+"""
+
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Any, Iterator, List, Optional
+
+from metrics import METRICS
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+
+QUEUE_WAIT_SECONDS = METRICS.histogram(
+    'dentibuddy_queue_wait_seconds', "Time questions waited for a model slot")
+QUEUE_SERVICE_SECONDS = METRICS.histogram(
+    'dentibuddy_queue_service_seconds', "Time a generation held its model slot")
+
+
+class QueueTimeout(Exception):
+    """Raised when a request waited longer than the queue timeout"""
+
+
+class Ticket:
+    """A queued request. Granted tickets hold one in-flight slot until released."""
+
+    def __init__(self, scheduler: 'InferenceScheduler', priority: int, seq: int):
+        self.scheduler = scheduler
+        self.priority = priority
+        self.seq = seq
+        self.enqueued_at = time.time()
+        self.granted_at: Optional[float] = None
+        self.state = 'queued'  # queued -> running -> done, or queued -> cancelled
+
+    def __lt__(self, other: 'Ticket') -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until granted or timeout; returns True once the slot is ours"""
+        return self.scheduler._wait(self, timeout)
+
+    def position(self) -> int:
+        """1-based place in the queue, or 0 once running"""
+        return self.scheduler._position(self)
+
+    def estimated_wait(self) -> float:
+        return self.scheduler._estimated_wait(self.position())
+
+    def release(self) -> None:
+        self.scheduler._release(self)
+
+
+class InferenceScheduler:
+    """
+    Priority FIFO admission control with wait and service time metrics.
+    """
+
+    def __init__(self, max_in_flight: int = 2, queue_timeout: float = 120.0):
+        self.max_in_flight = max_in_flight
+        self.queue_timeout = queue_timeout
+
+        self._cond = threading.Condition()
+        self._queue: List[Ticket] = []
+        self._seq = itertools.count()
+        self._in_flight = 0
+
+        self.counters = {'submitted': 0, 'served': 0, 'timed_out': 0, 'high_priority': 0}
+
+    def submit(self, priority: int = PRIORITY_NORMAL) -> Ticket:
+        with self._cond:
+            ticket = Ticket(self, priority, next(self._seq))
+            heapq.heappush(self._queue, ticket)
+            self.counters['submitted'] += 1
+            if priority == PRIORITY_HIGH:
+                self.counters['high_priority'] += 1
+            self._dispatch()
+            return ticket
+
+    @contextmanager
+    def slot(self, priority: int = PRIORITY_NORMAL,
+             on_wait: Optional[Callable[[int, float], None]] = None,
+             poll_interval: float = 0.5) -> Iterator[Ticket]:
+        """
+        Hold an in-flight slot for the duration of the block. While queued,
+        on_wait(position, estimated_wait_seconds) is called every poll_interval.
+        Raises QueueTimeout if not admitted within queue_timeout.
+        """
+        ticket = self.submit(priority)
+        try:
+            while not ticket.wait(poll_interval):
+                if time.time() - ticket.enqueued_at > self.queue_timeout:
+                    with self._cond:
+                        self.counters['timed_out'] += 1
+                    raise QueueTimeout(f"No free model slot after {self.queue_timeout:.0f}s")
+                if on_wait is not None:
+                    on_wait(ticket.position(), ticket.estimated_wait())
+            yield ticket
+        finally:
+            ticket.release()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            stats = dict(self.counters)
+            stats.update({
+                'queue_depth': len(self._queue),
+                'in_flight': self._in_flight,
+                'max_in_flight': self.max_in_flight,
+            })
+        stats.update({
+            'wait_p50': QUEUE_WAIT_SECONDS.percentile(0.50) or 0.0,
+            'wait_p95': QUEUE_WAIT_SECONDS.percentile(0.95) or 0.0,
+            'service_p50': QUEUE_SERVICE_SECONDS.percentile(0.50) or 0.0,
+            'service_p95': QUEUE_SERVICE_SECONDS.percentile(0.95) or 0.0,
+        })
+        return stats
+
+    def _dispatch(self) -> None:
+        """Grant slots to the head of the queue; caller holds the lock"""
+        granted = False
+        while self._queue and self._in_flight < self.max_in_flight:
+            ticket = heapq.heappop(self._queue)
+            ticket.state = 'running'
+            ticket.granted_at = time.time()
+            QUEUE_WAIT_SECONDS.observe(ticket.granted_at - ticket.enqueued_at)
+            self._in_flight += 1
+            granted = True
+        if granted:
+            self._cond.notify_all()
+
+    def _wait(self, ticket: Ticket, timeout: Optional[float]) -> bool:
+        with self._cond:
+            return self._cond.wait_for(lambda: ticket.state == 'running', timeout)
+
+    def _position(self, ticket: Ticket) -> int:
+        with self._cond:
+            if ticket.state != 'queued':
+                return 0
+            return 1 + sum(1 for other in self._queue if other < ticket)
+
+    def _estimated_wait(self, position: int) -> float:
+        if position <= 0:
+            return 0.0
+        typical_service = QUEUE_SERVICE_SECONDS.percentile(0.50)
+        if typical_service is None:
+            typical_service = 5.0
+        return position / self.max_in_flight * typical_service
+
+    def _release(self, ticket: Ticket) -> None:
+        with self._cond:
+            if ticket.state == 'running':
+                self._in_flight -= 1
+                QUEUE_SERVICE_SECONDS.observe(time.time() - ticket.granted_at)
+                self.counters['served'] += 1
+                ticket.state = 'done'
+            elif ticket.state == 'queued':
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+                ticket.state = 'cancelled'
+            self._dispatch()
+
+
+_shared_scheduler: Optional[InferenceScheduler] = None
+_shared_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> InferenceScheduler:
+    """Process-wide scheduler shared by every DentiBuddy instance, configured from the environment"""
+    global _shared_scheduler
+    with _shared_scheduler_lock:
+        if _shared_scheduler is None:
+            _shared_scheduler = InferenceScheduler(
+                max_in_flight=int(os.getenv("OLLAMA_MAX_IN_FLIGHT", "2")),
+                queue_timeout=float(os.getenv("DENTIBUDDY_QUEUE_TIMEOUT", "120")),
+            )
+        return _shared_scheduler
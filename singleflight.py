@@ -0,0 +1,103 @@
+"""
+Request coalescing for identical in-flight questions.
+
+When many sessions ask the same question at the same moment, only the first
+one (the leader) runs a generation. Later callers with the same key attach
+to it as followers: they replay the fragments streamed so far, then receive
+new ones as they arrive, and finally get the leader's result.
+"""
+
+import threading
+from typing import Dict, Any, Generator, List, Optional, Tuple
+
+
+class Flight:
+    """One shared generation and everything it has streamed so far"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self.fragments: List[str] = []
+        self.result: Optional[Dict[str, Any]] = None
+        self.abandoned = False
+        self.followers = 0
+
+    def publish(self, fragment: str) -> None:
+        with self._cond:
+            self.fragments.append(fragment)
+            self._cond.notify_all()
+
+    def finish(self, result: Optional[Dict[str, Any]]) -> None:
+        """Hand out the final result; None means the leader gave up part way"""
+        with self._cond:
+            self.result = result
+            self.abandoned = result is None
+            self._cond.notify_all()
+
+    def follow(self) -> Generator[str, None, Optional[Dict[str, Any]]]:
+        """
+        Yield every fragment in order and return the leader's result, or None
+        if the leader stopped before finishing.
+        """
+        index = 0
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: len(self.fragments) > index or self._finished())
+                new = self.fragments[index:]
+                finished = self._finished()
+            for fragment in new:
+                yield fragment
+            index += len(new)
+            if finished and index == len(self.fragments):
+                return self.result
+
+    def _finished(self) -> bool:
+        return self.result is not None or self.abandoned
+
+
+class SingleFlight:
+    """Registry of in-progress generations, keyed by normalized request"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[str, Flight] = {}
+        self.counters = {'leaders': 0, 'coalesced': 0, 'abandoned': 0}
+
+    def join(self, key: str) -> Tuple[Flight, bool]:
+        """Return (flight, is_leader). The leader must call done() when finished."""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.followers += 1
+                self.counters['coalesced'] += 1
+                return flight, False
+            flight = self._flights[key] = Flight()
+            self.counters['leaders'] += 1
+            return flight, True
+
+    def done(self, key: str, flight: Flight, result: Optional[Dict[str, Any]]) -> None:
+        """Publish the leader's result and stop accepting followers for this key"""
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            if result is None:
+                self.counters['abandoned'] += 1
+        flight.finish(result)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.counters)
+            stats['in_flight'] = len(self._flights)
+        return stats
+
+
+_shared_single_flight: Optional[SingleFlight] = None
+_shared_single_flight_lock = threading.Lock()
+
+
+def get_single_flight() -> SingleFlight:
+    """Process-wide registry shared by every DentiBuddy instance"""
+    global _shared_single_flight
+    with _shared_single_flight_lock:
+        if _shared_single_flight is None:
+            _shared_single_flight = SingleFlight()
+        return _shared_single_flight
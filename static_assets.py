@@ -0,0 +1,169 @@
+"""
+Static HTML and CSS for the Streamlit UI.
+
+Streamlit re-executes app.py on every interaction. Fragments that never
+change live here instead, so they are built and dedented once per process
+and each rerun only sends the finished strings.
+"""
+
+from textwrap import dedent
+
+PAGE_CONFIG = {
+    'page_title': "DentiBuddy 🦷",
+    'page_icon': "🦷",
+    'layout': "centered",
+    'initial_sidebar_state': "collapsed",
+}
+
+# Custom CSS for professional styling
+PAGE_CSS = dedent("""
+<style>
+:root {
+    --primary-color: #00A3A3; /* Bright Teal */
+    --secondary-color: #00C2C2; /* Lighter Teal */
+    --background-color: #F0FDF4; /* Very Light Mint Green */
+    --text-color: #202124; /* Dark Gray for high contrast */
+    --light-text-color: #FFFFFF;
+    --warning-bg: #FEF3C7; /* Amber */
+    --warning-border: #FBBF24;
+    --warning-text: #92400E;
+    --danger-bg: #FEE2E2; /* Red */
+    --danger-border: #EF4444;
+    --danger-text: #991B1B;
+}
+
+body {
+    background-color: var(--background-color);
+    color: var(--text-color);
+}
+
+.main-header {
+    text-align: center;
+    color: var(--primary-color);
+    font-size: 2.8rem;
+    margin-bottom: 0.5rem;
+    font-weight: 700;
+}
+.subtitle {
+    text-align: center;
+    color: #555;
+    font-size: 1.2rem;
+    margin-bottom: 2rem;
+}
+.disclaimer {
+    background-color: var(--warning-bg);
+    border: 1px solid var(--warning-border);
+    border-radius: 10px;
+    padding: 1.5rem;
+    margin: 1.5rem 0;
+    color: var(--warning-text);
+    box-shadow: 0 2px 4px rgba(0,0,0,0.05);
+}
+.emergency {
+    background-color: var(--danger-bg);
+    border: 2px solid var(--danger-border);
+    border-radius: 10px;
+    padding: 1.5rem;
+    margin: 1.5rem 0;
+    color: var(--danger-text);
+    font-weight: bold;
+    animation: pulse 1.5s infinite;
+}
+@keyframes pulse {
+    0% { box-shadow: 0 0 0 0 rgba(239, 68, 68, 0.4); }
+    70% { box-shadow: 0 0 0 10px rgba(239, 68, 68, 0); }
+    100% { box-shadow: 0 0 0 0 rgba(239, 68, 68, 0); }
+}
+.response-box {
+    background-color: #FFFFFF;
+    border-left: 5px solid var(--primary-color);
+    padding: 1.5rem;
+    margin: 1.5rem 0;
+    border-radius: 8px;
+    box-shadow: 0 4px 12px rgba(0,0,0,0.08);
+}
+.tips-box {
+    background-color: #D1FAE5; /* Light Green */
+    border: 1px solid #10B981;
+    border-radius: 8px;
+    padding: 1rem;
+    margin: 1rem 0;
+}
+.session-info {
+    background: #E5E7EB;
+    border: 1px solid #D1D5DB;
+    border-radius: 5px;
+    padding: 0.5rem;
+    font-family: monospace;
+    font-size: 0.8rem;
+}
+.stButton > button {
+    background-image: linear-gradient(to right, var(--primary-color) 0%, var(--secondary-color) 100%);
+    color: var(--light-text-color);
+    border: none;
+    border-radius: 25px;
+    padding: 0.85rem 2rem;
+    font-weight: bold;
+    transition: all 0.3s ease;
+    box-shadow: 0 4px 15px rgba(0, 163, 163, 0.2);
+}
+.stButton > button:hover {
+    transform: translateY(-3px);
+    box-shadow: 0 6px 20px rgba(0, 163, 163, 0.3);
+}
+</style>
+""").strip()
+
+HEADER_HTML = '<h1 class="main-header">DentiBuddy 🦷</h1>'
+SUBTITLE_HTML = '<p class="subtitle">Your AI-powered dental health assistant</p>'
+
+TROUBLESHOOTING_HTML = dedent("""
+        <div class="disclaimer">
+            <strong>🛠️ TROUBLESHOOTING STEPS</strong><br><br>
+            1. <strong>Start Ollama</strong>: Open a terminal and run: <code>ollama serve</code><br>
+            2. <strong>Check connection</strong>: Visit <a href="http://127.0.0.1:11434" target="_blank">http://127.0.0.1:11434</a> in your browser<br>
+            3. <strong>Firewall settings</strong>: Ensure port 11434 is allowed through your firewall<br>
+            4. <strong>Environment variable</strong>: Try setting OLLAMA_URL before running:<br>
+            &nbsp;&nbsp;&nbsp;&nbsp;<code>set OLLAMA_URL=http://127.0.0.1:11434/api/generate</code> (Windows)<br>
+            &nbsp;&nbsp;&nbsp;&nbsp;<code>export OLLAMA_URL=http://127.0.0.1:11434/api/generate</code> (Mac/Linux)<br>
+            5. <strong>Restart your computer</strong>: Sometimes fixes network stack issues
+        </div>
+        """).strip()
+
+DISCLAIMER_HTML = dedent("""
+    <div class="disclaimer">
+        <strong>⚠️ IMPORTANT MEDICAL DISCLAIMER</strong><br><br>
+        DentiBuddy is an AI assistant for <strong>informational purposes only</strong> and is 
+        <strong>NOT a substitute for professional medical advice, diagnosis, or treatment</strong>. 
+        <br><br>
+        • Always consult a qualified dentist for dental concerns<br>
+        • In emergencies, contact your dentist or emergency services immediately<br>
+        • Do not delay seeking professional care based on AI responses<br>
+        • This tool cannot diagnose conditions or replace clinical examination
+    </div>
+    """).strip()
+
+TIPS_HTML = dedent("""
+        <div class="tips-box">
+        <strong>Daily Routine:</strong><br>
+        • Brush 2x daily with fluoride toothpaste<br>
+        • Floss daily to remove plaque<br>
+        • Use mouthwash for extra protection<br>
+        • Replace toothbrush every 3 months<br><br>
+        
+        <strong>Healthy Habits:</strong><br>
+        • Limit sugary and acidic foods<br>
+        • Don't use teeth as tools<br>
+        • Wear mouthguard for sports<br>
+        • Stay hydrated with water
+        </div>
+        """).strip()
+
+SEE_A_DENTIST_MARKDOWN = dedent("""
+        - **Severe, persistent pain**
+        - **Facial or gum swelling**
+        - **Knocked out or broken tooth**
+        - **Uncontrolled bleeding**
+        - **Signs of infection (fever, pus)**
+        - **Difficulty swallowing/breathing**
+        """).strip()
@@ -0,0 +1,544 @@
+"""
+Precompiled emergency triage engine for DentiBuddy.
+
+All pain-level patterns and English keyword tables are folded into a single
+regex that is compiled once at import time, so each message is scanned in one
+linear pass instead of once per pattern and once per keyword.
+
+A second, word-level index adds translated keyword sets and tolerates typos
+("abcess", "sweling"). Lookups go through a symmetric-delete index, so the
+work per message word depends on the word's length, not on how many
+keywords there are.
+"""
+
+import os
+import re
+import string
+import unicodedata
+from typing import Dict, Any, Iterable, List, Optional, Set, Tuple
+
+# Pain level patterns (6/10 and above), merged into one alternation. Patterns
+# that can start at the same position share a prefix so none is shadowed:
+#   (\d+)/10            X/10 format
+#   (\d+)/10\s*pain     X/10 pain format
+#   (\d+)\s*out\s*of\s*10  X out of 10 format
+#   (\d+)\s*on\s*10     X on 10 format
+#   pain\s*level\s*(\d+)  pain level X format
+#   scale\s*of\s*(\d+)    scale of X format
+PAIN_PATTERN = (
+    r'(?P<num>\d+)(?:(?P<x_over_10>/10)(?P<x_over_10_pain>\s*pain)?'
+    r'|(?P<x_out_of_10>\s*out\s*of\s*10)|(?P<x_on_10>\s*on\s*10))'
+    r'|(?P<pain_level_x>pain\s*level\s*(?P<level_num>\d+))'
+    r'|(?P<scale_of_x>scale\s*of\s*(?P<scale_num>\d+))'
+)
+
+# Original pattern order, used to order the reported pain triggers
+PAIN_KINDS = ['x_over_10', 'x_out_of_10', 'pain_level_x', 'x_over_10_pain', 'x_on_10', 'scale_of_x']
+
+PAIN_THRESHOLD = 6
+
+# Category reported for a pain level at or above PAIN_THRESHOLD
+PAIN_LEVEL_CATEGORY = 'pain_level'
+
+# Keyword categories: (category, trigger label, first_only, keywords)
+KEYWORD_CATEGORIES: List[Tuple[str, str, bool, List[str]]] = [
+    ('severe_pain', 'Severe pain indicator', True, [
+        'severe pain', 'extreme pain', 'unbearable pain', 'excruciating',
+        'agony', 'torture', 'killing me', 'worst pain', 'screaming'
+    ]),
+    ('emergency', 'Emergency keyword', False, [
+        'emergency', 'urgent', 'asap', 'right now', 'immediately'
+    ]),
+    ('sleep_loss', 'Emergency keyword', False, [
+        'can\'t sleep', 'cant sleep', 'couldn\'t sleep', 'couldnt sleep',
+        'all night', 'kept me awake', 'no sleep'
+    ]),
+    ('infection', 'Infection indicator', False, [
+        'swollen', 'swelling', 'pus', 'abscess', 'infection', 'infected',
+        'fever', 'face swollen', 'jaw swollen', 'can\'t open mouth'
+    ]),
+    ('trauma', 'Trauma indicator', False, [
+        'knocked out', 'broken tooth', 'cracked tooth', 'chipped tooth',
+        'accident', 'hit in mouth', 'trauma', 'bleeding', 'blood'
+    ]),
+]
+
+
+# Translated keywords: language -> category -> keywords. They are matched on
+# whole words after accent folding, so "hinchazon" also finds "hinchazón".
+# A translation that contains an English keyword of the same category
+# ("urgente") is left to the English pattern.
+TRANSLATED_KEYWORDS: Dict[str, Dict[str, List[str]]] = {
+    'es': {
+        'severe_pain': [
+            'dolor severo', 'dolor fuerte', 'dolor intenso', 'dolor extremo', 'dolor insoportable',
+            'insoportable', 'agonía', 'me está matando', 'peor dolor'
+        ],
+        'emergency': [
+            'emergencia', 'urgencia', 'urgente', 'ahora mismo', 'inmediatamente', 'lo antes posible'
+        ],
+        'sleep_loss': [
+            'no puedo dormir', 'no pude dormir', 'no me deja dormir', 'sin dormir', 'toda la noche'
+        ],
+        'infection': [
+            'hinchado', 'hinchada', 'hinchazón', 'inflamado', 'inflamada', 'pus', 'absceso',
+            'infección', 'infectado', 'infectada', 'fiebre', 'cara hinchada', 'no puedo abrir la boca'
+        ],
+        'trauma': [
+            'diente roto', 'diente partido', 'diente astillado', 'se me cayó un diente', 'accidente',
+            'golpe', 'sangrado', 'sangrando', 'sangre', 'traumatismo'
+        ],
+    },
+    'fr': {
+        'severe_pain': [
+            'douleur intense', 'douleur insupportable', 'douleur atroce', 'insupportable', 'atroce',
+            'pire douleur'
+        ],
+        'emergency': [
+            'urgence', 'urgent', 'immédiatement', 'tout de suite', 'au plus vite'
+        ],
+        'sleep_loss': [
+            'pas dormi', 'peux pas dormir', 'empêche de dormir', 'toute la nuit'
+        ],
+        'infection': [
+            'gonflé', 'gonflée', 'gonflement', 'enflé', 'enflée', 'joue gonflée', 'pus', 'abcès',
+            'infection', 'infecté', 'infectée', 'fièvre'
+        ],
+        'trauma': [
+            'dent cassée', 'dent fêlée', 'dent tombée', 'accident', 'saignement', 'saigne'
+        ],
+    },
+}
+
+
+def _parse_languages(value: str) -> List[str]:
+    """Language codes from a comma-separated setting; each must have TRANSLATED_KEYWORDS"""
+    languages = [language.strip() for language in value.split(',') if language.strip()]
+    unknown = [language for language in languages if language not in TRANSLATED_KEYWORDS]
+    if unknown:
+        raise ValueError(f"DENTIBUDDY_TRIAGE_LANGUAGES has unknown language {', '.join(unknown)}; "
+                         f"use a comma-separated list of {', '.join(TRANSLATED_KEYWORDS)}, or leave it empty")
+    return languages
+
+
+# Languages matched by TRIAGE_ENGINE (comma-separated; empty for English only)
+TRIAGE_LANGUAGES = _parse_languages(os.getenv("DENTIBUDDY_TRIAGE_LANGUAGES", ','.join(TRANSLATED_KEYWORDS)))
+
+# DENTIBUDDY_TRIAGE_FUZZY=0 matches keyword words exactly (after folding)
+TRIAGE_FUZZY = os.getenv("DENTIBUDDY_TRIAGE_FUZZY", "1") != "0"
+
+# Words shorter than FUZZY_MIN_LENGTH only match exactly. Longer words allow
+# one edit (insertion, deletion, substitution or swap of neighbours), and
+# from FUZZY_TWO_EDITS_LENGTH characters on two. The limit follows the
+# shorter of the typed word and the keyword word, so "immediate" is two
+# edits short of "immediately" rather than a typo of it.
+FUZZY_MIN_LENGTH = 6
+FUZZY_TWO_EDITS_LENGTH = 10
+
+# Only this many leading characters go into the delete index, which keeps it
+# small for long words; candidates are confirmed on the whole word
+FUZZY_PREFIX_LENGTH = 7
+
+# Ordinary words within an edit of a keyword word. They only match exactly,
+# so "injection" is never read as "infection".
+FUZZY_EXCLUDE = frozenset([
+    'injection', 'injections', 'injected', 'inflection', 'infested', 'smelling', 'spelling',
+    'breeding', 'bleeping', 'blending', 'blended', 'streaming', 'clipped', 'chopped', 'broker',
+    'emergence', 'emergent', 'immediate',
+])
+
+# Message words kept in each index's lookup cache before it is cleared
+FUZZY_CACHE_SIZE = 65536
+
+_WORD = re.compile(r'[^\W_]+')
+_NO_MATCH: Dict[int, int] = {}
+
+# Splitting on whitespace after this is several times faster than _WORD
+_ASCII_PUNCTUATION = str.maketrans({char: ' ' for char in string.punctuation})
+
+
+def fold(text: str) -> str:
+    """Lowercase, drop apostrophes and strip accents"""
+    text = text.lower().replace("'", '')
+    if not text.isascii():
+        text = text.replace('\u2019', '').replace('`', '')
+        text = ''.join(char for char in unicodedata.normalize('NFKD', text) if not unicodedata.combining(char))
+    return text
+
+
+def words(text: str) -> List[str]:
+    """Folded words of text"""
+    text = fold(text)
+    if text.isascii():
+        return text.translate(_ASCII_PUNCTUATION).split()
+    return _WORD.findall(text)
+
+
+def max_edits(length: int) -> int:
+    """Edits tolerated for a keyword word of this length"""
+    if length < FUZZY_MIN_LENGTH:
+        return 0
+    return 1 if length < FUZZY_TWO_EDITS_LENGTH else 2
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance, or limit + 1 once it is exceeded"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+
+def _deletes(word: str, depth: int) -> Set[str]:
+    """word and every string made by deleting up to depth characters from it"""
+    found = {word}
+    frontier = {word}
+    for _ in range(depth):
+        frontier = {variant[:i] + variant[i + 1:] for variant in frontier for i in range(len(variant))}
+        found |= frontier
+    return found
+
+
+class KeywordIndex:
+    """
+    Whole-word keyword matcher with bounded typo tolerance.
+
+    Keywords are split into folded words. Each distinct keyword word of
+    FUZZY_MIN_LENGTH or more characters is stored under every deletion of
+    its prefix, up to its edit limit. A message word is looked up by its own
+    deletions, and the candidates found are confirmed with an edit-distance
+    check, so the cost of a lookup does not grow with the vocabulary. Lookups
+    are memoized per distinct message word. Multi-word keywords are matched
+    as consecutive message words, each within its own edit limit.
+
+    Keywords marked as covered are also found exactly by another matcher, so
+    only their inexact hits are reported. A message whose words only match
+    covered keywords exactly returns without any phrase matching.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, Any, bool]], fuzzy: bool = True):
+        """entries are (keyword, tag, covered) triples"""
+        self.fuzzy = fuzzy
+        self.vocabulary: List[str] = []
+        self.word_ids: Dict[str, int] = {}
+        # First word id -> [(word ids, tag, covered)]
+        self.phrases: Dict[int, List[Tuple[Tuple[int, ...], Any, bool]]] = {}
+        self.deletes: Dict[str, List[int]] = {}
+        # Word ids that appear in a keyword which is not covered
+        self.uncovered: Set[int] = set()
+        # Message word -> (word id -> distance, whether any hit may be new)
+        self.cache: Dict[str, Tuple[Dict[int, int], bool]] = {}
+
+        for keyword, tag, covered in entries:
+            phrase = words(keyword)
+            if not phrase:
+                continue
+            ids = tuple(self._add_word(word) for word in phrase)
+            self.phrases.setdefault(ids[0], []).append((ids, tag, covered))
+            if not covered:
+                self.uncovered.update(ids)
+
+    def _add_word(self, word: str) -> int:
+        word_id = self.word_ids.get(word)
+        if word_id is None:
+            word_id = self.word_ids[word] = len(self.vocabulary)
+            self.vocabulary.append(word)
+            if len(word) >= FUZZY_MIN_LENGTH:
+                for deletion in _deletes(word[:FUZZY_PREFIX_LENGTH], max_edits(len(word))):
+                    self.deletes.setdefault(deletion, []).append(word_id)
+        return word_id
+
+    def lookup(self, word: str) -> Tuple[Dict[int, int], bool]:
+        """Keyword word ids within their edit limit of word -> distance, and whether a hit may be new"""
+        entry = self.cache.get(word)
+        if entry is not None:
+            return entry
+
+        found: Dict[int, int] = {}
+        exact = self.word_ids.get(word)
+        if exact is not None:
+            found[exact] = 0
+        elif self.fuzzy and word not in FUZZY_EXCLUDE:
+            # Keyword words up to two characters longer may be in reach
+            depth = max_edits(len(word) + 2)
+            if depth:
+                for deletion in _deletes(word[:FUZZY_PREFIX_LENGTH], depth):
+                    for word_id in self.deletes.get(deletion, ()):
+                        candidate = self.vocabulary[word_id]
+                        # Typos rarely change the first letter, and allowing
+                        # it lets too many unrelated words in
+                        if word_id in found or candidate[0] != word[0]:
+                            continue
+                        limit = max_edits(min(len(word), len(candidate)))
+                        distance = edit_distance(word, candidate, limit)
+                        if distance <= limit:
+                            found[word_id] = distance
+
+        entry = (found, exact is None or exact in self.uncovered) if found else (found, False)
+        if len(self.cache) >= FUZZY_CACHE_SIZE:
+            self.cache.clear()
+        self.cache[word] = entry
+        return entry
+
+    def find(self, text: str) -> List[Tuple[Any, str, int]]:
+        """(tag, matched words, total edits) for each keyword found, first occurrence only"""
+        message = words(text)
+        # Pasted histories repeat most of their words, so each distinct word
+        # is looked up once
+        cache = self.cache
+        matched_words = {}
+        new = False
+        for word in set(message):
+            entry = cache.get(word) or self.lookup(word)
+            if entry[0]:
+                matched_words[word] = entry[0]
+                new = new or entry[1]
+        if not new:
+            return []
+
+        hits: Dict[Any, Tuple[str, int]] = {}
+        length = len(message)
+        for i in [i for i, word in enumerate(message) if word in matched_words]:
+            for first_id, first_distance in matched_words[message[i]].items():
+                for ids, tag, covered in self.phrases.get(first_id, ()):
+                    if tag in hits or i + len(ids) > length:
+                        continue
+                    distance = first_distance
+                    for offset in range(1, len(ids)):
+                        step = matched_words.get(message[i + offset], _NO_MATCH).get(ids[offset])
+                        if step is None:
+                            break
+                        distance += step
+                    else:
+                        if distance or not covered:
+                            hits[tag] = (' '.join(message[i:i + len(ids)]), distance)
+        return [(tag, matched, distance) for tag, (matched, distance) in hits.items()]
+
+
+def _trie_alternatives(words: List[str]) -> List[str]:
+    """Fold words into a prefix trie and return one regex alternative per first character"""
+    trie: Dict[str, Any] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def emit(node: Dict[str, Any]) -> str:
+        branches = [re.escape(char) + emit(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = '(?:' + '|'.join(branches) + ')'
+        # Greedy optional tail, so the longest keyword wins
+        return body + '?' if '' in node else body
+
+    return [re.escape(char) + emit(child) for char, child in sorted(trie.items())]
+
+
+class TriageEngine:
+    """
+    Single-pass emergency triage matcher.
+
+    Every keyword and pain pattern is folded into one regex whose top-level
+    alternatives all start with a literal character, which lets the regex
+    engine skip non-candidate characters quickly. Each hit is then classified
+    with small anchored patterns, and the scan resumes one character later so
+    overlapping hits ("face swollen" and "swollen") are all reported exactly
+    like the per-keyword substring checks it replaces.
+
+    Translated keywords, typos and accent or apostrophe variants are then
+    looked up word by word in a KeywordIndex. Its hits only add triggers for
+    keywords the regex did not already report.
+    """
+
+    def __init__(self, keyword_categories=KEYWORD_CATEGORIES,
+                 translations: Optional[Dict[str, Dict[str, List[str]]]] = None,
+                 fuzzy: bool = True):
+        self.keyword_categories = keyword_categories
+        self.keyword_index = self._build_keyword_index(translations or {}, fuzzy)
+        self.folded = {
+            keyword: ' '.join(words(keyword)) for _, _, _, keywords in keyword_categories for keyword in keywords
+        }
+
+        # keyword -> list of (category index, position in category list)
+        self.keyword_tags: Dict[str, List[Tuple[int, int]]] = {}
+        for cat_index, (_, _, _, keywords) in enumerate(keyword_categories):
+            for kw_index, keyword in enumerate(keywords):
+                self.keyword_tags.setdefault(keyword, []).append((cat_index, kw_index))
+
+        # A hit on a keyword also counts every shorter keyword that is its
+        # prefix, since those start at the same position and are shadowed.
+        self.implied: Dict[str, List[str]] = {
+            keyword: [other for other in self.keyword_tags if keyword.startswith(other)]
+            for keyword in self.keyword_tags
+        }
+
+        keyword_alternatives = _trie_alternatives(list(self.keyword_tags))
+        # Digit-led pain patterns are spelled out per leading digit so that
+        # every alternative starts with a literal
+        pain_alternatives = [
+            rf'{digit}\d*(?:/10|\s*out\s*of\s*10|\s*on\s*10)' for digit in '0123456789'
+        ] + [r'pain\s*level\s*\d+', r'scale\s*of\s*\d+']
+
+        # Pain patterns come first; a keyword that could start at the same
+        # position needs an extra anchored check so neither shadows the other
+        self.keywords_overlap_pain = any(
+            keyword[:1].isdigit() or keyword.startswith(('pain', 'scale'))
+            for keyword in self.keyword_tags
+        )
+        self.pattern = re.compile('|'.join(pain_alternatives + keyword_alternatives))
+        self.keyword_pattern = re.compile('|'.join(keyword_alternatives))
+        self.pain_pattern = re.compile(PAIN_PATTERN)
+
+    def _build_keyword_index(self, translations: Dict[str, Dict[str, List[str]]], fuzzy: bool) -> Optional[KeywordIndex]:
+        if not fuzzy and not translations:
+            return None
+        cat_indexes = {category: cat_index for cat_index, (category, _, _, _) in enumerate(self.keyword_categories)}
+        # English keywords come first so they win ties and keep their order
+        keyword_sets = [(category, keywords) for category, _, _, keywords in self.keyword_categories]
+        for language in translations.values():
+            keyword_sets.extend(language.items())
+
+        entries = []
+        seen: Set[Tuple[int, Tuple[str, ...]]] = set()
+        for category, keywords in keyword_sets:
+            cat_index = cat_indexes[category]
+            english = self.keyword_categories[cat_index][3]
+            for keyword in keywords:
+                phrase = tuple(words(keyword))
+                if (cat_index, phrase) not in seen:
+                    seen.add((cat_index, phrase))
+                    # English keywords that are already plain words are found exactly by the regex
+                    covered = keyword in english and keyword.lower() == ' '.join(phrase)
+                    entries.append((keyword, (cat_index, len(entries), keyword), covered))
+        return KeywordIndex(entries, fuzzy=fuzzy)
+
+    def scan(self, text: str) -> Dict[str, Any]:
+        """Triage a message and return the detect_emergency result dict"""
+        text = text.lower()
+        detected_triggers = []
+
+        pain_levels: Dict[str, int] = {}
+        pain_ends: Dict[str, int] = {}
+        keyword_hits: Dict[int, Dict[int, str]] = {}
+
+        search = self.pattern.search
+        pos = 0
+        while True:
+            match = search(text, pos)
+            if match is None:
+                break
+            start = match.start()
+            pos = start + 1
+
+            hit = match.group()
+            keyword = hit if hit in self.implied else None
+            if keyword is None and self.keywords_overlap_pain:
+                keyword_match = self.keyword_pattern.match(text, start)
+                keyword = keyword_match.group() if keyword_match else None
+            if keyword is not None:
+                for implied in self.implied[keyword]:
+                    for cat_index, kw_index in self.keyword_tags[implied]:
+                        keyword_hits.setdefault(cat_index, {})[kw_index] = implied
+                if not self.keywords_overlap_pain:
+                    continue
+
+            pain_match = self.pain_pattern.match(text, start)
+            if pain_match is None:
+                continue
+
+            num = pain_match.group('num')
+            if num is not None:
+                level = int(num)
+                spans = [
+                    (kind, pain_match.end(kind))
+                    for kind in ('x_over_10', 'x_over_10_pain', 'x_out_of_10', 'x_on_10')
+                    if pain_match.group(kind) is not None
+                ]
+            elif pain_match.group('pain_level_x') is not None:
+                level = int(pain_match.group('level_num'))
+                spans = [('pain_level_x', pain_match.end())]
+            else:
+                level = int(pain_match.group('scale_num'))
+                spans = [('scale_of_x', pain_match.end())]
+
+            for kind, end in spans:
+                # Mirror re.findall: matches of the same pattern never overlap,
+                # and only the first qualifying level per pattern counts
+                if kind in pain_levels or start < pain_ends.get(kind, 0):
+                    continue
+                pain_ends[kind] = end
+                if level >= PAIN_THRESHOLD:
+                    pain_levels[kind] = level
+
+        # Keyword hits the regex missed: other languages, typos, and spellings
+        # that only match once folded. Words that contain a keyword the regex
+        # found in the same category ("urgente" for "urgent") are not counted
+        # again, and words that match several keywords of one category
+        # ("infecion" for "infection" and "infección") count once, as the
+        # closest keyword.
+        word_hits: Dict[int, Dict[str, Tuple[int, int, str]]] = {}
+        if self.keyword_index is not None:
+            for (cat_index, order, keyword), matched, distance in self.keyword_index.find(text):
+                hits = keyword_hits.get(cat_index)
+                if hits and any(self.folded[found] in matched for found in hits.values()):
+                    continue
+                by_words = word_hits.setdefault(cat_index, {})
+                if matched not in by_words or (distance, order) < by_words[matched][:2]:
+                    by_words[matched] = (distance, order, keyword)
+
+        categories = [PAIN_LEVEL_CATEGORY] if pain_levels else []
+        for kind in PAIN_KINDS:
+            if kind in pain_levels:
+                detected_triggers.append(f"Pain level {pain_levels[kind]}/10")
+
+        # Misspelled matches are weaker evidence: they make a message an
+        # emergency, but only exact triggers count toward HIGH
+        fuzzy_triggers: Set[str] = set()
+        for cat_index, (category, label, first_only, _) in enumerate(self.keyword_categories):
+            hits = keyword_hits.get(cat_index)
+            extra = word_hits.get(cat_index)
+            if not hits and not extra:
+                continue
+            categories.append(category)
+            triggers = [f"{label}: '{hits[kw_index]}'" for kw_index in sorted(hits)] if hits else []
+            if extra:
+                for distance, _, keyword, matched in sorted(
+                        (distance, order, keyword, matched) for matched, (distance, order, keyword) in extra.items()):
+                    if distance == 0:
+                        triggers.append(f"{label}: '{keyword}'")
+                    else:
+                        triggers.append(f"{label}: '{keyword}' (typed '{matched}')")
+                        fuzzy_triggers.add(triggers[-1])
+            if first_only:
+                triggers = triggers[:1]
+            detected_triggers.extend(triggers)
+
+        # Counted before duplicates are removed, as the original loop did: a
+        # pain score that matches two patterns ("8/10 pain") counts twice
+        exact_triggers = len([trigger for trigger in detected_triggers if trigger not in fuzzy_triggers])
+        return {
+            'is_emergency': len(detected_triggers) > 0,
+            'triggers': list(dict.fromkeys(detected_triggers)), # Remove duplicates, keep order
+            'severity': 'HIGH' if exact_triggers >= 2 else 'MODERATE' if detected_triggers else 'LOW',
+            'categories': categories
+        }
+
+
+# Built once per process and shared by every DentiBuddy instance
+TRIAGE_ENGINE = TriageEngine(
+    translations={language: TRANSLATED_KEYWORDS[language] for language in TRIAGE_LANGUAGES},
+    fuzzy=TRIAGE_FUZZY,
+)
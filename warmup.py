@@ -0,0 +1,153 @@
+"""
+Model warm-up and keep-alive for DentiBuddy.
+
+Ollama unloads a model once it has been idle for its keep_alive period, and
+the next question then pays the full load time. The warmer loads the model
+when the process starts and, during business hours, touches it again shortly
+before the keep-alive would run out. Real questions count as touches, so a
+busy clinic never sees extra requests.
+"""
+
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Any, Optional, Tuple
+
+_DURATION_RE = re.compile(r'^\s*(-?\d+(?:\.\d+)?)\s*([smh]?)\s*$')
+_UNITS = {'': 1, 's': 1, 'm': 60, 'h': 3600}
+
+
+def parse_keep_alive(value: str) -> Optional[float]:
+    """
+    Seconds for an Ollama keep_alive value such as '30m', '1h' or '300'.
+    Negative values keep the model loaded forever and return None.
+    """
+    match = _DURATION_RE.match(value)
+    if match is None:
+        raise ValueError(f"Invalid keep_alive duration: {value!r}")
+    seconds = float(match.group(1)) * _UNITS[match.group(2)]
+    return None if seconds < 0 else seconds
+
+
+def parse_hours(value: str) -> Optional[Tuple[int, int]]:
+    """'7-19' -> (7, 19), local time; an empty value turns idle touches off"""
+    if not value.strip():
+        return None
+    start, _, end = value.partition('-')
+    return int(start), int(end)
+
+
+class ModelWarmer:
+    """
+    Background thread that keeps the model loaded.
+
+    `warm` loads the model and returns {'success': bool, 'seconds': float,
+    'error': str or None}. The first warm-up runs at once and is retried
+    every `retry_interval` until it succeeds. After that the model is
+    touched once `margin` of the keep-alive has passed since it was last
+    used, but only between `hours` (start inclusive, end exclusive).
+    """
+
+    def __init__(self, warm: Callable[[], Dict[str, Any]], keep_alive_seconds: Optional[float] = 1800.0,
+                 hours: Optional[Tuple[int, int]] = (7, 19), margin: float = 0.8,
+                 retry_interval: float = 60.0, idle_poll: float = 300.0):
+        self.warm = warm
+        self.keep_alive_seconds = keep_alive_seconds
+        self.hours = hours
+        self.margin = margin
+        self.retry_interval = retry_interval
+        self.idle_poll = idle_poll
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._last_used = 0.0
+        self._warmed = False
+        self.counters = {'warmups': 0, 'touches': 0, 'failures': 0}
+        self.last_warmup: Optional[Dict[str, Any]] = None
+
+        self._thread = threading.Thread(target=self._run, name="dentibuddy-warmup", daemon=True)
+        self._thread.start()
+
+    def mark_used(self) -> None:
+        """Record that the model just answered, which resets Ollama's keep-alive"""
+        with self._lock:
+            self._last_used = time.time()
+
+    def is_loaded(self) -> bool:
+        """Whether the model should still be in memory, judging by the keep-alive"""
+        with self._lock:
+            if not self._last_used:
+                return False
+            if self.keep_alive_seconds is None:
+                return True
+            return time.time() - self._last_used < self.keep_alive_seconds
+
+    def in_business_hours(self, now: Optional[datetime] = None) -> bool:
+        if self.hours is None:
+            return False
+        hour = (now or datetime.now()).hour
+        start, end = self.hours
+        return start <= hour < end if start <= end else hour >= start or hour < end
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.counters)
+            stats['last_used'] = self._last_used or None
+        stats['loaded'] = self.is_loaded()
+        stats['last_warmup'] = self.last_warmup
+        return stats
+
+    def _touch_due_in(self) -> Optional[float]:
+        """Seconds until the next touch, or None if the model never expires"""
+        if self.keep_alive_seconds is None:
+            return None
+        with self._lock:
+            due_at = self._last_used + self.keep_alive_seconds * self.margin
+        return due_at - time.time()
+
+    def _run(self) -> None:
+        while True:
+            failed = False
+            due_in = self._touch_due_in()
+            if not self._warmed or (due_in is not None and due_in <= 0 and self.in_business_hours()):
+                try:
+                    result = self.warm()
+                except Exception as e:
+                    result = {'success': False, 'seconds': None, 'error': str(e)}
+                failed = not result['success']
+                with self._lock:
+                    self.last_warmup = dict(result, at=time.time())
+                    if result['success']:
+                        self.counters['touches' if self._warmed else 'warmups'] += 1
+                        self._last_used = time.time()
+                        self._warmed = True
+                    else:
+                        self.counters['failures'] += 1
+                due_in = self._touch_due_in()
+
+            if failed:
+                sleep = self.retry_interval
+            elif due_in is None:
+                sleep = None
+            elif not self.in_business_hours():
+                sleep = self.idle_poll
+            else:
+                sleep = max(due_in, 1.0)
+            self._wake.wait(sleep)
+            self._wake.clear()
+
+
+_warmers: Dict[Tuple[str, str], ModelWarmer] = {}
+_warmers_lock = threading.Lock()
+
+
+def get_model_warmer(backend_key: str, model_name: str,
+                     warm: Callable[[], Dict[str, Any]], **kwargs) -> ModelWarmer:
+    """Process-wide warmer per (backend list, model), started on first use"""
+    key = (backend_key, model_name)
+    with _warmers_lock:
+        warmer = _warmers.get(key)
+        if warmer is None:
+            warmer = _warmers[key] = ModelWarmer(warm, **kwargs)
+        return warmer